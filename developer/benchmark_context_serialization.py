@@ -0,0 +1,221 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks for context serialization.
+
+Compares the size of the strings written by :meth:`Context.serialize` and
+:meth:`Context.to_json` for contexts of increasing complexity, and the time it
+takes to read them back.
+
+:meth:`Context.deserialize` always creates a new :class:`Sgtk` instance, which can
+require Shotgun access, so only the time taken to unpickle its data is measured.
+This is a lower bound of the real deserialization time.
+
+Results are written as JSON so that runs of different core versions can be compared.
+"""
+
+from __future__ import with_statement
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import tempfile
+import platform
+import optparse
+
+# the core the benchmarks run against by default
+this_folder = os.path.abspath(os.path.dirname(__file__))
+default_core_python_folder = os.path.abspath(os.path.join(this_folder, "..", "python"))
+
+# name of the project folder under the storage root
+PROJECT_NAME = "bench_project"
+
+PROJECT = {"type": "Project", "id": 65, "name": PROJECT_NAME}
+SHOT = {"type": "Shot", "id": 1184, "name": "seq_001_shot_0010"}
+STEP = {"type": "Step", "id": 7, "name": "Lighting"}
+TASK = {"type": "Task", "id": 91872, "name": "Lighting"}
+USER = {"type": "HumanUser", "id": 42, "name": "Render Farm"}
+
+
+def get_contexts(tk):
+    """
+    :param tk: :class:`~sgtk.Sgtk` instance the contexts are created for.
+    :returns: List of (name, context) tuples, from the simplest context to the
+              most complex one.
+    """
+    from tank.context import Context
+
+    publish = {
+        "type": "PublishedFile",
+        "id": 220345,
+        "project": PROJECT,
+        "entity": SHOT,
+        "task": TASK,
+    }
+    return [
+        ("project", Context(tk, project=PROJECT, user=USER)),
+        ("shot", Context(tk, project=PROJECT, entity=SHOT, user=USER)),
+        ("task", Context(tk, project=PROJECT, entity=SHOT, step=STEP, task=TASK, user=USER)),
+        ("publish", Context(
+            tk, project=PROJECT, entity=SHOT, step=STEP, task=TASK, user=USER,
+            additional_entities=[{"type": "Sequence", "id": 12, "name": "seq_001"}],
+            source_entity=publish,
+        )),
+    ]
+
+
+def run_benchmarks(tk, min_time):
+    """
+    Measures the serialized sizes and deserialization times of contexts.
+
+    :param tk: :class:`~sgtk.Sgtk` instance the contexts are created for.
+    :param min_time: Minimum time in seconds to time each deserialization for.
+    :returns: List of result dictionaries.
+    """
+    from tank.context import Context
+
+    results = []
+    for name, context in get_contexts(tk):
+        pickle_str = context.serialize(with_user_credentials=False)
+        json_str = context.to_json()
+
+        result = {
+            "name": name,
+            "pickle_bytes": len(pickle_str),
+            "json_bytes": len(json_str),
+            "pickle_loads_usec": _time(lambda: pickle.loads(pickle_str), min_time),
+            "from_json_usec": _time(lambda: Context.from_json(json_str), min_time),
+        }
+        _log(
+            "%-10s pickle %5d bytes %8.1f usec   json %5d bytes %8.1f usec" % (
+                name,
+                result["pickle_bytes"],
+                result["pickle_loads_usec"],
+                result["json_bytes"],
+                result["from_json_usec"],
+            )
+        )
+        results.append(result)
+    return results
+
+
+def _time(func, min_time):
+    """
+    Calls a function repeatedly until the minimum time elapsed.
+
+    :param func: Function to time.
+    :param min_time: Minimum time in seconds to call the function for.
+    :returns: Average duration of a call, in microseconds.
+    """
+    num_calls = 0
+    start = time.time()
+    elapsed = 0
+    while num_calls == 0 or elapsed < min_time:
+        for _ in range(100):
+            func()
+        num_calls += 100
+        elapsed = time.time() - start
+    return elapsed * 1000000 / num_calls
+
+
+def _create_tk(root):
+    """
+    Writes a minimal pipeline configuration and creates a :class:`~sgtk.Sgtk`
+    instance for it without connecting to Shotgun.
+
+    :param root: Folder to generate the configuration in.
+    """
+    import tank
+    from tank.pipelineconfig import PipelineConfiguration
+
+    config_root = os.path.join(root, "config")
+    storage_root = os.path.join(root, "storage")
+    core_folder = os.path.join(config_root, "config", "core")
+    os.makedirs(core_folder)
+    os.makedirs(os.path.join(storage_root, PROJECT_NAME))
+
+    _write_yaml(os.path.join(core_folder, "pipeline_configuration.yml"), {
+        "project_name": PROJECT_NAME,
+        "project_id": PROJECT["id"],
+        "pc_id": 1,
+        "pc_name": "Primary",
+    })
+    _write_yaml(os.path.join(core_folder, "roots.yml"), {
+        "primary": {
+            "linux_path": storage_root,
+            "mac_path": storage_root,
+            "windows_path": storage_root,
+        }
+    })
+    _write_yaml(os.path.join(core_folder, "templates.yml"), {"keys": {}, "paths": {}, "strings": {}})
+
+    return tank.api.Sgtk(PipelineConfiguration(config_root))
+
+
+def _write_yaml(path, data):
+    """
+    Writes data to a yaml file. JSON being a subset of yaml, we don't need a yaml
+    library to do this.
+    """
+    with open(path, "w") as fh:
+        json.dump(data, fh, indent=2, sort_keys=True)
+
+
+def _log(msg):
+    """
+    Logs progress information to stderr, keeping stdout for the results.
+    """
+    sys.stderr.write("%s\n" % msg)
+
+
+def main():
+    """
+    Main entry point for script.
+    """
+    usage = "%prog [options]"
+    desc = ("Compares the sizes and deserialization times of the context serialization "
+            "formats and reports them as JSON.")
+    parser = optparse.OptionParser(usage=usage, description=desc)
+    parser.add_option("--core", default=default_core_python_folder,
+                      help="Python folder of the core to benchmark, defaults to this core.")
+    parser.add_option("--output", help="File to write the results to, defaults to stdout.")
+    parser.add_option("--min-time", type="float", default=0.5,
+                      help="Minimum number of seconds to time each deserialization for. Defaults to %default.")
+    (options, _) = parser.parse_args()
+
+    sys.path.insert(0, options.core)
+
+    root = tempfile.mkdtemp(prefix="tk_context_benchmarks_")
+    try:
+        tk = _create_tk(root)
+        results = run_benchmarks(tk, options.min_time)
+    finally:
+        shutil.rmtree(root)
+
+    report = {
+        "core": options.core,
+        "python_version": platform.python_version(),
+        "platform": sys.platform,
+        "min_time": options.min_time,
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+    else:
+        sys.stdout.write("%s\n" % json.dumps(report, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,562 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks for template resolution.
+
+Generates a synthetic pipeline configuration, with hundreds of templates, and a
+project folder tree with work files and image sequences in a temporary folder. The
+template APIs are then timed against them, each benchmark running in its own process
+so that its peak memory usage can be measured.
+
+Results are written as JSON so that runs of different core versions can be compared.
+"""
+
+from __future__ import with_statement
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import optparse
+import subprocess
+
+# resource is only available on unix-like platforms
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# the core the benchmarks run against by default
+this_folder = os.path.abspath(os.path.dirname(__file__))
+default_core_python_folder = os.path.abspath(os.path.join(this_folder, "..", "python"))
+
+# name of the project folder under the storage root
+PROJECT_NAME = "bench_project"
+
+# maximum fraction of the templates the template index can return as candidates
+# for a path in the template_from_path benchmark
+MAX_CANDIDATES_RATIO = 0.05
+
+
+class ConfigGenerator(object):
+    """
+    Generates a pipeline configuration and a populated project folder.
+
+    Templates come in families of shot and asset work files, renders and
+    string templates. Each family uses its own folder so that all the templates
+    are unique, and only the first few families have files on disk.
+    """
+
+    def __init__(self, root, num_templates, num_shots, num_frames, num_populated):
+        """
+        :param root: Folder to generate the configuration and project in.
+        :param num_templates: Approximate number of templates to generate.
+        :param num_shots: Number of shots in each of the three sequences.
+        :param num_frames: Number of frames of each image sequence.
+        :param num_populated: Number of template families with files on disk.
+        """
+        self.root = root
+        self.config_root = os.path.join(root, "config")
+        self.storage_root = os.path.join(root, "storage")
+        self.project_root = os.path.join(self.storage_root, PROJECT_NAME)
+        self.num_families = max(num_templates // 5, 1)
+        self.num_shots = num_shots
+        self.num_frames = num_frames
+        self.num_populated = min(num_populated, self.num_families)
+
+    def generate(self):
+        """
+        Writes the configuration and the project files.
+
+        :returns: Dictionary describing what was generated.
+        """
+        self._write_config()
+        num_files = self._write_files()
+        return {
+            "num_templates": self.num_families * 5,
+            "num_files": num_files,
+            "num_shots": self.num_shots * 3,
+            "num_frames": self.num_frames,
+        }
+
+    def _write_config(self):
+        """
+        Writes the pipeline configuration files.
+        """
+        core_folder = os.path.join(self.config_root, "config", "core")
+        os.makedirs(core_folder)
+        os.makedirs(self.project_root)
+
+        _write_yaml(os.path.join(core_folder, "pipeline_configuration.yml"), {
+            "project_name": PROJECT_NAME,
+            "project_id": 1,
+            "pc_id": 1,
+            "pc_name": "Primary",
+        })
+        _write_yaml(os.path.join(core_folder, "roots.yml"), {
+            "primary": {
+                "linux_path": self.storage_root,
+                "mac_path": self.storage_root,
+                "windows_path": self.storage_root,
+            }
+        })
+
+        keys = {
+            "Sequence": {"type": "str"},
+            "Shot": {"type": "str"},
+            "Step": {"type": "str"},
+            "sg_asset_type": {"type": "str"},
+            "Asset": {"type": "str"},
+            "name": {"type": "str", "filter_by": "alphanumeric"},
+            "version": {"type": "int", "format_spec": "03"},
+            "SEQ": {"type": "sequence", "format_spec": "04"},
+            "eye": {"type": "str", "choices": ["left", "right"]},
+        }
+        paths = {}
+        strings = {}
+        for index in range(self.num_families):
+            shot_root = "sequences/{Sequence}/{Shot}/{Step}/app_%d" % index
+            asset_root = "assets/{sg_asset_type}/{Asset}/{Step}/app_%d" % index
+            paths["shot_area_%d" % index] = shot_root
+            paths["shot_work_%d" % index] = shot_root + "/work/{name}.v{version}.ma"
+            paths["shot_render_%d" % index] = (
+                shot_root + "/render/{name}/v{version}/{Shot}_{name}[_{eye}]_v{version}.{SEQ}.exr"
+            )
+            paths["asset_work_%d" % index] = asset_root + "/work/{name}.v{version}.ma"
+            strings["publish_name_%d" % index] = "app_%d {name}, v{version}" % index
+
+        _write_yaml(os.path.join(core_folder, "templates.yml"), {
+            "keys": keys,
+            "paths": paths,
+            "strings": strings,
+        })
+
+    def _write_files(self):
+        """
+        Creates work files and image sequences for the populated template families.
+
+        :returns: Number of files created.
+        """
+        num_files = 0
+        for index in range(self.num_populated):
+            for seq in range(3):
+                for shot in range(self.num_shots):
+                    for step in ["anim", "comp"]:
+                        folder = os.path.join(
+                            self.project_root, "sequences", "seq_%03d" % seq, "shot_%03d_%03d" % (seq, shot),
+                            step, "app_%d" % index
+                        )
+                        for version in range(1, 4):
+                            _touch(os.path.join(folder, "work", "main.v%03d.ma" % version))
+                            num_files += 1
+                        render_folder = os.path.join(folder, "render", "main", "v001")
+                        for frame in range(1, self.num_frames + 1):
+                            _touch(os.path.join(
+                                render_folder, "shot_%03d_%03d_main_v001.%04d.exr" % (seq, shot, frame)
+                            ))
+                            num_files += 1
+        return num_files
+
+
+class Benchmarks(object):
+    """
+    Benchmarks for the template APIs, run against a generated configuration.
+
+    Each benchmark method returns a callable running one batch of operations
+    and the number of operations in a batch.
+    """
+
+    def __init__(self, config_root, project_root):
+        """
+        :param config_root: Path to the generated pipeline configuration.
+        :param project_root: Path to the generated project folder.
+        """
+        self._config_root = config_root
+        self._project_root = project_root
+        self._tk = None
+        # additional results reported by the benchmarks
+        self.extra_results = {}
+
+    @classmethod
+    def get_names(cls):
+        """
+        :returns: Names of all the benchmarks, in the order they are run.
+        """
+        return [
+            "sgtk_init",
+            "sgtk_init_no_cache",
+            "get_fields",
+            "get_fields_unique",
+            "apply_fields",
+            "template_from_path",
+            "paths_from_template",
+            "abstract_paths_from_template",
+        ]
+
+    @property
+    def tk(self):
+        """
+        :class:`~sgtk.Sgtk` instance for the generated configuration.
+        """
+        if self._tk is None:
+            self._tk = self._create_tk()
+        return self._tk
+
+    def _create_tk(self):
+        """
+        Creates a :class:`~sgtk.Sgtk` instance without connecting to Shotgun.
+        """
+        import tank
+        from tank.pipelineconfig import PipelineConfiguration
+        return tank.api.Sgtk(PipelineConfiguration(self._config_root))
+
+    def _get_work_files(self):
+        """
+        :returns: List of (template, path, fields) tuples for the work files on disk.
+        """
+        work_files = []
+        for root, _, file_names in os.walk(self._project_root):
+            if os.path.basename(root) != "work":
+                continue
+            index = root.split(os.path.sep)[-2].split("_")[-1]
+            template = self.tk.templates["shot_work_%s" % index]
+            for file_name in sorted(file_names):
+                path = os.path.join(root, file_name)
+                work_files.append((template, path, template.get_fields(path)))
+        work_files.sort(key=lambda item: item[1])
+        return work_files
+
+    def sgtk_init(self):
+        """
+        Creation of a :class:`~sgtk.Sgtk` instance, building all the templates.
+        """
+        def run():
+            # make sure the templates are all built, in case they are built lazily
+            tk = self._create_tk()
+            len(tk.templates.values())
+
+        # cores caching templates on disk do so the first time
+        run()
+        return run, 1
+
+    def sgtk_init_no_cache(self):
+        """
+        Creation of a :class:`~sgtk.Sgtk` instance, building all the templates, with the
+        templates cache disabled.
+        """
+        os.environ["SGTK_DISABLE_TEMPLATES_CACHE"] = "1"
+        return self.sgtk_init()
+
+    def get_fields(self):
+        """
+        :meth:`Template.get_fields` on the same few hundred paths over and over.
+        """
+        work_files = self._get_work_files()[:200]
+
+        def run():
+            for template, path, _ in work_files:
+                template.get_fields(path)
+        return run, len(work_files)
+
+    def get_fields_unique(self):
+        """
+        :meth:`Template.get_fields` on paths never seen before, with a new template each time.
+        """
+        from tank.template import TemplatePath
+        template = self.tk.templates["shot_work_0"]
+        paths = [path for work_template, path, _ in self._get_work_files() if work_template is template]
+
+        def run():
+            new_template = TemplatePath(template.definition, template.keys, template.root_path)
+            for path in paths:
+                new_template.get_fields(path)
+        return run, len(paths)
+
+    def apply_fields(self):
+        """
+        :meth:`Template.apply_fields` for work files.
+        """
+        work_files = self._get_work_files()
+
+        def run():
+            for template, _, fields in work_files:
+                template.apply_fields(fields)
+        return run, len(work_files)
+
+    def template_from_path(self):
+        """
+        :meth:`Sgtk.template_from_path` for work files, with hundreds of templates to check.
+        """
+        work_files = self._get_work_files()[:200]
+        tk = self.tk
+        tk.template_from_path(work_files[0][1])
+        self._check_template_index(tk, [path for _, path, _ in work_files])
+
+        def run():
+            for _, path, _ in work_files:
+                tk.template_from_path(path)
+        return run, len(work_files)
+
+    def _check_template_index(self, tk, paths):
+        """
+        Reports the average number of candidate templates returned by the template
+        index for the given paths, for cores which have one.
+
+        :raises RuntimeError: If the index doesn't narrow down the candidates to a
+                              small fraction of the templates.
+        """
+        try:
+            from tank.template_index import TemplateIndex
+        except ImportError:
+            return
+
+        index = TemplateIndex(tk.templates)
+        num_candidates = sum([len(index.get_candidates(path)) for path in paths])
+        average = float(num_candidates) / len(paths)
+        self.extra_results["num_templates"] = len(tk.templates)
+        self.extra_results["average_candidates"] = average
+        if average > max(len(tk.templates) * MAX_CANDIDATES_RATIO, 1):
+            raise RuntimeError(
+                "The template index returned %.1f candidates per path on average out of %d templates." % (
+                    average, len(tk.templates)
+                )
+            )
+
+    def paths_from_template(self):
+        """
+        :meth:`Sgtk.paths_from_template` finding all the work files of a sequence.
+        """
+        tk = self.tk
+        template = tk.templates["shot_work_0"]
+
+        def run():
+            tk.paths_from_template(template, {"Sequence": "seq_000"})
+        return run, 1
+
+    def abstract_paths_from_template(self):
+        """
+        :meth:`Sgtk.abstract_paths_from_template` finding the image sequences of a sequence.
+        """
+        tk = self.tk
+        template = tk.templates["shot_render_0"]
+
+        def run():
+            tk.abstract_paths_from_template(template, {"Sequence": "seq_000"})
+        return run, 1
+
+
+def run_benchmark(name, config_root, project_root, min_time):
+    """
+    Runs a benchmark in the current process.
+
+    :param name: Name of the benchmark.
+    :param config_root: Path to the generated pipeline configuration.
+    :param project_root: Path to the generated project folder.
+    :param min_time: Minimum time in seconds to run the benchmark for.
+    :returns: Dictionary with the results.
+    """
+    benchmarks = Benchmarks(config_root, project_root)
+    run, batch_size = getattr(benchmarks, name)()
+    setup_memory = _get_peak_memory()
+
+    # always run at least one batch, and more until the minimum time elapsed
+    num_batches = 0
+    start = time.time()
+    elapsed = 0
+    while num_batches == 0 or elapsed < min_time:
+        run()
+        num_batches += 1
+        elapsed = time.time() - start
+
+    num_ops = num_batches * batch_size
+    result = {
+        "name": name,
+        "description": " ".join(getattr(Benchmarks, name).__doc__.split()),
+        "ops": num_ops,
+        "seconds": elapsed,
+        "ops_per_sec": num_ops / elapsed if elapsed else None,
+        "setup_peak_memory_kb": setup_memory,
+        "peak_memory_kb": _get_peak_memory(),
+    }
+    result.update(benchmarks.extra_results)
+    return result
+
+
+def run_benchmarks(names, config_root, project_root, core_python_folder, min_time):
+    """
+    Runs benchmarks, each in a new process.
+
+    :param names: Names of the benchmarks to run.
+    :param config_root: Path to the generated pipeline configuration.
+    :param project_root: Path to the generated project folder.
+    :param core_python_folder: Python folder of the core to benchmark.
+    :param min_time: Minimum time in seconds to run each benchmark for.
+    :returns: List of result dictionaries.
+    """
+    results = []
+    for name in names:
+        process = subprocess.Popen(
+            [
+                sys.executable, os.path.abspath(__file__),
+                "--core", core_python_folder,
+                "--min-time", str(min_time),
+                "--run-one", name,
+                "--config-root", config_root,
+                "--project-root", project_root,
+            ],
+            stdout=subprocess.PIPE
+        )
+        output = process.communicate()[0]
+        if process.returncode:
+            raise RuntimeError("Benchmark %s failed with exit code %d." % (name, process.returncode))
+        result = json.loads(output)
+        _log(
+            "%-30s %12.1f ops/sec %10s KB peak" % (result["name"], result["ops_per_sec"], result["peak_memory_kb"])
+        )
+        results.append(result)
+    return results
+
+
+def _get_peak_memory():
+    """
+    :returns: Peak resident memory of the current process in kilobytes, or None
+              if it can't be measured on this platform.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on mac and kilobytes elsewhere
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+
+def _write_yaml(path, data):
+    """
+    Writes data to a yaml file. JSON being a subset of yaml, we don't need a yaml
+    library to do this.
+    """
+    with open(path, "w") as fh:
+        json.dump(data, fh, indent=2, sort_keys=True)
+
+
+def _touch(path):
+    """
+    Creates an empty file, creating its parent folders as needed.
+    """
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    open(path, "w").close()
+
+
+def _log(msg):
+    """
+    Logs progress information to stderr, keeping stdout for the results.
+    """
+    sys.stderr.write("%s\n" % msg)
+
+
+def main():
+    """
+    Main entry point for script.
+    """
+    usage = "%prog [options]"
+    desc = ("Times the template APIs against a generated configuration and reports "
+            "operations per second and peak memory usage as JSON.")
+    parser = optparse.OptionParser(usage=usage, description=desc)
+    parser.add_option("--core", default=default_core_python_folder,
+                      help="Python folder of the core to benchmark, defaults to this core.")
+    parser.add_option("--output", help="File to write the results to, defaults to stdout.")
+    parser.add_option("--benchmarks", default=",".join(Benchmarks.get_names()),
+                      help="Comma separated list of benchmarks to run, defaults to all of them.")
+    parser.add_option("--templates", type="int", default=500,
+                      help="Number of templates to generate. Defaults to %default.")
+    parser.add_option("--shots", type="int", default=10,
+                      help="Number of shots in each of the three sequences. Defaults to %default.")
+    parser.add_option("--frames", type="int", default=100,
+                      help="Number of frames in each image sequence. Defaults to %default.")
+    parser.add_option("--populated", type="int", default=4,
+                      help="Number of template families with files on disk. Defaults to %default.")
+    parser.add_option("--min-time", type="float", default=1.0,
+                      help="Minimum number of seconds to run each benchmark for. Defaults to %default.")
+    parser.add_option("--keep", action="store_true", default=False,
+                      help="Keep the generated configuration and project.")
+    # used internally to run each benchmark in its own process
+    parser.add_option("--run-one", help=optparse.SUPPRESS_HELP)
+    parser.add_option("--config-root", help=optparse.SUPPRESS_HELP)
+    parser.add_option("--project-root", help=optparse.SUPPRESS_HELP)
+    (options, _) = parser.parse_args()
+
+    sys.path.insert(0, options.core)
+
+    if options.run_one:
+        result = run_benchmark(options.run_one, options.config_root, options.project_root, options.min_time)
+        sys.stdout.write(json.dumps(result))
+        return 0
+
+    names = [name.strip() for name in options.benchmarks.split(",") if name.strip()]
+    unknown_names = set(names) - set(Benchmarks.get_names())
+    if unknown_names:
+        parser.error("Unknown benchmarks: %s" % ", ".join(sorted(unknown_names)))
+
+    root = tempfile.mkdtemp(prefix="tk_template_benchmarks_")
+    try:
+        _log("Generating configuration in %s..." % root)
+        generator = ConfigGenerator(root, options.templates, options.shots, options.frames, options.populated)
+        config = generator.generate()
+        _log("Generated %(num_templates)d templates and %(num_files)d files." % config)
+
+        results = run_benchmarks(
+            names, generator.config_root, generator.project_root, options.core, options.min_time
+        )
+    finally:
+        if options.keep:
+            _log("Kept generated configuration in %s" % root)
+        else:
+            shutil.rmtree(root)
+
+    report = {
+        "core": options.core,
+        "core_version": _get_core_version(options.core),
+        "python_version": platform.python_version(),
+        "platform": sys.platform,
+        "config": config,
+        "min_time": options.min_time,
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+    else:
+        sys.stdout.write("%s\n" % json.dumps(report, indent=2, sort_keys=True))
+    return 0
+
+
+def _get_core_version(core_python_folder):
+    """
+    :returns: Version of the core being benchmarked, as found in its info.yml.
+    """
+    info_file = os.path.join(core_python_folder, "..", "info.yml")
+    try:
+        with open(info_file) as fh:
+            for line in fh:
+                if line.startswith("version:"):
+                    return line.split(":", 1)[1].strip().strip("\"'")
+    except IOError:
+        pass
+    return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
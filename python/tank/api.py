@@ -14,13 +14,17 @@ Classes for the main Sgtk API.
 
 import os
 import glob
+import threading
 
 from . import folder
 from . import context
 from .util import shotgun, yaml_cache
 from .errors import TankError, TankMultipleMatchingTemplatesError
 from .path_cache import PathCache
-from .template import read_templates
+from .template import Template, LazyTemplates, read_templates
+from .template_index import TemplateIndex
+from .template_path_walker import TemplatePathWalker
+from .template_path_grouper import AbstractPathGrouper
 from . import constants
 from .util import log_user_activity_metric
 from . import pipelineconfig
@@ -53,7 +57,11 @@ class Sgtk(object):
             self.__pipeline_config = project_path
         else:
             self.__pipeline_config = pipelineconfig_factory.from_path(project_path)
-            
+
+        # index used to narrow down the templates to validate in template_from_path.
+        # Built on demand and rebuilt whenever the templates change.
+        self.__template_index = None
+
         try:
             self.templates = read_templates(self.__pipeline_config)
         except TankError, e:
@@ -65,6 +73,13 @@ class Sgtk(object):
         # cache of local storages
         self.__cache = {}
 
+        # path cache shared by all the users of this instance, created on demand.
+        self.__path_cache = None
+        self.__path_cache_lock = threading.Lock()
+
+        # contexts built from paths, by folder.
+        self.__context_cache = context.PathContextCache(self)
+
     def __repr__(self):
         return "<Sgtk Core %s@0x%08x Config %s>" % (self.version, id(self), self.__pipeline_config.get_path())
 
@@ -164,6 +179,34 @@ class Sgtk(object):
         """
         self.__cache[cache_key] = value
 
+    def get_path_cache(self):
+        """
+        Returns the path cache shared by all the users of this instance.
+
+        The path cache can be used from any thread and keeps its connections to the
+        database open, so it must not be closed by its users.
+
+        Internal Use Only - We provide no guarantees that this method
+        will be backwards compatible.
+
+        :returns: :class:`~tank.path_cache.PathCache`
+        """
+        with self.__path_cache_lock:
+            if self.__path_cache is None:
+                self.__path_cache = PathCache(self)
+            return self.__path_cache
+
+    def get_context_cache(self):
+        """
+        Returns the cache of the contexts built by :meth:`context_from_path`.
+
+        Internal Use Only - We provide no guarantees that this method
+        will be backwards compatible.
+
+        :returns: :class:`~tank.context.PathContextCache`
+        """
+        return self.__context_cache
+
     ################################################################################################
     # properties
 
@@ -293,12 +336,16 @@ class Sgtk(object):
     ##########################################################################################
     # public methods
 
-    def reload_templates(self):
+    def reload_templates(self, eager=False):
         """
         Reloads the template definitions from disk. If the reload fails a
         :class:`TankError` will be raised and the previous template definitions
         will be preserved.
 
+        Templates are built when first accessed, so errors in a template
+        definition are only raised when the template is used, unless ``eager``
+        is set.
+
         .. note:: This method can be helpful if you are tweaking
                  templates inside of for example Maya and want to reload them. You can
                  then access this method from the python console via the current engine
@@ -306,13 +353,29 @@ class Sgtk(object):
 
                     sgtk.platform.current_engine().sgtk.reload_templates()
 
+        :param eager: If True, all the templates are built right away so that errors
+                      in their definitions are raised by this method.
         :raises: :class:`TankError`
         """
         try:
-            self.templates = read_templates(self.__pipeline_config)
+            templates = read_templates(self.__pipeline_config, eager=eager)
         except TankError, e:
             raise TankError("Templates could not be reloaded: %s" % e)
 
+        # the previous templates may still be referenced by callers, release
+        # the paths they have cached. Templates which weren't built yet don't
+        # need to be.
+        if isinstance(self.templates, LazyTemplates):
+            previous_templates = self.templates.get_built_templates()
+        else:
+            previous_templates = self.templates.values()
+        for template in previous_templates:
+            if isinstance(template, Template):
+                template.clear_fields_cache()
+
+        self.templates = templates
+        self.__template_index = None
+
     def list_commands(self):
         """
         Lists the system commands registered with the system.
@@ -366,8 +429,9 @@ class Sgtk(object):
         :param path: Path to match against a template
         :returns: :class:`TemplatePath` or None if no match could be found.
         """
+        # only validate the templates that can possibly match the path:
         matched_templates = []
-        for key, template in self.templates.items():
+        for template in self.__get_template_index().get_candidates(path):
             if template.validate(path):
                 matched_templates.append(template)
 
@@ -388,7 +452,19 @@ class Sgtk(object):
                 msg += "%s\n%s\n" % (template, fields)
             raise TankMultipleMatchingTemplatesError(msg)
 
-    def paths_from_template(self, template, fields, skip_keys=None, skip_missing_optional_keys=False):
+    def __get_template_index(self):
+        """
+        Returns the template index for the current templates, building it
+        if the templates have changed since it was last built.
+
+        :returns: :class:`TemplateIndex`
+        """
+        if self.__template_index is None or not self.__template_index.is_valid_for(self.templates):
+            self.__template_index = TemplateIndex(self.templates)
+        return self.__template_index
+
+    def paths_from_template(self, template, fields, skip_keys=None, skip_missing_optional_keys=False,
+                            max_workers=None):
         """
         Finds paths that match a template using field values passed.
 
@@ -434,12 +510,105 @@ class Sgtk(object):
         :type  skip_keys: List of key names
         :param skip_missing_optional_keys: Specify if optional keys should be skipped if they 
                                         aren't found in the fields collection
+        :param max_workers: Optional maximum number of threads used to list directories
+                            concurrently. This can greatly speed up searches on high latency
+                            storage. See :meth:`iter_paths_from_template`.
+        :type  max_workers: Integer
         :returns: Matching file paths
         :rtype: List of strings.
         """
+        if max_workers:
+            return [path for path, _ in self.iter_paths_from_template(
+                template, fields, skip_keys, skip_missing_optional_keys, max_workers)]
+
+        # iterate for each set of keys in the template:
+        found_files = set()
+        for current_local_fields, current_skip_keys in self.__get_search_fields(
+                template, fields, skip_keys, skip_missing_optional_keys):
+            # Apply the fields to build the glob string to search with:
+            glob_str = template._apply_fields(current_local_fields, ignore_types=current_skip_keys)
+            
+            # Find all files which are valid for this key set
+            found_files.update([found_file for found_file in glob.iglob(glob_str) if template.validate(found_file)])
+                    
+        return list(found_files) 
+
+    def iter_paths_from_template(self, template, fields, skip_keys=None, skip_missing_optional_keys=False,
+                                 max_workers=None):
+        """
+        Finds paths that match a template using field values passed, yielding them
+        as they are found along with the fields extracted from them.
+
+        This works in the same way as :meth:`paths_from_template` but rather than
+        listing all the matching paths and then validating them, the file system is
+        searched one directory level at a time and directories which don't match
+        the template are not searched any further. Each directory is listed at most
+        once and paths are returned as soon as they are found so this is the
+        preferred method when searching large folder structures, for example all
+        the frames of the shots of a sequence::
+
+            >>> for path, fields in tk.iter_paths_from_template(maya_work, {"Sequence": "AAA"}):
+            ...     print path, fields["Shot"], fields["version"]
+            /studio/my_proj/sequences/AAA/001/work/background.v001.ma 001 1
+            /studio/my_proj/sequences/AAA/002/work/mainscene.v003.ma 002 3
+
+        On high latency storage, such as a network file system, most of the time is
+        spent waiting for directories to be listed. Setting ``max_workers`` lists
+        all the directories found at a given level of the template concurrently,
+        using up to that number of threads, so that the time taken depends on the
+        depth of the template rather than on the number of directories::
+
+            >>> paths = tk.iter_paths_from_template(maya_work, {}, max_workers=16)
+
+        .. note:: The results are not ordered in any particular way.
+
+        :param template: Template against whom to match.
+        :type  template: :class:`TemplatePath`
+        :param fields: Fields and values to use.
+        :type  fields: Dictionary
+        :param skip_keys: Keys whose values should be ignored from the fields parameter.
+        :type  skip_keys: List of key names
+        :param skip_missing_optional_keys: Specify if optional keys should be skipped if they
+                                        aren't found in the fields collection
+        :param max_workers: Optional maximum number of threads used to list directories
+                            concurrently. If not set, directories are listed one at a time.
+        :type  max_workers: Integer
+        :returns: Generator yielding tuples (path, fields) for each matching path,
+                  where fields is the dictionary of values extracted from the path.
+        """
+        # search for all the key sets at once so that they can share the
+        # directory listings and worker threads
+        searches = list(self.__get_search_fields(template, fields, skip_keys, skip_missing_optional_keys))
+        walker = TemplatePathWalker(template, max_workers=max_workers)
+        found_files = set()
+        for found_file in walker.walk_all(searches):
+            if found_file in found_files:
+                continue
+            found_fields = template.validate_and_get_fields(found_file)
+            if found_fields is not None:
+                found_files.add(found_file)
+                yield found_file, found_fields
+
+    def __get_search_fields(self, template, fields, skip_keys, skip_missing_optional_keys):
+        """
+        Builds the fields to search for paths matching each set of keys in a template
+        with, as used by :meth:`paths_from_template`.
+
+        :param template: Template against whom to match.
+        :param fields: Fields and values to use.
+        :param skip_keys: Keys whose values should be ignored from the fields parameter.
+        :param skip_missing_optional_keys: Specify if optional keys should be skipped if they
+                                           aren't found in the fields collection
+        :returns: Generator yielding tuples (fields, skip keys) for each set of keys a path
+                  can be searched for, where searched keys have a ``*`` value. Sets of keys
+                  resulting in the same search are only returned once.
+        """
         skip_keys = skip_keys or []
         if isinstance(skip_keys, basestring):
             skip_keys = [skip_keys]
+        else:
+            # don't modify the list we were given
+            skip_keys = list(skip_keys)
         
         # construct local fields dictionary that doesn't include any skip keys:
         local_fields = dict((field, value) for field, value in fields.iteritems() if field not in skip_keys)
@@ -451,8 +620,6 @@ class Sgtk(object):
                 skip_keys.append(key)
             local_fields[key] = "*"
             
-        # iterate for each set of keys in the template:
-        found_files = set()
         globs_searched = set()
         for keys in template._keys:
             # create fields and skip keys with those that 
@@ -476,19 +643,15 @@ class Sgtk(object):
                     # if there are missing fields then we won't be able to
                     # form a valid path from them so skip this key set
                     continue
-            
-            # Apply the fields to build the glob string to search with:
+
             glob_str = template._apply_fields(current_local_fields, ignore_types=current_skip_keys)
             if glob_str in globs_searched:
                 # it's possible that multiple key sets return the same search
                 # string depending on the fields and skip-keys passed in
                 continue
             globs_searched.add(glob_str)
-            
-            # Find all files which are valid for this key set
-            found_files.update([found_file for found_file in glob.iglob(glob_str) if template.validate(found_file)])
-                    
-        return list(found_files) 
+
+            yield current_local_fields, current_skip_keys
 
 
     def abstract_paths_from_template(self, template, fields):
@@ -572,8 +735,11 @@ class Sgtk(object):
                     skip_leaf_level = False
                     break
 
-        if skip_leaf_level:
-            search_template = template.parent
+        if not skip_leaf_level:
+            # files need to be listed, group them without parsing each of them
+            return self.__get_abstract_path_grouper(template, fields).get_abstract_paths()
+
+        search_template = template.parent
 
         # now carry out a regular search based on the template
         found_files = self.paths_from_template(search_template, fields)
@@ -613,6 +779,49 @@ class Sgtk(object):
 
         return list(abstract_paths)
 
+    def abstract_sequences_from_template(self, template, fields):
+        """
+        Returns abstract paths based on a template along with the frames found on
+        disk for each of them.
+
+        This works like :meth:`abstract_paths_from_template` except that the files
+        are always listed, so that the values of the sequence keys of the files found
+        can be returned as ranges of frames::
+
+            >>> tk.abstract_sequences_from_template(render, {"Sequence": "AAA", "Shot": "001"})
+            {'/studio/my_proj/sequences/AAA/001/images/%V/render_1.%04d.exr': {'SEQ': [(1, 100)]},
+             '/studio/my_proj/sequences/AAA/001/images/%V/render_2.%04d.exr': {'SEQ': [(1, 49), (51, 100)]}}
+
+        :param template: Template with which to search
+        :type  template: :class:`TemplatePath`
+        :param fields: Mapping of keys to values with which to assemble the abstract path.
+        :type fields: dictionary
+
+        :returns: Dictionary keyed by abstract path. Values are dictionaries keyed by
+                  sequence key name with sorted lists of inclusive (first, last) frame
+                  ranges as values.
+        """
+        return self.__get_abstract_path_grouper(template, fields).get_frame_ranges()
+
+    def __get_abstract_path_grouper(self, template, fields):
+        """
+        Finds the files matching a template and groups them into abstract paths.
+
+        :param template: Template with which to search
+        :param fields: Mapping of keys to values with which to assemble the abstract path.
+        :returns: :class:`AbstractPathGrouper` with all the files found added.
+        """
+        searches = list(self.__get_search_fields(template, fields, None, False))
+
+        # the same path may be found for several key sets, only add it once
+        grouper = AbstractPathGrouper(template, fields)
+        found_files = set()
+        for found_file in TemplatePathWalker(template).walk_all(searches):
+            if found_file not in found_files:
+                found_files.add(found_file)
+                grouper.add(found_file)
+        return grouper
+
 
     def paths_from_entity(self, entity_type, entity_id):
         """
@@ -628,11 +837,7 @@ class Sgtk(object):
         """
 
         # Use the path cache to look up all paths associated with this entity
-        path_cache = PathCache(self)
-        paths = path_cache.get_paths(entity_type, entity_id, primary_only=True)
-        path_cache.close()
-
-        return paths
+        return self.get_path_cache().get_paths(entity_type, entity_id, primary_only=True)
 
     def entity_from_path(self, path):
         """
@@ -646,11 +851,7 @@ class Sgtk(object):
                   if no path was associated.
         """
         # Use the path cache to look up all paths associated with this entity
-        path_cache = PathCache(self)
-        entity = path_cache.get_entity(path)
-        path_cache.close()
-
-        return entity
+        return self.get_path_cache().get_entity(path)
 
     def context_empty(self):
         """
@@ -675,6 +876,18 @@ class Sgtk(object):
         """
         return context.from_path(self, path, previous_context)
 
+    def contexts_from_paths(self, paths):
+        """
+        Factory method that constructs context objects from several paths on disk.
+
+        This returns the same contexts as calling :meth:`context_from_path` for each
+        path but is much faster for large numbers of paths, which are resolved together.
+
+        :param paths: list of file system paths
+        :returns: list of :class:`Context`, in the same order as the paths.
+        """
+        return context.from_paths(self, paths)
+
     def context_from_entity(self, entity_type, entity_id):
         """
         Factory method that constructs a context object from a Shotgun entity.
@@ -685,6 +898,19 @@ class Sgtk(object):
         """
         return context.from_entity(self, entity_type, entity_id)
 
+    def contexts_from_entities(self, entities):
+        """
+        Factory method that constructs context objects from several Shotgun entities.
+
+        This returns the same contexts as calling :meth:`context_from_entity` for each
+        entity but queries Shotgun at most once per entity type, rather than once or
+        twice per entity.
+
+        :param entities: List of Shotgun entity dictionaries with keys type and id.
+        :returns: List of :class:`Context`, in the same order as the entities.
+        """
+        return context.from_entities(self, entities)
+
     def context_from_entity_dictionary(self, entity_dictionary):
         """
         Derives a context from a shotgun entity dictionary. This will try to use any
@@ -90,7 +90,10 @@ class SynchronizePathCache(Action):
                          "run this command with a --full flag.")
                 
                 
-            folder.synchronize_folders(self.tk, full_sync)
+            def report_progress(num_processed):
+                log.info("Synchronized %d folders..." % num_processed)
+
+            folder.synchronize_folders(self.tk, full_sync, report_progress)
                 
             log.info("Local folder information has been synchronized.")
         
@@ -101,6 +104,94 @@ class SynchronizePathCache(Action):
                       "the 'upgrade_folders' tank command.")
 
 
+class PathCacheSnapshotAction(Action):
+    """
+    Tank command to export the path cache to a snapshot file and to seed
+    the path cache of other computers from such a file. Computers seeded from
+    a snapshot only need an incremental sync to catch up with Shotgun.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        Action.__init__(self,
+                        "path_cache",
+                        Action.TK_INSTANCE,
+                        ("Exports the local path cache to a snapshot file or imports it from one."),
+                        "Admin")
+
+        # this method can be executed via the API
+        self.supports_api = True
+        self.parameters = {}
+        self.parameters["action"] = { "description": "Either 'export' or 'import'.",
+                                      "default": None,
+                                      "type": "str" }
+        self.parameters["path"] = { "description": "Path to the snapshot file.",
+                                    "default": None,
+                                    "type": "str" }
+        self.parameters["return_value"] = { "description": "Number of path cache entries exported or imported.",
+                                            "type": "int" }
+
+    def run_noninteractive(self, log, parameters):
+        """
+        Tank command API accessor.
+        Called when someone runs a tank command through the core API.
+
+        :param log: std python logger
+        :param parameters: dictionary with tank command parameters
+        :returns: Number of path cache entries exported or imported.
+        """
+        # validate params and seed default values
+        computed_params = self._validate_parameters(parameters)
+        if computed_params["action"] not in ("export", "import"):
+            raise TankError("The action parameter must be either 'export' or 'import'.")
+        if not computed_params["path"]:
+            raise TankError("The path parameter must be specified.")
+        return self._run(log, computed_params["action"], computed_params["path"])
+
+    def run_interactive(self, log, args):
+        """
+        Tank command accessor
+
+        :param log: std python logger
+        :param args: command line args
+        """
+        if len(args) != 2 or args[0] not in ("export", "import"):
+            raise TankError("Syntax: path_cache export|import snapshot_file")
+
+        return self._run(log, args[0], args[1])
+
+    def _run(self, log, action, path):
+        """
+        Actual business logic for command
+
+        :param log: logger
+        :param action: 'export' or 'import'
+        :param path: path to the snapshot file
+        :returns: Number of path cache entries exported or imported.
+        """
+        if not self.tk.pipeline_configuration.get_shotgun_path_cache_enabled():
+            # remote cache not turned on for this project
+            log.error("Looks like this project doesn't synchronize its folders with Shotgun! "
+                      "If you want to turn on synchronization for this project, run "
+                      "the 'upgrade_folders' tank command.")
+            return 0
+
+        pc = self.tk.get_path_cache()
+        if action == "export":
+            log.info("Exporting the local path cache to %s..." % path)
+            num_entries = pc.export_snapshot(path)
+            log.info("Exported %d folders." % num_entries)
+        else:
+            log.info("Importing the local path cache from %s..." % path)
+            num_entries = pc.import_snapshot(path)
+            log.info("Imported %d folders. The next sync will apply the changes made "
+                     "in Shotgun since the snapshot was taken." % num_entries)
+
+        return num_entries
+
+
 class PathCacheMigrationAction(Action):
     """
     Tank command for migrating an existing project to use the new FilesystemLocation
@@ -76,6 +76,7 @@ BUILT_IN_ACTIONS = [setup_project.SetupProjectAction,
                     pc_overview.PCBreakdownAction,
                     migrate_entities.MigratePublishedFileEntitiesAction,
                     path_cache.SynchronizePathCache,
+                    path_cache.PathCacheSnapshotAction,
                     path_cache.PathCacheMigrationAction,
                     unregister_folders.UnregisterFoldersAction,
                     clone_configuration.CloneConfigAction,
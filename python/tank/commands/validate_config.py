@@ -81,6 +81,12 @@ class ValidateConfigAction(Action):
             log.info("    %s" % x)
         log.info("")
         log.info("")
+
+        # templates are otherwise only built when first used, build them all so
+        # that errors in their definitions are reported.
+        log.info("Validating templates...")
+        self.tk.reload_templates(eager=True)
+        log.info("")
     
         # validate environments
         for env_name in parameters["envs"]:
@@ -68,6 +68,41 @@ TEMPLATE_STRING_SECTION = "strings"
 # a human readable explanation of the above. For error messages.
 VALID_TEMPLATE_KEY_NAME_DESC = "letters, numbers, underscore, space and period"
 
+# maximum number of paths whose fields are cached by each template
+TEMPLATE_FIELDS_CACHE_SIZE = 1000
+
+# environment variable to override the above, 0 disables the cache
+TEMPLATE_FIELDS_CACHE_SIZE_ENV_VAR = "SGTK_TEMPLATE_FIELDS_CACHE_SIZE"
+
+# file in the pipeline configuration cache folder holding the templates built
+# from the templates configuration
+TEMPLATES_CACHE_FILE = "templates_cache.pickle"
+
+# environment variable that if set, disables the above cache
+DISABLE_TEMPLATES_CACHE_ENV_VAR = "SGTK_DISABLE_TEMPLATES_CACHE"
+
+# environment variable that if set, builds all the templates when they are
+# read rather than when they are first used
+EAGER_TEMPLATES_ENV_VAR = "SGTK_EAGER_TEMPLATES"
+
+# environment variable that if set to a local folder, keeps a read only copy of the
+# path cache database in this folder. Lookups are done in the copy, which is refreshed
+# whenever the path cache is synchronized.
+PATH_CACHE_REPLICA_ROOT_ENV_VAR = "SGTK_PATH_CACHE_REPLICA_ROOT"
+
+# maximum number of lookups whose results are kept in memory by each path cache
+PATH_CACHE_LOOKUP_CACHE_SIZE = 1000
+
+# environment variable to override the above, 0 disables the cache
+PATH_CACHE_LOOKUP_CACHE_SIZE_ENV_VAR = "SGTK_PATH_CACHE_LOOKUP_CACHE_SIZE"
+
+# environment variable that if set to a number of seconds, makes engines poll Shotgun for
+# folder events at this interval and apply them to the path cache in the background.
+PATH_CACHE_SYNC_INTERVAL_ENV_VAR = "SGTK_PATH_CACHE_SYNC_INTERVAL"
+
+# maximum number of folders whose context is kept in memory by context_from_path
+CONTEXT_FROM_PATH_CACHE_SIZE = 1000
+
 # root logger for all of tk. This needs to match the top level
 ROOT_LOGGER_NAME = "sgtk"
 
@@ -14,8 +14,10 @@ Management of the current context, e.g. the current shotgun entity/step/task.
 """
 
 import os
+import json
 import pickle
 import copy
+import threading
 
 from tank_vendor import yaml
 from . import authentication
@@ -23,11 +25,17 @@ from . import authentication
 from .util import login
 from .util import shotgun_entity
 from .util import shotgun
+from .util.lru_cache import LRUCache
 from . import constants
 from .errors import TankError, TankContextDeserializationError
-from .path_cache import PathCache
 from .template import TemplatePath
 
+# version of the format written by Context.to_json
+JSON_FORMAT_VERSION = 1
+
+# the context members stored by Context.to_json
+_JSON_CONTEXT_KEYS = ["project", "entity", "step", "task", "user", "additional_entities", "source_entity"]
+
 
 class Context(object):
     """
@@ -70,6 +78,9 @@ class Context(object):
         and :meth:`Sgtk.context_from_path`.
         """
         self.__tk = tk
+        # path of the pipeline configuration to create the tk instance from when
+        # it is first needed, for contexts created with from_json.
+        self.__pipeline_config_path = None
         self.__project = project
         self.__entity = entity
         self.__step = step
@@ -112,7 +123,7 @@ class Context(object):
             
             # resolve custom entities to their real display
             entity_display_name = shotgun.get_entity_type_display_name(
-                self.__tk,
+                self.sgtk,
                 self.entity.get("type")
             )
             
@@ -133,7 +144,7 @@ class Context(object):
             
             # resolve custom entities to their real display
             entity_display_name = shotgun.get_entity_type_display_name(
-                self.__tk,
+                self.sgtk,
                 self.entity.get("type")
             )
             
@@ -239,6 +250,7 @@ class Context(object):
         ctx_copy.__user = copy.deepcopy(self.__user, memo)        
         ctx_copy.__additional_entities = copy.deepcopy(self.__additional_entities, memo)
         ctx_copy.__source_entity = copy.deepcopy(self.__source_entity, memo)
+        ctx_copy.__pipeline_config_path = self.__pipeline_config_path
         
         # except:
         # ctx_copy._entity_fields_cache
@@ -360,7 +372,7 @@ class Context(object):
         # so make sure we get rid of those. We should make sure we return the data
         # in a consistent way, similar to all other entities. No more. No less.
         if self.__user is None:
-            user = login.get_current_user(self.__tk)
+            user = login.get_current_user(self.sgtk)
             if user is not None:
                 self.__user = {"type": user.get("type"), 
                                "id": user.get("id"), 
@@ -400,7 +412,7 @@ class Context(object):
         if self.entity is None:
             return []
 
-        paths = self.__tk.paths_from_entity(self.entity["type"], self.entity["id"])
+        paths = self.sgtk.paths_from_entity(self.entity["type"], self.entity["id"])
 
         return paths
 
@@ -421,16 +433,16 @@ class Context(object):
         # walk up task -> entity -> project -> site
         
         if self.task is not None:
-            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, "Task", self.task["id"])            
+            return "%s/detail/%s/%d" % (self.sgtk.shotgun_url, "Task", self.task["id"])            
         
         if self.entity is not None:
-            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, self.entity["type"], self.entity["id"])            
+            return "%s/detail/%s/%d" % (self.sgtk.shotgun_url, self.entity["type"], self.entity["id"])            
 
         if self.project is not None:
-            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, "Project", self.project["id"])            
+            return "%s/detail/%s/%d" % (self.sgtk.shotgun_url, "Project", self.project["id"])            
         
         # fall back on just the site main url
-        return self.__tk.shotgun_url
+        return self.sgtk.shotgun_url
         
     @property
     def filesystem_locations(self):
@@ -453,18 +465,18 @@ class Context(object):
         
         # first handle special cases: project context
         if self.entity is None:
-            return self.__tk.paths_from_entity("Project", self.project["id"])
+            return self.sgtk.paths_from_entity("Project", self.project["id"])
             
         # at this stage we know that the context contains an entity
         # start off with all the paths matching this entity and then cull it down 
         # based on constraints.
-        entity_paths = self.__tk.paths_from_entity(self.entity["type"], self.entity["id"])
+        entity_paths = self.sgtk.paths_from_entity(self.entity["type"], self.entity["id"])
                 
         # for each of these paths, get the context and compare it against our context
         # todo: optimize this!
         matching_paths = []
         for p in entity_paths:
-            ctx = self.__tk.context_from_path(p)
+            ctx = self.sgtk.context_from_path(p)
             # the stuff we need to compare against are all the "child" levels
             # below entity: task and user
             matching = False
@@ -500,6 +512,10 @@ class Context(object):
 
         :returns: :class:`Sgtk`
         """
+        if self.__tk is None and self.__pipeline_config_path:
+            # lazy load this to avoid cyclic dependencies
+            from .api import Tank
+            self.__tk = Tank(self.__pipeline_config_path)
         return self.__tk
 
     @property
@@ -509,7 +525,7 @@ class Context(object):
 
         :returns: :class:`Sgtk`
         """
-        return self.__tk
+        return self.sgtk
 
     ################################################################################################
     # public methods
@@ -571,25 +587,7 @@ class Context(object):
         :raises:            :class:`TankError` if the fields can't be resolved for some reason or if 'validate' is True
                             and any of the context fields for the template weren't found. 
         """
-        # Get all entities into a dictionary
-        entities = {}
-
-        if self.entity:
-            entities[self.entity["type"]] = self.entity
-        if self.step:
-            entities["Step"] = self.step
-        if self.task:
-            entities["Task"] = self.task
-        if self.user:
-            entities["HumanUser"] = self.user
-        if self.project:
-            entities["Project"] = self.project
-
-        # If there are any additional entities, use them as long as they don't
-        # conflict with types we already have values for (Step, Task, Shot/Asset/etc)
-        for add_entity in self.additional_entities:
-            if add_entity["type"] not in entities:
-                entities[add_entity["type"]] = add_entity
+        entities = self._get_template_entities()
 
         fields = {}
 
@@ -645,6 +643,32 @@ class Context(object):
 
         return fields
 
+    def as_template_fields_many(self, templates, validate=False):
+        """
+        Returns the context object as a dictionary of template fields for each of the
+        given templates.
+
+        This is equivalent to calling :meth:`as_template_fields` for each template, but
+        the values of all the keys with shotgun_entity_type and shotgun_field_name settings
+        across the templates are retrieved with a single Shotgun query per entity.
+        Example::
+
+            >>> templates = [tk.templates["maya_shot_work"], tk.templates["maya_shot_publish"]]
+            >>> ctx.as_template_fields_many(templates)
+            [{'Step': 'Lighting', 'Shot': 'ABC', 'Sequence': 'AAA'},
+             {'Step': 'Lighting', 'Shot': 'ABC', 'Sequence': 'AAA'}]
+
+        :param templates:   List of :class:`Template` for which the fields will be used.
+        :param validate:    If True then the fields found will be checked to ensure that all expected fields for
+                            the context were found.  If a field is missing then a :class:`TankError` will be raised
+        :returns:           A list of dictionaries of template fields, one for each template, in the same order.
+        :raises:            :class:`TankError` if the fields can't be resolved for some reason or if 'validate' is True
+                            and any of the context fields for a template weren't found.
+        """
+        self._cache_shotgun_fields(templates, self._get_template_entities())
+
+        return [self.as_template_fields(template, validate) for template in templates]
+
     def create_copy_for_user(self, user):
         """
         Provides the ability to create a copy of an existing Context for a specific user.
@@ -733,6 +757,10 @@ class Context(object):
 
         :returns: :class:`Context`
         """
+        if context_str.startswith("{"):
+            # compact format written by to_json
+            return cls.from_json(context_str)
+
         # lazy load this to avoid cyclic dependencies
         from .api import Tank, set_authenticated_user
 
@@ -768,9 +796,158 @@ class Context(object):
         # and lastly make the obejct
         return cls(**data)
 
+    def to_json(self):
+        """
+        Serializes the context into a compact JSON string.
+
+        Contrary to :meth:`serialize`, the credentials of the current user are never
+        included, and :meth:`from_json` restores the context without any Shotgun or
+        authentication work: the :class:`Sgtk` instance of the restored context is only
+        created the first time it is needed. This makes it suitable to pass contexts to
+        large numbers of processes, for example through environment variables on a
+        render farm. Example:
+
+            >>> context_str = ctx.to_json()
+            >>> context_str
+            '{"_pc_path":"/studio.08/demo_project/config","_v":1,"entity":{"id":2,"name":"ABC","type":"Shot"},...}'
+            >>> new_ctx = sgtk.Context.from_json(context_str)
+
+        .. note:: Only entity dictionaries whose values can be represented in JSON, like
+            the links returned by Shotgun, can be serialized.
+
+        :returns: JSON string representation
+        :raises: :class:`TankError` if the context can't be represented in JSON.
+        """
+        data = {
+            "_v": JSON_FORMAT_VERSION,
+            "_pc_path": self.__pipeline_config_path or self.sgtk.pipeline_configuration.get_path(),
+        }
+        for key in _JSON_CONTEXT_KEYS:
+            value = getattr(self, key)
+            # leave out empty values to keep things compact
+            if value:
+                data[key] = value
+
+        try:
+            return json.dumps(data, separators=(",", ":"), sort_keys=True)
+        except (TypeError, ValueError), e:
+            raise TankError("Context %r can't be serialized to JSON: %s" % (self, e))
+
+    @classmethod
+    def from_json(cls, context_str):
+        """
+        The inverse of :meth:`Context.to_json`.
+
+        No Shotgun queries are made and the currently authenticated user is left
+        untouched. The :class:`Sgtk` instance of the context is created from the
+        pipeline configuration the context was serialized from when it is first needed.
+
+        :param context_str: String representation of context, created with :meth:`Context.to_json`
+
+        :returns: :class:`Context`
+        :raises: :class:`TankContextDeserializationError` if the string can't be deserialized.
+        """
+        try:
+            data = _str_from_unicode(json.loads(context_str))
+        except Exception, e:
+            raise TankContextDeserializationError(str(e))
+
+        if not isinstance(data, dict):
+            raise TankContextDeserializationError("Invalid context data %r." % context_str)
+
+        if data.get("_v") != JSON_FORMAT_VERSION:
+            raise TankContextDeserializationError(
+                "Unsupported context format version %r, expected %d." % (data.get("_v"), JSON_FORMAT_VERSION)
+            )
+
+        context = cls(None, **dict((key, data.get(key)) for key in _JSON_CONTEXT_KEYS))
+        context.__pipeline_config_path = data.get("_pc_path")
+        return context
+
     ################################################################################################
     # private methods
 
+    def _get_template_entities(self):
+        """
+        Returns the entities of this context which can provide values to template keys.
+
+        :returns: Dictionary of entity dictionaries keyed by entity type.
+        """
+        # Get all entities into a dictionary
+        entities = {}
+
+        if self.entity:
+            entities[self.entity["type"]] = self.entity
+        if self.step:
+            entities["Step"] = self.step
+        if self.task:
+            entities["Task"] = self.task
+        if self.user:
+            entities["HumanUser"] = self.user
+        if self.project:
+            entities["Project"] = self.project
+
+        # If there are any additional entities, use them as long as they don't
+        # conflict with types we already have values for (Step, Task, Shot/Asset/etc)
+        for add_entity in self.additional_entities:
+            if add_entity["type"] not in entities:
+                entities[add_entity["type"]] = add_entity
+
+        return entities
+
+    def _cache_shotgun_fields(self, templates, entities):
+        """
+        Retrieves the values of the keys used by the templates whose values come directly
+        from Shotgun fields and stores them in the context's cache.
+
+        All the fields which are not already cached are queried together, with a single
+        Shotgun query per entity. Fields of entities which can't be found in Shotgun
+        are not cached.
+
+        :param templates: List of templates to retrieve Shotgun fields for.
+        :param entities: Dictionary of entities for the current context.
+        """
+        # field names to retrieve, by entity type
+        query_fields = {}
+        for template in templates:
+            for key in template.keys.values():
+                if not key.shotgun_field_name or key.shotgun_entity_type not in entities:
+                    continue
+
+                entity = entities[key.shotgun_entity_type]
+                cache_key = (entity["type"], entity["id"], key.shotgun_field_name)
+                if cache_key not in self._entity_fields_cache:
+                    query_fields.setdefault(key.shotgun_entity_type, set()).add(key.shotgun_field_name)
+
+        for entity_type, field_names in query_fields.iteritems():
+            entity = entities[entity_type]
+            filters = [["id", "is", entity["id"]]]
+            result = self.sgtk.shotgun.find_one(entity_type, filters, sorted(field_names))
+            if not result:
+                # no record with that id in shotgun - this is reported
+                # for each key by _fields_from_shotgun
+                continue
+
+            for field_name in field_names:
+                value = result.get(field_name)
+
+                # note! It is perfectly possible (and may be valid) to return None values from 
+                # shotgun at this point. In these cases, a None field will be returned in the 
+                # fields dictionary from as_template_fields, and this may be injected into
+                # a template with optional fields.
+                if value is not None:
+                    # now convert the shotgun value to a string.
+                    # note! This means that there is no way currently to create an int key
+                    # in a tank template which matches an int field in shotgun, since we are
+                    # force converting everything into strings...
+                    value = shotgun_entity.sg_entity_to_string(self.sgtk,
+                                                               entity_type,
+                                                               entity.get("id"),
+                                                               field_name,
+                                                               value)
+
+                self._entity_fields_cache[(entity["type"], entity["id"], field_name)] = value
+
     def _fields_from_shotgun(self, template, entities, validate):
         """
         Query Shotgun server for keys used by this template whose values come directly
@@ -785,6 +962,9 @@ class Context(object):
 
         :raises TankError: Raised if a key is missing from the entities list when ``validate`` is ``True``.
         """
+        # get the values which aren't cached yet from shotgun
+        self._cache_shotgun_fields([template], entities)
+
         fields = {}
         # for any sg query field
         for key in template.keys.values():
@@ -803,63 +983,27 @@ class Context(object):
                         continue
                     
                 entity = entities[key.shotgun_entity_type]
-                
-                # check the context cache 
-                cache_key = (entity["type"], entity["id"], key.shotgun_field_name)
-                if cache_key in self._entity_fields_cache:
-                    # already have the value cached - no need to fetch from shotgun
-                    fields[key.name] = self._entity_fields_cache[cache_key]
-                
-                else:
-                    # get the value from shotgun
-                    filters = [["id", "is", entity["id"]]]
-                    query_fields = [key.shotgun_field_name]
-                    result = self.__tk.shotgun.find_one(key.shotgun_entity_type, filters, query_fields)
-                    if not result:
-                        # no record with that id in shotgun!
-                        raise TankError("Could not retrieve Shotgun data for key '%s' in "
-                                        "template '%s'. No records in Shotgun are matching "
-                                        "entity '%s' (Which is part of the current "
-                                        "context '%s')" % (key, template, entity, self))                        
-
-                    value = result.get(key.shotgun_field_name)
-
-                    # note! It is perfectly possible (and may be valid) to return None values from 
-                    # shotgun at this point. In these cases, a None field will be returned in the 
-                    # fields dictionary from as_template_fields, and this may be injected into
-                    # a template with optional fields.
-    
-                    if value is None:
-                        processed_val = None
-                    
-                    else:
-
-                        # now convert the shotgun value to a string.
-                        # note! This means that there is no way currently to create an int key
-                        # in a tank template which matches an int field in shotgun, since we are
-                        # force converting everything into strings...
-                                 
-                        processed_val = shotgun_entity.sg_entity_to_string(self.__tk,
-                                                                           key.shotgun_entity_type,
-                                                                           entity.get("id"),
-                                                                           key.shotgun_field_name, 
-                                                                           value)
-                    
-                        if not key.validate(processed_val):                    
-                            raise TankError("Template validation failed for value '%s'. This "
-                                            "value was retrieved from entity %s in Shotgun to "
-                                            "represent key '%s' in "
-                                            "template '%s'." % (processed_val, entity, key, template))
-                            
-                    # all good!
-                    # populate dictionary and cache
-                    fields[key.name] = processed_val
-                    self._entity_fields_cache[cache_key] = processed_val
 
+                cache_key = (entity["type"], entity["id"], key.shotgun_field_name)
+                if cache_key not in self._entity_fields_cache:
+                    # no record with that id in shotgun!
+                    raise TankError("Could not retrieve Shotgun data for key '%s' in "
+                                    "template '%s'. No records in Shotgun are matching "
+                                    "entity '%s' (Which is part of the current "
+                                    "context '%s')" % (key, template, entity, self))
+
+                processed_val = self._entity_fields_cache[cache_key]
+                if processed_val is not None and not key.validate(processed_val):
+                    raise TankError("Template validation failed for value '%s'. This "
+                                    "value was retrieved from entity %s in Shotgun to "
+                                    "represent key '%s' in "
+                                    "template '%s'." % (processed_val, entity, key, template))
+
+                # all good!
+                fields[key.name] = processed_val
 
         return fields
 
-
     def _fields_from_entity_paths(self, template):
         """
         Determines a template's key values based on context by walking up the context entities paths until
@@ -869,7 +1013,7 @@ class Context(object):
         :returns:           A dictionary of field name, value pairs for any fields found for the template
         """
         fields = {}
-        project_roots = self.__tk.pipeline_configuration.get_data_roots().values()
+        project_roots = self.sgtk.pipeline_configuration.get_data_roots().values()
 
         # get all locations on disk for our context object from the path cache
         path_cache_locations = self.entity_locations 
@@ -932,105 +1076,101 @@ class Context(object):
         found_fields = {}
 
         # get a path cache handle
-        path_cache = PathCache(self.__tk)
-        try:
-            for template in templates:
-                # iterate over all keys in the {key_name:key} dictionary for the template
-                # looking for any that represent context entities (key name == entity type)
-                template_key_dict = template.keys
-                for key_name in template_key_dict.keys():
-                    # Check to see if we already have a value for this key: 
-                    if key_name in known_fields or key_name in found_fields:
-                        # already have a value so skip
-                        continue
-
-                    if key_name not in context_entities:
-                        # key doesn't represent an entity so skip
-                        continue
-
-                    # find fields for any paths associated with this entity by looking in the path cache:
-                    entity_fields = _values_from_path_cache(context_entities[key_name], template, path_cache, 
-                                                           required_fields=found_fields)
-
-                    # entity_fields may contain additional fields that correspond to entities
-                    # so we should be sure to validate these as well if we can.
-                    #
-                    # The following example illustrates where the code could previously return incorrect entity 
-                    # information from this method:
-                    #
-                    # With the following template:
-                    #    /{Sequence}/{Shot}/{Step}
-                    #
-                    # And a path cache that contains:
-                    #    Type     | Id  | Name     | Path
-                    #    ----------------------------------------------------
-                    #    Sequence | 001 | Seq_001  | /Seq_001
-                    #    Shot     | 002 | Shot_A   | /Seq_001/Shot_A
-                    #    Step     | 003 | Lighting | /Seq_001/Shot_A/Lighting
-                    #    Step     | 003 | Lighting | /Seq_001/blah/Shot_B/Lighting   <- this is out of date!
-                    #    Shot     | 004 | Shot_B   | /Seq_001/blah/Shot_B            <- this is out of date!
-                    #
-                    # (Note: the schema/templates have been changed since the entries for Shot_b were added)
-                    #
-                    # The sub-templates used to search for fields are:
-                    #    /{Sequence}
-                    #    /{Sequence}/{Shot}
-                    #    /{Sequence}/{Shot}/{Step}
-                    #
-                    # And the entities passed into the method are:
-                    #    Sequence:   Seq_001
-                    #    Shot:       Shot_B
-                    #    Step:       Lighting
-                    #
-                    # We are searching for fields for 'Shot_B' that has a broken entry in the path cache so the fields 
-                    # returned for each level of the template will be:
-                    #    /{Sequence}                 -> {"Sequence":"Seq_001"} <- Correct
-                    #    /{Sequence}/{Shot}          -> {}                     <- entry not found for Shot_B matching 
-                    #                                                             the template
-                    #    /{Sequence}/{Shot}/{Step}   -> {"Sequence":"Seq_001", <- Correct
-                    #                                    "Shot":"Shot_A",      <- Wrong!
-                    #                                    "Step":"Lighting"}    <- Correct
-                    #
-                    # In previous implementations, the final fields would incorrectly be returned as:
-                    #
-                    #     {"Sequence":"Seq_001",
-                    #      "Shot":"Shot_A",
-                    #      "Step":"Lighting"}
-                    #
-                    # The wrong Shot (Shot_A) is returned and not caught because the code only tested that the Step
-                    # entity matches and just assumes that the rest is correct - this isn't the case when there is
-                    # a one-to-many relationship between entities!
-                    #
-                    # Therefore, we need to validate that we didn't find any entity fields that we should have found
-                    # previously/higher up in the template definition.  If we did then the entries that were found 
-                    # may not be correct so we have to discard them!
-                    found_mismatching_field = False
-                    for field_name, field_value in entity_fields.iteritems():
-                        if field_name in known_fields:
-                            # We found a field we already knew about...
-                            if field_value != known_fields[field_name]:
-                                # ...but it doesn't match!
-                                found_mismatching_field = True
-                        elif field_name in found_fields:
-                            # We found a field we found before...
-                            if field_value != found_fields[field_name]:
-                                # ...but it doesn't match!
-                                found_mismatching_field = True
-                        elif field_name == key_name:
-                            # We found a field that matches the entity we were searching for so it must be valid!
-                            found_fields[field_name] = field_value
-                        elif field_name in context_entities:
-                            # We found an entity type that we should have found before (in a previous/shorter 
-                            # template).  This means we can't trust any other fields that were found as they
-                            # may belong to a completely different entity/path! 
+        path_cache = self.sgtk.get_path_cache()
+        for template in templates:
+            # iterate over all keys in the {key_name:key} dictionary for the template
+            # looking for any that represent context entities (key name == entity type)
+            template_key_dict = template.keys
+            for key_name in template_key_dict.keys():
+                # Check to see if we already have a value for this key: 
+                if key_name in known_fields or key_name in found_fields:
+                    # already have a value so skip
+                    continue
+
+                if key_name not in context_entities:
+                    # key doesn't represent an entity so skip
+                    continue
+
+                # find fields for any paths associated with this entity by looking in the path cache:
+                entity_fields = _values_from_path_cache(context_entities[key_name], template, path_cache, 
+                                                       required_fields=found_fields)
+
+                # entity_fields may contain additional fields that correspond to entities
+                # so we should be sure to validate these as well if we can.
+                #
+                # The following example illustrates where the code could previously return incorrect entity 
+                # information from this method:
+                #
+                # With the following template:
+                #    /{Sequence}/{Shot}/{Step}
+                #
+                # And a path cache that contains:
+                #    Type     | Id  | Name     | Path
+                #    ----------------------------------------------------
+                #    Sequence | 001 | Seq_001  | /Seq_001
+                #    Shot     | 002 | Shot_A   | /Seq_001/Shot_A
+                #    Step     | 003 | Lighting | /Seq_001/Shot_A/Lighting
+                #    Step     | 003 | Lighting | /Seq_001/blah/Shot_B/Lighting   <- this is out of date!
+                #    Shot     | 004 | Shot_B   | /Seq_001/blah/Shot_B            <- this is out of date!
+                #
+                # (Note: the schema/templates have been changed since the entries for Shot_b were added)
+                #
+                # The sub-templates used to search for fields are:
+                #    /{Sequence}
+                #    /{Sequence}/{Shot}
+                #    /{Sequence}/{Shot}/{Step}
+                #
+                # And the entities passed into the method are:
+                #    Sequence:   Seq_001
+                #    Shot:       Shot_B
+                #    Step:       Lighting
+                #
+                # We are searching for fields for 'Shot_B' that has a broken entry in the path cache so the fields 
+                # returned for each level of the template will be:
+                #    /{Sequence}                 -> {"Sequence":"Seq_001"} <- Correct
+                #    /{Sequence}/{Shot}          -> {}                     <- entry not found for Shot_B matching 
+                #                                                             the template
+                #    /{Sequence}/{Shot}/{Step}   -> {"Sequence":"Seq_001", <- Correct
+                #                                    "Shot":"Shot_A",      <- Wrong!
+                #                                    "Step":"Lighting"}    <- Correct
+                #
+                # In previous implementations, the final fields would incorrectly be returned as:
+                #
+                #     {"Sequence":"Seq_001",
+                #      "Shot":"Shot_A",
+                #      "Step":"Lighting"}
+                #
+                # The wrong Shot (Shot_A) is returned and not caught because the code only tested that the Step
+                # entity matches and just assumes that the rest is correct - this isn't the case when there is
+                # a one-to-many relationship between entities!
+                #
+                # Therefore, we need to validate that we didn't find any entity fields that we should have found
+                # previously/higher up in the template definition.  If we did then the entries that were found 
+                # may not be correct so we have to discard them!
+                found_mismatching_field = False
+                for field_name, field_value in entity_fields.iteritems():
+                    if field_name in known_fields:
+                        # We found a field we already knew about...
+                        if field_value != known_fields[field_name]:
+                            # ...but it doesn't match!
                             found_mismatching_field = True
-
-                    if not found_mismatching_field:
-                        # all fields are ok so we can add them all to the list of found fields :)
-                        found_fields.update(entity_fields)
-
-        finally:
-            path_cache.close()
+                    elif field_name in found_fields:
+                        # We found a field we found before...
+                        if field_value != found_fields[field_name]:
+                            # ...but it doesn't match!
+                            found_mismatching_field = True
+                    elif field_name == key_name:
+                        # We found a field that matches the entity we were searching for so it must be valid!
+                        found_fields[field_name] = field_value
+                    elif field_name in context_entities:
+                        # We found an entity type that we should have found before (in a previous/shorter 
+                        # template).  This means we can't trust any other fields that were found as they
+                        # may belong to a completely different entity/path! 
+                        found_mismatching_field = True
+
+                if not found_mismatching_field:
+                    # all fields are ok so we can add them all to the list of found fields :)
+                    found_fields.update(entity_fields)
 
         return found_fields
 
@@ -1085,74 +1225,136 @@ def _from_entity_type_and_id(tk, entity, source_entity=None):
 
     :returns: :class:`Context`
     """
-    entity_type = entity.get("type")
-    entity_id = entity.get("id")
-    
-    if entity_type is None:
-        raise TankError("Cannot create a context from an entity type 'None'!")
-    
-    if entity_id is None:
-        raise TankError("Cannot create a context from an entity id set to 'None'!")
-    
-    # prep our return data structure
-    context = {
-        "tk": tk,
-        "project": None,
-        "entity": None,
-        "step": None,
-        "user": None,
-        "task": None,
-        "additional_entities": [],
-        "source_entity": source_entity,
-    }
+    return _from_entity_types_and_ids(tk, [entity], [source_entity])[0]
 
-    if entity_type == "Task":
-        # For tasks get data from shotgun query
-        task_context = _task_from_sg(tk, entity_id)
-        context.update(task_context)
 
-    elif entity_type in ["PublishedFile", "TankPublishedFile"]:
-        
-        sg_entity = tk.shotgun.find_one(entity_type, 
-                                        [["id", "is", entity_id]], 
-                                        ["project", "entity", "task"])
-        
-        if sg_entity is None:
-            raise TankError("Entity %s with id %s not found in Shotgun!" % (entity_type, entity_id))
-        
-        if sg_entity.get("task"):
-            # base the context on the task for the published file
-            return _from_entity_type_and_id(tk, sg_entity["task"], sg_entity)
-        
-        elif sg_entity.get("entity"):
-            # base the context on the entity that the published is linked with
-            return _from_entity_type_and_id(tk, sg_entity["entity"], sg_entity)
-        
-        elif sg_entity.get("project"):
-            # base the context on the project that the published is linked with
-            return _from_entity_type_and_id(tk, sg_entity["project"], sg_entity)
-    
-    else:
-        # Get data from path cache
-        entity_context = _context_data_from_cache(tk, entity_type, entity_id)
-                    
-        # make sure this was actually found in the cache
-        # fall back on a shotgun lookup if not found
-        if entity_context["project"] is None:
-            entity_context = _entity_from_sg(tk, entity_type, entity_id)
-        
-        context.update(entity_context)
+def from_entities(tk, entities):
+    """
+    Constructs contexts from several shotgun entities.
 
-        if entity_type == "Project":
-            # no need to set entity to point at project in this case
-            # that only produces double entries.
-            context["entity"] = None
+    For more information, see :meth:`Sgtk.contexts_from_entities`.
 
-    # If there isn't an explicit source_entity, we set it to be
-    # the same as the entity property.
-    context["source_entity"] = context["source_entity"] or context["entity"]
+    :param tk:       Sgtk API handle
+    :param entities: List of entity dictionaries containing a minimum of type and id keys.
+
+    :returns: List of :class:`Context`, in the same order as the entities.
+    """
+    return _from_entity_types_and_ids(
+        tk,
+        [dict(type=x.get("type"), id=x.get("id")) for x in entities],
+        [None] * len(entities)
+    )
+
+
+def _from_entity_types_and_ids(tk, entities, source_entities):
+    """
+    Constructs contexts from the entity types and ids stored in the given entities,
+    see :meth:`_from_entity_type_and_id`.
+
+    The entities are grouped by type, Shotgun is queried at most once for each type
+    and the path cache is looked up for all the entities of a type together.
+
+    :param tk: Sgtk API handle
+    :param list entities: The entities to construct the contexts from, containing
+        a minimum of type and id keys.
+    :param list source_entities: The source entity of each context, or None.
+
+    :returns: List of :class:`Context`, in the same order as the entities.
+    """
+    # group the unique entity ids by type
+    ids_by_type = {}
+    for entity in entities:
+        if entity.get("type") is None:
+            raise TankError("Cannot create a context from an entity type 'None'!")
+
+        if entity.get("id") is None:
+            raise TankError("Cannot create a context from an entity id set to 'None'!")
+
+        ids_by_type.setdefault(entity["type"], set()).add(entity["id"])
+
+    # context data by entity type and id
+    context_data = {}
+    # published files, whose context is the one of the entity they are linked with
+    published_files = {}
+
+    for entity_type, entity_ids in ids_by_type.iteritems():
+        entity_ids = sorted(entity_ids)
+
+        if entity_type == "Task":
+            # For tasks get data from shotgun query
+            for task_id, task_context in _tasks_from_sg(tk, entity_ids).iteritems():
+                context_data[(entity_type, task_id)] = task_context
+
+        elif entity_type in ["PublishedFile", "TankPublishedFile"]:
+
+            sg_entities = tk.shotgun.find(entity_type,
+                                          [["id", "in", entity_ids]],
+                                          ["project", "entity", "task"])
+            sg_entities = dict((x["id"], x) for x in sg_entities)
+
+            for entity_id in entity_ids:
+                if entity_id not in sg_entities:
+                    raise TankError("Entity %s with id %s not found in Shotgun!" % (entity_type, entity_id))
+                published_files[(entity_type, entity_id)] = sg_entities[entity_id]
+
+        else:
+            # Get data from path cache
+            entity_contexts = _contexts_data_from_cache(tk, entity_type, entity_ids)
+
+            # make sure this was actually found in the cache
+            # fall back on a shotgun lookup if not found
+            missing_ids = [x for x in entity_ids if entity_contexts[x]["project"] is None]
+            if missing_ids:
+                entity_contexts.update(_entities_from_sg(tk, entity_type, missing_ids))
+
+            for entity_id, entity_context in entity_contexts.iteritems():
+                if entity_type == "Project":
+                    # no need to set entity to point at project in this case
+                    # that only produces double entries.
+                    entity_context["entity"] = None
+                context_data[(entity_type, entity_id)] = entity_context
+
+    # base the context of the published files on their task, or else on the entity
+    # or the project they are linked with.
+    linked_contexts = {}
+    links = []
+    for key, sg_entity in published_files.iteritems():
+        link = sg_entity.get("task") or sg_entity.get("entity") or sg_entity.get("project")
+        if link:
+            links.append((key, link, sg_entity))
+    if links:
+        contexts = _from_entity_types_and_ids(tk, [x[1] for x in links], [x[2] for x in links])
+        for (key, _, _), linked_context in zip(links, contexts):
+            linked_contexts[key] = linked_context
+
+    contexts = []
+    for entity, source_entity in zip(entities, source_entities):
+        key = (entity["type"], entity["id"])
+        if key in linked_contexts:
+            contexts.append(copy.deepcopy(linked_contexts[key]))
+            continue
+
+        # prep our return data structure
+        context = {
+            "tk": tk,
+            "project": None,
+            "entity": None,
+            "step": None,
+            "user": None,
+            "task": None,
+            "additional_entities": [],
+            "source_entity": source_entity,
+        }
+        context.update(copy.deepcopy(context_data.get(key, {})))
+
+        # If there isn't an explicit source_entity, we set it to be
+        # the same as the entity property.
+        context["source_entity"] = context["source_entity"] or context["entity"]
+
+        contexts.append(Context(**context))
+
+    return contexts
 
-    return Context(**context)
 
 def from_entity_dictionary(tk, entity_dictionary):
     """
@@ -1326,6 +1528,136 @@ def _from_entity_dictionary(tk, entity_dictionary, source_entity=None):
 
     return Context(**context)
 
+
+class PathContextCache(object):
+    """
+    Cache of the contexts built by :meth:`from_path`, shared by all the users of a
+    Toolkit instance.
+
+    A context is cached for the deepest folder of its path which is registered in the
+    path cache, along with the folders registered below that folder. Any path below
+    the folder resolves to the cached context as long as none of the folders in between
+    is registered, which is the case for all the files of a work area. The cache is
+    cleared whenever the path cache changes, including when other processes write to
+    the path cache database. Checking this doesn't query the database, see
+    :meth:`~tank.path_cache.PathCache.get_revision`.
+    """
+
+    # folders with more registered folders below them, e.g. the project root,
+    # are not cached.
+    MAX_REGISTERED_SUBFOLDERS = 1000
+
+    def __init__(self, tk, max_size=constants.CONTEXT_FROM_PATH_CACHE_SIZE):
+        """
+        Constructor.
+
+        :param tk: Toolkit API instance.
+        :param int max_size: Maximum number of folders whose context is cached.
+        """
+        self._tk = tk
+        self._contexts = LRUCache(max_size)
+        self._lock = threading.Lock()
+        self._path_cache_revision = None
+        self._additional_entity_types = None
+
+    def get_stats(self):
+        """
+        Returns the statistics of the cache, see :meth:`~tank.util.lru_cache.LRUCache.get_stats`.
+        """
+        return self._contexts.get_stats()
+
+    def clear(self):
+        """
+        Removes all the cached contexts.
+        """
+        with self._lock:
+            self._contexts.clear()
+            self._additional_entity_types = None
+
+    def get(self, path, revision=None):
+        """
+        Returns the cached context fields for a path.
+
+        :param path: a file system path
+        :param revision: Revision of the path cache, as returned by
+                         :meth:`~tank.path_cache.PathCache.get_revision`. Callers looking
+                         up many paths at once read it once and pass it. Read if None.
+        :returns: A tuple with the context fields, as a dictionary of :class:`Context`
+                  constructor arguments without tk, or None if not cached, and the revision
+                  of the path cache to pass to :meth:`set`.
+        """
+        if revision is None:
+            revision = self._tk.get_path_cache().get_revision()
+        with self._lock:
+            if revision != self._path_cache_revision:
+                self._contexts.clear()
+                self._additional_entity_types = None
+                self._path_cache_revision = revision
+
+        if path is None:
+            return (None, revision)
+
+        # walk up to the first folder with a cached context
+        folder = os.path.abspath(path)
+        folders_in_between = []
+        while True:
+            entry = self._contexts.get(folder)
+            if entry is not None:
+                fields, registered_subfolders = entry
+                if registered_subfolders.isdisjoint(folders_in_between):
+                    return (copy.deepcopy(fields), revision)
+                return (None, revision)
+
+            parent_folder = os.path.dirname(folder)
+            if parent_folder == folder:
+                return (None, revision)
+            folders_in_between.append(folder)
+            folder = parent_folder
+
+    def set(self, revision, ancestor_entities, fields):
+        """
+        Caches the context fields built for a path.
+
+        :param revision: Revision of the path cache returned by :meth:`get`.
+        :param ancestor_entities: Entities of the path and of its parent folders, as
+                                  returned by :meth:`~tank.path_cache.PathCache.get_ancestor_entities`.
+        :param dict fields: Context fields built from these entities.
+        """
+        # the deepest folder with entities
+        for folder, entity, secondary_entities in ancestor_entities:
+            if entity or secondary_entities:
+                break
+        else:
+            return
+
+        path_cache = self._tk.get_path_cache()
+        registered_subfolders = set(
+            os.path.abspath(x["path"]) for x in path_cache.get_entities_under(folder)
+        )
+        if len(registered_subfolders) > self.MAX_REGISTERED_SUBFOLDERS:
+            return
+
+        with self._lock:
+            # don't cache a context built from data which changed since
+            if revision == path_cache.get_revision() == self._path_cache_revision:
+                self._contexts.set(
+                    os.path.abspath(folder), (copy.deepcopy(fields), registered_subfolders)
+                )
+
+    def get_additional_entity_types(self):
+        """
+        Returns the entity types to put in the additional entities of contexts, as
+        returned by the ``context_additional_entities`` core hook.
+
+        :returns: List of entity types.
+        """
+        if self._additional_entity_types is None:
+            self._additional_entity_types = self._tk.execute_core_hook(
+                "context_additional_entities"
+            ).get("entity_types_in_path", [])
+        return self._additional_entity_types
+
+
 def from_path(tk, path, previous_context=None):
     """
     Factory method that constructs a context object from a path on disk.
@@ -1333,6 +1665,8 @@ def from_path(tk, path, previous_context=None):
     The algorithm will navigate upwards in the file system and collect
     as much tank metadata as possible to construct a Tank context.
 
+    The contexts are cached by folder, see :class:`PathContextCache`.
+
     :param path: a file system path
     :param previous_context: A context object to use to try to automatically extend the generated
                              context if it is incomplete when extracted from the path. For example,
@@ -1342,10 +1676,102 @@ def from_path(tk, path, previous_context=None):
     :type previous_context: :class:`Context`
     :returns: :class:`Context`
     """
+    context_cache = tk.get_context_cache()
+    (fields, revision) = context_cache.get(path)
+    if fields is None:
+        ancestor_entities = tk.get_path_cache().get_ancestor_entities(path)
+        fields = _context_fields_from_entities(
+            ancestor_entities, context_cache.get_additional_entity_types()
+        )
+        context_cache.set(revision, ancestor_entities, fields)
+
+    return _context_from_fields(tk, fields, previous_context)
+
+
+def from_paths(tk, paths):
+    """
+    Factory method that constructs context objects from several paths on disk.
+
+    This is equivalent to calling :meth:`from_path` for each path, but the contexts
+    which are not cached are all built from a few path cache queries, looking up
+    the folders shared by the paths only once. These contexts are not added to the
+    cache, as caching them would take a query per folder.
+
+    :param paths: list of file system paths
+    :returns: list of :class:`Context`, in the same order as the paths.
+    """
+    context_cache = tk.get_context_cache()
+    revision = tk.get_path_cache().get_revision()
+
+    fields_by_path = {}
+    uncached_paths = []
+    for path in paths:
+        if path in fields_by_path:
+            continue
+        (fields_by_path[path], _) = context_cache.get(path, revision)
+        if fields_by_path[path] is None:
+            uncached_paths.append(path)
+
+    if uncached_paths:
+        additional_types = context_cache.get_additional_entity_types()
+        ancestor_entities = tk.get_path_cache().get_ancestor_entities_for_paths(uncached_paths)
+        for path, curr_ancestor_entities in zip(uncached_paths, ancestor_entities):
+            fields_by_path[path] = _context_fields_from_entities(curr_ancestor_entities, additional_types)
+
+    # each context gets its own copy of the fields, paths may be repeated.
+    return [
+        _context_from_fields(tk, copy.deepcopy(fields_by_path[path])) for path in paths
+    ]
+
+
+def _context_from_fields(tk, fields, previous_context=None):
+    """
+    Constructs a context from the fields built for a path.
+
+    :param tk: Toolkit API instance.
+    :param dict fields: Context fields, as returned by :meth:`_context_fields_from_entities`.
+    :param previous_context: A context object to use to try to automatically extend the
+                             context, see :meth:`from_path`.
+    :returns: :class:`Context`
+    """
+    context = {"tk": tk}
+    context.update(fields)
+
+    # see if we can populate it based on the previous context
+    if previous_context and \
+       context.get("entity") == previous_context.entity and \
+       context.get("additional_entities") == previous_context.additional_entities:
+
+        # cool, everything is matching down to the step/task level.
+        # if context is missing a step and a task, we try to auto populate it.
+        # (note: weird edge that a context can have a task but no step)
+        if context.get("task") is None and context.get("step") is None:
+            context["step"] = previous_context.step
+
+        # now try to assign previous task but only if the step matches!
+        if context.get("task") is None and context.get("step") == previous_context.step:
+            context["task"] = previous_context.task
+
+    # ensure that we don't have a Project as the entity. Projects should only 
+    # appear on the projects level, despite being entities.
+    if context["project"] and context["entity"] and context["entity"]["type"] == "Project":
+        # remove double entry!
+        context["entity"] = None
+
+    return Context(**context)
 
+
+def _context_fields_from_entities(ancestor_entities, additional_types):
+    """
+    Builds the fields of a context from the entities registered for a path.
+
+    :param ancestor_entities: Entities of the path and of its parent folders, as
+                              returned by :meth:`~tank.path_cache.PathCache.get_ancestor_entities`.
+    :param additional_types: Entity types to put in the additional entities.
+    :returns: Dictionary of :class:`Context` constructor arguments, without tk.
+    """
     # prep our return data structure
     context = {
-        "tk": tk,
         "project": None,
         "entity": None,
         "step": None,
@@ -1354,44 +1780,17 @@ def from_path(tk, path, previous_context=None):
         "additional_entities": []
     }
 
-    # ask hook for extra entity types we should recognize and insert into the additional_entities list.
-    additional_types = tk.execute_core_hook("context_additional_entities").get("entity_types_in_path", [])
-
-    # get a cache handle
-    path_cache = PathCache(tk)
-
-    # gather all roots as lower case
-    project_roots = [x.lower() for x in tk.pipeline_configuration.get_data_roots().values()]
-
     # first gather entities
     entities = []
     secondary_entities = []
-    curr_path = path
-    while True:
-        curr_entity = path_cache.get_entity(curr_path)
+    for _, curr_entity, curr_secondary_entities in ancestor_entities:
         if curr_entity:
             # Don't worry about entity types we've already got in the context. In the future
             # we should look for entity ids that conflict in order to flag a degenerate schema.
             entities.append(curr_entity)
-        
-        # add secondary entities
-        secondary_entities.extend( path_cache.get_secondary_entities(curr_path) )
 
-        if curr_path.lower() in project_roots:
-            #TODO this could fail with windows path variations
-            # we have reached a root!
-            break
-
-        # and continue with parent path
-        parent_path = os.path.abspath(os.path.join(curr_path, ".."))
-
-        if curr_path == parent_path:
-            # We're at the disk root, probably a degenerate path
-            break
-        else:
-            curr_path = parent_path
-
-    path_cache.close()
+        # add secondary entities
+        secondary_entities.extend(curr_secondary_entities)
 
     # now populate the context
     # go from the root down, so that in the case there are a path with
@@ -1441,28 +1840,7 @@ def from_path(tk, path, previous_context=None):
             if context["entity"] is None:
                 context["entity"] = curr_entity
 
-    # see if we can populate it based on the previous context
-    if previous_context and \
-       context.get("entity") == previous_context.entity and \
-       context.get("additional_entities") == previous_context.additional_entities:
-
-        # cool, everything is matching down to the step/task level.
-        # if context is missing a step and a task, we try to auto populate it.
-        # (note: weird edge that a context can have a task but no step)
-        if context.get("task") is None and context.get("step") is None:
-            context["step"] = previous_context.step
-
-        # now try to assign previous task but only if the step matches!
-        if context.get("task") is None and context.get("step") == previous_context.step:
-            context["task"] = previous_context.task
-
-    # ensure that we don't have a Project as the entity. Projects should only 
-    # appear on the projects level, despite being entities.
-    if context["project"] and context["entity"] and context["entity"]["type"] == "Project":
-        # remove double entry!
-        context["entity"] = None
-
-    return Context(**context)
+    return context
 
 
 ################################################################################################
@@ -1583,6 +1961,24 @@ def _get_entity_name(entity_dictionary):
             entity_name = entity_dictionary.get("name")
     return entity_name
 
+def _str_from_unicode(value):
+    """
+    Converts the unicode strings returned by the json module back to utf-8 encoded
+    strings, which is how strings are returned by the Shotgun API.
+
+    :param value: Value decoded from JSON.
+    :returns: The value with all unicode strings, including in nested lists and
+              dictionaries, converted.
+    """
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    elif isinstance(value, list):
+        return [_str_from_unicode(x) for x in value]
+    elif isinstance(value, dict):
+        return dict((_str_from_unicode(k), _str_from_unicode(v)) for k, v in value.iteritems())
+    return value
+
+
 def _task_from_sg(tk, task_id, additional_fields = None):
     """
     Constructs a context from a shotgun task.
@@ -1597,8 +1993,20 @@ def _task_from_sg(tk, task_id, additional_fields = None):
     :param additional_fields:    List of additional fields to query for additional entities.  If this is
                                 'None' then the function will execute the hook to determine them. 
     """
-    context = {}
+    return _tasks_from_sg(tk, [task_id], additional_fields)[task_id]
+
+
+def _tasks_from_sg(tk, task_ids, additional_fields=None):
+    """
+    Constructs contexts from several shotgun tasks, see :meth:`_task_from_sg`.
+    The tasks are retrieved by a single Shotgun query.
 
+    :param tk:                   An Sgtk API instance
+    :param task_ids:             List of shotgun task ids to produce contexts for.
+    :param additional_fields:    List of additional fields to query for additional entities.  If this is
+                                'None' then the function will execute the hook to determine them.
+    :returns: Dictionary with the context data of each task, by task id.
+    """
     # Look up task's step and entity. This information should be static in practice, so we could
     # likely cache it in the future.
 
@@ -1610,92 +2018,105 @@ def _task_from_sg(tk, task_id, additional_fields = None):
         # ask hook for extra Task entity fields we should query and insert into the additional_entities list.
         additional_fields = tk.execute_core_hook("context_additional_entities").get("entity_fields_on_task", [])
 
-    task = tk.shotgun.find_one("Task", [["id","is",task_id]], standard_fields + additional_fields)
-    if not task:
-        raise TankError("Unable to locate Task with id %s in Shotgun" % task_id)
+    tasks = tk.shotgun.find("Task", [["id", "in", list(task_ids)]], standard_fields + additional_fields)
+    tasks = dict((x["id"], x) for x in tasks)
 
-    # add task so it can be processed with other shotgun entities
-    task["task"] = {"type": "Task", "id": task_id, "name": task["content"]}
+    contexts = {}
+    for task_id in task_ids:
+        task = tasks.get(task_id)
+        if not task:
+            raise TankError("Unable to locate Task with id %s in Shotgun" % task_id)
 
-    for key in context_keys + additional_fields:
-        data = task.get(key)
-        if data is None:
-            # gracefully skip stuff we don't have
-            # for example tasks may not have a step
-            continue
+        # add task so it can be processed with other shotgun entities
+        task["task"] = {"type": "Task", "id": task_id, "name": task["content"]}
 
-        # be explicit about what we pull in - make no assumptions about what is
-        # being returned from sg (the unit tests mocker doesn't return the same as the API)
-        value = {
-            "name": data.get("name"),
-            "id": data.get("id"),
-            "type": data.get("type")
-        }
+        context = {}
+        for key in context_keys + additional_fields:
+            data = task.get(key)
+            if data is None:
+                # gracefully skip stuff we don't have
+                # for example tasks may not have a step
+                continue
 
-        if key in context_keys:
-            context[key] = value
-        elif key in additional_fields:
-            additional_entities = context.get("additional_entities", [])
-            additional_entities.append(value)
-            context["additional_entities"] = additional_entities
+            # be explicit about what we pull in - make no assumptions about what is
+            # being returned from sg (the unit tests mocker doesn't return the same as the API)
+            value = {
+                "name": data.get("name"),
+                "id": data.get("id"),
+                "type": data.get("type")
+            }
 
-    return context
+            if key in context_keys:
+                context[key] = value
+            elif key in additional_fields:
+                additional_entities = context.get("additional_entities", [])
+                additional_entities.append(value)
+                context["additional_entities"] = additional_entities
+
+        contexts[task_id] = context
 
+    return contexts
 
-def _entity_from_sg(tk, entity_type, entity_id):
+
+def _entities_from_sg(tk, entity_type, entity_ids):
     """
-    Determines the entity details for the specified entity type and id by querying Shotgun.
-                        
-    If entity_type is 'Project' then this will return a single dictionary for the project.  For all
-    other entity types, this will return dictionaries for both the entity and the project the entity 
-    exists under.
-                        
+    Determines the entity details for several entities of the same type by querying
+    Shotgun once.
+
+    If entity_type is 'Project' then the context data of each entity is a single dictionary
+    for the project.  For all other entity types, it contains dictionaries for both the entity
+    and the project the entity exists under.
+
     :param tk:          The sgtk api instance
-    :param entity_type: The entity type to build a context for
-    :param entity_id:   The entity id to build a context for
-    :returns:           Dictionary containing either a project entity-dictionary or both
-                        project and entity entity-dictionaries depending on the input entity type.
-                        e.g. 
+    :param entity_type: The entity type to build contexts for
+    :param entity_ids:  List of entity ids to build contexts for
+    :returns:           Dictionary with the context data of each entity, by entity id.
+                        e.g.
                         {
-                            "project":{"type":"Project", "id":123, "name":"My Project"},
-                            "entity":{"type":"Shot", "id":456, "name":"My Shot"}
+                            456: {
+                                "project":{"type":"Project", "id":123, "name":"My Project"},
+                                "entity":{"type":"Shot", "id":456, "name":"My Shot"}
+                            }
                         }
-                            
     """
     # get the sg name field for the specified entity type:
     name_field = _get_entity_type_sg_name_field(entity_type)
     
     # get the entity data from Shotgun
-    data = tk.shotgun.find_one(entity_type, [["id", "is", entity_id]], ["project", name_field])
+    sg_data = tk.shotgun.find(entity_type, [["id", "in", list(entity_ids)]], ["project", name_field])
+    sg_data = dict((x["id"], x) for x in sg_data)
 
-    if not data:
-        raise TankError("Unable to locate %s with id %s in Shotgun" % (entity_type, entity_id))
+    contexts = {}
+    for entity_id in entity_ids:
+        data = sg_data.get(entity_id)
+        if not data:
+            raise TankError("Unable to locate %s with id %s in Shotgun" % (entity_type, entity_id))
 
-    # create context
-    context = {}
-    
-    if entity_type == "Project":
-        context["project"] = {"type":"Project", "id": entity_id, "name": data.get(name_field) }
-    
-    else:
-        context["entity"] = {"type": entity_type, "id": entity_id, "name": data.get(name_field) }
-        context["project"] = data.get("project")     
+        # create context
+        context = {}
 
-    return context
+        if entity_type == "Project":
+            context["project"] = {"type":"Project", "id": entity_id, "name": data.get(name_field) }
 
+        else:
+            context["entity"] = {"type": entity_type, "id": entity_id, "name": data.get(name_field) }
+            context["project"] = data.get("project")
+
+        contexts[entity_id] = context
+
+    return contexts
 
-def _context_data_from_cache(tk, entity_type, entity_id):
-    """Adds data to context based on path cache.
+
+def _contexts_data_from_cache(tk, entity_type, entity_ids):
+    """
+    Adds data to the contexts of several entities of the same type based on path cache.
+    The paths of all the entities and all their parent folders are looked up together.
 
     :param tk: a Sgtk API instance
     :param entity_type: a Shotgun entity type
-    :param entity_id: a Shotgun entity id
+    :param entity_ids: list of Shotgun entity ids
+    :returns: Dictionary with the context data of each entity, by entity id.
     """
-    context = {}
-
-    # Set entity info for input entity
-    context["entity"] = {"type": entity_type, "id": entity_id}
-
     # Map entity types to context fields
     types_fields = {"Project": "project",
                     "Step": "step",
@@ -1703,55 +2124,63 @@ def _context_data_from_cache(tk, entity_type, entity_id):
 
     # Use the path cache to look up all paths linked to the entity and use that to extract
     # extra entities we should include in the context
-    path_cache = PathCache(tk)
-
-    # Grab all project roots
-    project_roots = tk.pipeline_configuration.get_data_roots().values()
+    path_cache = tk.get_path_cache()
 
     # Special case for project as we have the primary data path, which 
     # always points at a project. We only check if the associated configuration
     # has any associated data roots, otherwise a primary config won't exist.
     if tk.pipeline_configuration.has_associated_data_roots():
-        context["project"] = path_cache.get_entity(tk.pipeline_configuration.get_primary_data_root())
+        project = path_cache.get_entity(tk.pipeline_configuration.get_primary_data_root())
     else:
-        context["project"] = None
-
-    paths = path_cache.get_paths(entity_type, entity_id, primary_only=True)
-
-    for path in paths:
-        # now recurse upwards and look for entity types we haven't found yet
-        curr_path = path
-        curr_entity = path_cache.get_entity(curr_path)
-        
-        if curr_entity is None:
-            # this is some sort of anomaly! the path returned by get_paths
-            # does not resolve in get_entity. This can happen if the storage
-            # mappings are not consistent or if there is not a 1 to 1 relationship
-            #
-            # This can also happen if there are extra slashes at the end of the path
-            # in the local storage defs and in the pipeline_configuration.yml file.
-            raise TankError("The path '%s' associated with %s id %s does not " 
-                            "resolve correctly. This may be an indication of an issue "
-                            "with the local storage setup. Please contact %s." 
-                            % (curr_path, entity_type, entity_id, constants.SUPPORT_EMAIL))
-
-        # grab the name for the context entity
-        if curr_entity["type"] == entity_type and curr_entity["id"] == entity_id:
-            context["entity"]["name"] = curr_entity["name"]
-
-        # note - paths returned by get_paths are always prefixed with a
-        # project root so there is no risk we end up with an infinite loop here..
-        while curr_path not in project_roots:
-            curr_path = os.path.abspath(os.path.join(curr_path, ".."))
-            curr_entity = path_cache.get_entity(curr_path)
-            if curr_entity:
-                cur_type = curr_entity["type"]
-                if cur_type in types_fields:
-                    field_name = types_fields[cur_type]
-                    context[field_name] = curr_entity
-
-    path_cache.close()
-    return context
+        project = None
+
+    paths_by_id = path_cache.get_paths_for_entities(entity_type, entity_ids, primary_only=True)
+    all_paths = []
+    for entity_id in entity_ids:
+        all_paths.extend(paths_by_id[entity_id])
+    ancestor_entities = dict(zip(all_paths, path_cache.get_ancestor_entities_for_paths(all_paths)))
+
+    contexts = {}
+    for entity_id in entity_ids:
+        context = {}
+
+        # Set entity info for input entity
+        context["entity"] = {"type": entity_type, "id": entity_id}
+        context["project"] = copy.copy(project)
+
+        for path in paths_by_id[entity_id]:
+            # the first folder is the path itself, followed by its parent folders
+            # up to the project root.
+            folders = ancestor_entities[path]
+            curr_entity = folders[0][1] if folders else None
+
+            if curr_entity is None:
+                # this is some sort of anomaly! the path returned by get_paths
+                # does not resolve in get_entity. This can happen if the storage
+                # mappings are not consistent or if there is not a 1 to 1 relationship
+                #
+                # This can also happen if there are extra slashes at the end of the path
+                # in the local storage defs and in the pipeline_configuration.yml file.
+                raise TankError("The path '%s' associated with %s id %s does not " 
+                                "resolve correctly. This may be an indication of an issue "
+                                "with the local storage setup. Please contact %s." 
+                                % (path, entity_type, entity_id, constants.SUPPORT_EMAIL))
+
+            # grab the name for the context entity
+            if curr_entity["type"] == entity_type and curr_entity["id"] == entity_id:
+                context["entity"]["name"] = curr_entity["name"]
+
+            # now look upwards for entity types we haven't found yet
+            for _, curr_entity, _ in folders[1:]:
+                if curr_entity:
+                    cur_type = curr_entity["type"]
+                    if cur_type in types_fields:
+                        field_name = types_fields[cur_type]
+                        context[field_name] = curr_entity
+
+        contexts[entity_id] = context
+
+    return contexts
 
 
 def _values_from_path_cache(entity, cur_template, path_cache, required_fields):
@@ -19,7 +19,6 @@ Known constraints:
 from . import constants
 from ..errors import TankError
 
-from ..path_cache import PathCache
     
 class FolderIOReceiver(object):
     """
@@ -48,28 +47,84 @@ class FolderIOReceiver(object):
     # methods to call to actually execute the folder creation logic
         
     @classmethod
-    def sync_path_cache(cls, tk, full_sync):
+    def sync_path_cache(cls, tk, full_sync, progress_callback=None):
         """
         Synchronizes the path cache folders.
         This happens as part of execute_folder_creation(), but sometimes it is 
         useful to be able to execute this as a separate process.
 
+        The folder creation hook is run for each page of new folders as soon as
+        it has been synchronized, so that large syncs are not held in memory.
+
         :param tk: A tk API instance
         :param full_sync: Do a full sync
+        :param progress_callback: Optional callable reporting the progress of full syncs,
+                                  see :meth:`~tank.path_cache.PathCache.synchronize`.
         :returns: A list of paths which were calculated to be created
         """        
-        path_cache = PathCache(tk)
+        path_cache = tk.get_path_cache()
+
+        # all folders that were computed
+        folders = []
+
+        # now run the path cache synchronization and create the folders which are
+        # not locally available, page by page as they are synchronized.
+        path_cache.synchronize(
+            full_sync,
+            progress_callback,
+            lambda items: folders.extend(cls.create_remote_folders(tk, items))
+        )
+
+        return folders
+
+    @classmethod
+    def create_remote_folders(cls, tk, items):
+        """
+        Creates the folders of the items found by a path cache synchronization.
+
+        :param tk: A tk API instance
+        :param items: List of dicts with keys entity, metadata and path, as
+                      returned by :meth:`~tank.path_cache.PathCache.synchronize`.
+        :returns: A list of the paths of the folders
+        """
+        # for each item we get back from the path cache synchronization,
+        # issue a remote entity folder request and pass that down to 
+        # the folder creation hook. This way, folders can be auto created
+        # across multiple locations if desirable.            
+        remote_items = []
+        for i in items:
+            remote_items.append( {"action": "remote_entity_folder",
+                                  "path": i["path"],
+                                  "metadata": i["metadata"],
+                                  "entity": i["entity"] })
+
+        if len(remote_items) > 0:
+            # execute the actual I/O
+            tk.execute_core_hook(constants.PROCESS_FOLDER_CREATION_HOOK_NAME, 
+                                 items=remote_items, 
+                                 preview_mode=False)
+
+        return [i["path"] for i in remote_items]
         
-        try:
         
-            # now run the path cache synchronization and see if there are any folders which 
-            # should be created locally.
-            remote_items = []
-    
+    def execute_folder_creation(self):
+        """
+        Runs the actual folder execution. 
+        
+        :returns: A list of paths which were calculated to be created
+        """
+        
+        path_cache = self._tk.get_path_cache()
+
+        # because the sync can make changes to the path cache, do not run in preview mode
+        remote_items = []
+        if not self._preview_mode: 
+            
+            # request that the path cache is synced against shotgun
             # new items that were not locally available are returned
             # as a list of dicts with keys id, type, name, configuration and path
-            rd = path_cache.synchronize(full_sync)
-                
+            rd = path_cache.synchronize()
+            
             # for each item we get back from the path cache synchronization,
             # issue a remote entity folder request and pass that down to 
             # the folder creation hook. This way, folders can be auto created
@@ -79,121 +134,68 @@ class FolderIOReceiver(object):
                                       "path": i["path"],
                                       "metadata": i["metadata"],
                                       "entity": i["entity"] })
+    
+        # put together a list of entries we should pass to the database
+        db_entries = []
         
+        for i in self._items:
+            if i.get("action") == "entity_folder":
+                db_entries.append( {"entity": i["entity"], 
+                                    "path": i["path"], 
+                                    "primary": True, 
+                                    "metadata": i["metadata"]} )
+                
+        for i in self._secondary_cache_entries:
+            db_entries.append( {"entity": i["entity"], 
+                                "path": i["path"], 
+                                "primary": False, 
+                                "metadata": i["metadata"]} )
+        
+        
+        
+        # now that we are synced up with all remote sites,
+        # validate the data before we push it into the databse. 
+        # to properly cover some edge cases        
+        try:
+            path_cache.validate_mappings(db_entries)
+        except TankError, e:
+            # validation problems!
+            # before we bubble up these errors to the caller, we need to 
+            # take care of any folders that were possibly created during
+            # the syncing:
             if len(remote_items) > 0:
-                # execute the actual I/O
-                tk.execute_core_hook(constants.PROCESS_FOLDER_CREATION_HOOK_NAME, 
-                                     items=remote_items, 
-                                     preview_mode=False)
+                self._tk.execute_core_hook(constants.PROCESS_FOLDER_CREATION_HOOK_NAME, 
+                                           items=remote_items, 
+                                           preview_mode=self._preview_mode)
             
-            # return all folders that were computed
-            folders = []
-            for i in remote_items:
-                action = i.get("action")
-                if action in ["entity_folder", "create_file", "folder", "remote_entity_folder"]:
-                    folders.append( i["path"] )
-                elif action == "copy":
-                    folders.append( i["target_path"] )        
-
-        finally:
-            path_cache.close()
-
-        return folders
+            # ok folders created for synced stuff. Now re-raise validation error
+            raise TankError("Folder creation aborted: %s" % e) 
         
         
-    def execute_folder_creation(self):
-        """
-        Runs the actual folder execution. 
+        # validation passed!
+        # now request the IO operations to take place
+        # note that we pass both the items that were created from syncing with remote
+        # and the new folders that have been computed
         
-        :returns: A list of paths which were calculated to be created
-        """
+        folder_creation_items = remote_items + self._items
         
-        path_cache = PathCache(self._tk)
-        
-        try:
-            # because the sync can make changes to the path cache, do not run in preview mode
-            remote_items = []
-            if not self._preview_mode: 
-                
-                # request that the path cache is synced against shotgun
-                # new items that were not locally available are returned
-                # as a list of dicts with keys id, type, name, configuration and path
-                rd = path_cache.synchronize()
-                
-                # for each item we get back from the path cache synchronization,
-                # issue a remote entity folder request and pass that down to 
-                # the folder creation hook. This way, folders can be auto created
-                # across multiple locations if desirable.            
-                for i in rd:
-                    remote_items.append( {"action": "remote_entity_folder",
-                                          "path": i["path"],
-                                          "metadata": i["metadata"],
-                                          "entity": i["entity"] })
+        self._tk.execute_core_hook(constants.PROCESS_FOLDER_CREATION_HOOK_NAME, 
+                                   items=folder_creation_items, 
+                                   preview_mode=self._preview_mode)
         
-            # put together a list of entries we should pass to the database
-            db_entries = []
-            
-            for i in self._items:
-                if i.get("action") == "entity_folder":
-                    db_entries.append( {"entity": i["entity"], 
-                                        "path": i["path"], 
-                                        "primary": True, 
-                                        "metadata": i["metadata"]} )
-                    
-            for i in self._secondary_cache_entries:
-                db_entries.append( {"entity": i["entity"], 
-                                    "path": i["path"], 
-                                    "primary": False, 
-                                    "metadata": i["metadata"]} )
-            
-            
-            
-            # now that we are synced up with all remote sites,
-            # validate the data before we push it into the databse. 
-            # to properly cover some edge cases        
-            try:
-                path_cache.validate_mappings(db_entries)
-            except TankError, e:
-                # validation problems!
-                # before we bubble up these errors to the caller, we need to 
-                # take care of any folders that were possibly created during
-                # the syncing:
-                if len(remote_items) > 0:
-                    self._tk.execute_core_hook(constants.PROCESS_FOLDER_CREATION_HOOK_NAME, 
-                                               items=remote_items, 
-                                               preview_mode=self._preview_mode)
-                
-                # ok folders created for synced stuff. Now re-raise validation error
-                raise TankError("Folder creation aborted: %s" % e) 
-            
-            
-            # validation passed!
-            # now request the IO operations to take place
-            # note that we pass both the items that were created from syncing with remote
-            # and the new folders that have been computed
-            
-            folder_creation_items = remote_items + self._items
-            
-            self._tk.execute_core_hook(constants.PROCESS_FOLDER_CREATION_HOOK_NAME, 
-                                       items=folder_creation_items, 
-                                       preview_mode=self._preview_mode)
-            
-            # database data was validated, folders on disk created
-            # finally store all our new data in the path cache and in shotgun
-            if not self._preview_mode:
-                path_cache.add_mappings(db_entries, self._entity_type, self._entity_ids)
-    
-            # return all folders that were computed 
-            folders = []
-            for i in folder_creation_items:
-                action = i.get("action")
-                if action in ["entity_folder", "create_file", "folder", "remote_entity_folder"]:
-                    folders.append( i["path"] )
-                elif action == "copy":
-                    folders.append( i["target_path"] )        
+        # database data was validated, folders on disk created
+        # finally store all our new data in the path cache and in shotgun
+        if not self._preview_mode:
+            path_cache.add_mappings(db_entries, self._entity_type, self._entity_ids)
 
-        finally:
-            path_cache.close()
+        # return all folders that were computed 
+        folders = []
+        for i in folder_creation_items:
+            action = i.get("action")
+            if action in ["entity_folder", "create_file", "folder", "remote_entity_folder"]:
+                folders.append( i["path"] )
+            elif action == "copy":
+                folders.append( i["target_path"] )        
 
         return folders
             
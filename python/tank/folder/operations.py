@@ -90,16 +90,18 @@ def create_single_folder_item(tk, config_obj, io_receiver, entity_type, entity_i
         
 
 
-def synchronize_folders(tk, full_sync):
+def synchronize_folders(tk, full_sync, progress_callback=None):
     """
     Synchronizes any remote folders to ensure they are present both 
     in the file system and in any local folder caches
     
     :param tk: A tk API instance
     :param full_sync: Do a full sync
+    :param progress_callback: Optional callable reporting the progress of full syncs,
+                              see :meth:`~tank.path_cache.PathCache.synchronize`.
     :returns: list of items processed
     """
-    return FolderIOReceiver.sync_path_cache(tk, full_sync)
+    return FolderIOReceiver.sync_path_cache(tk, full_sync, progress_callback)
 
     
 def process_filesystem_structure(tk, entity_type, entity_ids, preview, engine):    
@@ -15,10 +15,18 @@ all Tank items in the file system are kept.
 """
 
 import collections
+import copy
+import time
 import sqlite3
 import sys
 import os
 import itertools
+import threading
+import thread
+import weakref
+import shutil
+import hashlib
+import gzip
 
 # use api json to cover py 2.5
 # todo - replace with proper external library  
@@ -30,6 +38,8 @@ from . import constants
 from .errors import TankError
 from . import LogManager
 from .util.login import get_current_user
+from .util import filesystem
+from .util.lru_cache import LRUCache
 
 # Shotgun field definitions to store the path cache data
 SHOTGUN_ENTITY = "FilesystemLocation"
@@ -42,6 +52,17 @@ SG_ENTITY_TYPE_FIELD = "linked_entity_type"
 SG_ENTITY_NAME_FIELD = "code"
 SG_PIPELINE_CONFIG_FIELD = "pipeline_configuration"
 
+# FilesystemLocation fields needed to populate the path cache
+SG_FILESYSTEM_LOCATION_FIELDS = [
+    "id",
+    SG_METADATA_FIELD,
+    SG_IS_PRIMARY_FIELD,
+    SG_ENTITY_ID_FIELD,
+    SG_PATH_FIELD,
+    SG_ENTITY_TYPE_FIELD,
+    SG_ENTITY_NAME_FIELD
+]
+
 log = LogManager.get_logger(__name__)
 
 class PathCache(object):
@@ -50,6 +71,21 @@ class PathCache(object):
     
     NOTE! This uses sqlite and the db is typically hosted on an NFS storage.
     Ensure that the code is developed with the constraints that this entails in mind.
+
+    If the ``SGTK_PATH_CACHE_REPLICA_ROOT`` environment variable is set to a local
+    folder, lookups are done in a read only copy of the db kept in this folder, so
+    that they don't contend on the NFS locks. The copy is refreshed every time the
+    path cache is synchronized or new mappings are added, and when lookups find that
+    the db was modified by other processes. Changes are always written to the db itself.
+
+    The results of :meth:`get_entity`, :meth:`get_paths`, :meth:`get_secondary_entities`
+    and :meth:`get_shotgun_id_from_path` are also kept in a bounded in memory cache,
+    which is updated when mappings are added and cleared when the path cache is
+    synchronized or folders are unregistered. This applies to all the path caches of
+    the process which use the same db. The cache is also cleared when the db file
+    is found to have been modified by other processes, which is checked at most once
+    every ``DB_CHANGE_CHECK_INTERVAL`` seconds. Lookups which found nothing are not
+    cached.
     """
 
     # sqlite has a limit for how many items fit into a single in statement
@@ -65,36 +101,142 @@ class PathCache(object):
     # to do so.
     SHOTGUN_ENTITY_QUERY_BATCH_SIZE = 500
 
+    # The database file is checked for changes made by other processes at most
+    # once every this many seconds, see _check_for_db_changes.
+    DB_CHANGE_CHECK_INTERVAL = 5
+
+    # Folder event log entries are synchronized in pages of this size, each
+    # page being committed to the database with its sync marker so that an
+    # interrupted sync resumes from the last page it completed.
+    SHOTGUN_EVENT_QUERY_PAGE_SIZE = 500
+
+    # prefix of the names of the temporary tables full syncs are written to.
+    _FULL_SYNC_TABLE_PREFIX = "temp.full_sync_"
+
+    # FilesystemLocation entities are created in Shotgun by batch requests
+    # of at most this many entities, so that large folder creations don't
+    # end up in a single request that may time out.
+    SHOTGUN_CREATE_BATCH_SIZE = 100
+
+    # all the path caches of the process, by id, so that changes made through
+    # one of them can be reflected in the lookup caches of the others.
+    _instances = weakref.WeakValueDictionary()
+
     def __init__(self, tk):
         """
         Constructor.
-        
+
+        A path cache can be used from several threads, each thread getting its own
+        connection to the database. :meth:`sgtk.Sgtk.get_path_cache` returns a path
+        cache shared by all the users of a Toolkit API instance.
+
         :param tk: Toolkit API instance
         """
-        self._connection = None
         self._tk = tk
         self._sync_with_sg = tk.pipeline_configuration.get_shotgun_path_cache_enabled()
+        self._path_cache_file = None
+        self._replica_file = None
+
+        # sqlite connections can't be used by several threads at the same time,
+        # so each thread gets its own connection.
+        self._thread_data = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        # results of the lookups, keyed by lookup type and arguments
+        self._lookup_cache = LRUCache(_get_default_lookup_cache_size())
+
+        # incremented whenever the data seen by the lookups changes
+        self._revision = 0
+
+        # modification time and size of the database when last checked for
+        # changes made by other processes, and when that was.
+        self._db_version = None
+        self._db_checked_at = 0
+
+        # syncs are serialized
+        self._sync_lock = threading.Lock()
 
         if tk.pipeline_configuration.has_associated_data_roots():
             self._path_cache_disabled = False
             self._init_db()
             self._roots = tk.pipeline_configuration.get_data_roots()
+            PathCache._instances[id(self)] = self
+
+            replica_root = os.environ.get(constants.PATH_CACHE_REPLICA_ROOT_ENV_VAR)
+            if replica_root:
+                self._replica_file = os.path.join(
+                    os.path.expanduser(os.path.expandvars(replica_root)),
+                    "path_cache_%s.db" % hashlib.sha1(self._path_cache_file).hexdigest()
+                )
         else:
             # no primary location found. Path cache therefore does not exist!
             # go into a no-path-cache-mode
             self._path_cache_disabled = True
-    
-    def _init_db(self):
+
+    @property
+    def _connection(self):
         """
-        Sets up the database
+        Connection to the database for the current thread, opened on first use.
+        None if there is no path cache.
         """
-        # first, make way for the path cache file. This call
-        # will ensure that there is a valid folder and file on
-        # disk, created with all the right permissions etc.
-        path_cache_file = self._get_path_cache_location()
-        
-        self._connection = sqlite3.connect(path_cache_file)
-        
+        connection = getattr(self._thread_data, "connection", None)
+        if connection is None and self._path_cache_file:
+            connection = self._connect(self._path_cache_file)
+            self._thread_data.connection = connection
+        return connection
+
+    @property
+    def _read_connection(self):
+        """
+        Connection used by the current thread for lookups which don't need to see
+        changes made since the path cache was last synchronized. This is a connection
+        to the local replica of the database if there is one or to the database itself.
+        """
+        if not self._replica_file:
+            return self._connection
+
+        # long lived processes which only read need to see the changes made by others.
+        self._check_for_db_changes()
+
+        try:
+            stat = os.stat(self._replica_file)
+        except OSError:
+            # first use of the replica on this host
+            self._refresh_replica()
+            try:
+                stat = os.stat(self._replica_file)
+            except OSError:
+                # the replica couldn't be created, it has been logged already.
+                return self._connection
+
+        # the replica is replaced when refreshed, reconnect whenever it changes.
+        replica_version = (stat.st_ino, stat.st_mtime, stat.st_size)
+        connection = getattr(self._thread_data, "replica_connection", None)
+        if connection is not None and self._thread_data.replica_version != replica_version:
+            with self._connections_lock:
+                if connection in self._connections:
+                    self._connections.remove(connection)
+            connection.close()
+            connection = None
+
+        if connection is None:
+            connection = self._connect(self._replica_file)
+            self._thread_data.replica_connection = connection
+            self._thread_data.replica_version = replica_version
+        return connection
+
+    def _connect(self, path):
+        """
+        Opens a connection to a database for the current thread.
+
+        :param path: Path to the database file.
+        :returns: sqlite3 connection.
+        """
+        # the connection is only ever used by the current thread but it
+        # can be closed from any thread.
+        connection = sqlite3.connect(path, check_same_thread=False)
+
         # this is to handle unicode properly - make sure that sqlite returns 
         # str objects for TEXT fields rather than unicode. Note that any unicode
         # objects that are passed into the database will be automatically
@@ -102,8 +244,89 @@ class PathCache(object):
         # representation will work for any language, as long as data is either input
         # as UTF-8 (byte string) or unicode. And in the latter case, the returned data
         # will always be unicode.
-        self._connection.text_factory = str
-        
+        connection.text_factory = str
+
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    @filesystem.with_cleared_umask
+    def _refresh_replica(self):
+        """
+        Updates the local replica of the database if the database changed since the
+        replica was last refreshed.
+
+        The database is copied to a temporary file which then replaces the replica, so
+        that processes reading the replica never see a partial copy. Errors are logged,
+        lookups then fall back on the database itself.
+        """
+        if not self._replica_file:
+            return
+
+        tmp_file = "%s.%d.%d.tmp" % (self._replica_file, os.getpid(), thread.get_ident())
+        try:
+            filesystem.ensure_folder_exists(os.path.dirname(self._replica_file))
+
+            # hold a shared lock on the database while it is copied so that
+            # no other process can commit changes half way through the copy.
+            connection = sqlite3.connect(self._path_cache_file, isolation_level=None)
+            try:
+                connection.execute("BEGIN")
+                connection.execute("SELECT count(*) FROM sqlite_master").fetchall()
+
+                # the replica has the modification time of the database it was copied
+                # from, which tells if it is up to date.
+                db_stat = os.stat(self._path_cache_file)
+                if os.path.exists(self._replica_file):
+                    replica_stat = os.stat(self._replica_file)
+                    if (replica_stat.st_mtime, replica_stat.st_size) == (db_stat.st_mtime, db_stat.st_size):
+                        log.debug("Path cache replica %s is up to date." % self._replica_file)
+                        return
+
+                shutil.copyfile(self._path_cache_file, tmp_file)
+                connection.execute("ROLLBACK")
+            finally:
+                connection.close()
+
+            os.chmod(tmp_file, 0666)
+            os.utime(tmp_file, (db_stat.st_atime, db_stat.st_mtime))
+
+            if sys.platform == "win32" and os.path.exists(self._replica_file):
+                # renaming doesn't replace existing files on windows
+                self._close_replica_connections()
+                filesystem.safe_delete_file(self._replica_file)
+            os.rename(tmp_file, self._replica_file)
+        except Exception, e:
+            log.warning("Could not refresh path cache replica %s: %s" % (self._replica_file, e))
+            if os.path.exists(tmp_file):
+                filesystem.safe_delete_file(tmp_file)
+            return
+
+        log.debug("Refreshed path cache replica %s from %s" % (self._replica_file, self._path_cache_file))
+
+    def _close_replica_connections(self):
+        """
+        Closes the connections to the replica opened by the current thread.
+        """
+        connection = getattr(self._thread_data, "replica_connection", None)
+        if connection is not None:
+            with self._connections_lock:
+                if connection in self._connections:
+                    self._connections.remove(connection)
+            connection.close()
+            self._thread_data.replica_connection = None
+
+    def _init_db(self):
+        """
+        Sets up the database
+        """
+        # first, make way for the path cache file. This call
+        # will ensure that there is a valid folder and file on
+        # disk, created with all the right permissions etc.
+        self._path_cache_file = self._get_path_cache_location()
+
+        # the schema is only checked once, connections opened later
+        # by other threads use it as is.
         c = self._connection.cursor()
         try:
         
@@ -281,16 +504,171 @@ class PathCache(object):
 
     def close(self):
         """
-        Close the database connection.
+        Close the database connections of all the threads.
+
+        The path cache can still be used afterwards, new connections are opened
+        when needed.
+        """
+        with self._connections_lock:
+            connections = self._connections
+            self._connections = []
+            # forget the connections of all the threads
+            self._thread_data = threading.local()
+        for connection in connections:
+            connection.close()
+
+    def get_lookup_cache_stats(self):
+        """
+        Returns statistics about the in memory cache of the results of the lookups::
+
+            >>> path_cache.get_lookup_cache_stats()
+            {'hits': 3, 'misses': 2, 'size': 2, 'max_size': 1000}
+
+        :returns: Dictionary with the number of ``hits`` and ``misses`` since the
+                  cache was created or last cleared, the current ``size`` and the
+                  ``max_size`` of the cache.
+        """
+        return self._lookup_cache.get_stats()
+
+    def set_lookup_cache_size(self, max_size):
+        """
+        Sets the maximum number of lookups whose results are kept in memory. The default
+        size can be set with the ``SGTK_PATH_CACHE_LOOKUP_CACHE_SIZE`` environment variable.
+
+        :param int max_size: Maximum number of cached lookups. Use 0 to disable the cache.
+        """
+        self._lookup_cache.max_size = max_size
+
+    def clear_lookup_cache(self):
+        """
+        Removes all the results of lookups kept in memory and resets the cache statistics.
+        """
+        self._lookup_cache.clear()
+
+    def get_revision(self):
+        """
+        Returns a number which changes whenever mappings are added, synchronized or
+        removed, so that data derived from the path cache can tell if it is out of date.
+        Changes committed to the database by other processes are taken into account
+        within ``DB_CHANGE_CHECK_INTERVAL`` seconds.
+
+        :returns: Revision number.
+        """
+        self._check_for_db_changes()
+        return self._revision
+
+    def _check_for_db_changes(self):
+        """
+        Clears the lookup cache if the database file changed since it was last checked,
+        which is how changes committed by other processes are noticed. The local replica
+        of the database, if any, is then refreshed as well.
+
+        Only the modification time and size of the file are compared, at most once every
+        ``DB_CHANGE_CHECK_INTERVAL`` seconds, so that lookups don't query the database,
+        which is typically on NFS storage. Changes made by this process are handled
+        right away by :meth:`_invalidate_lookups` and :meth:`_clear_lookup_caches`.
+        """
+        if self._path_cache_disabled:
+            return
+
+        now = time.time()
+        if now - self._db_checked_at < self.DB_CHANGE_CHECK_INTERVAL:
+            return
+        self._db_checked_at = now
+
+        try:
+            stat = os.stat(self._path_cache_file)
+        except OSError:
+            return
+
+        db_version = (stat.st_mtime, stat.st_size)
+        if db_version != self._db_version:
+            self._db_version = db_version
+
+            # the replica has the modification time of the database it was copied from.
+            if self._replica_file:
+                try:
+                    replica_stat = os.stat(self._replica_file)
+                except OSError:
+                    replica_stat = None
+                if replica_stat is None or (replica_stat.st_mtime, replica_stat.st_size) != db_version:
+                    self._refresh_replica()
+
+            self._revision += 1
+            self.clear_lookup_cache()
+
+    def _get_path_caches_sharing_db(self):
+        """
+        Returns the path caches of the process which use the same database as this one.
+
+        :returns: List of :class:`PathCache`, including this one.
+        """
+        return [
+            path_cache for path_cache in PathCache._instances.values()
+            if path_cache._path_cache_file == self._path_cache_file
+        ] or [self]
+
+    def _cached_lookup(self, cache_key, lookup, *args):
         """
-        if self._connection is not None:
-            self._connection.close()
-            self._connection = None
+        Returns the result of a lookup, from the in memory cache if possible.
+
+        :param cache_key: Key of the lookup in the cache.
+        :param lookup: Method doing the lookup in the database if it is not cached.
+        :param args: Arguments passed to the lookup method.
+        :returns: Copy of the result of the lookup.
+        """
+        if not self._lookup_cache.max_size:
+            return lookup(*args)
+
+        self._check_for_db_changes()
+        result = self._lookup_cache.get(cache_key, _NOT_CACHED)
+        if result is _NOT_CACHED:
+            result = lookup(*args)
+            # the mapping may be added soon, by this process or another one.
+            if result is not None:
+                self._lookup_cache.set(cache_key, result)
+
+        # don't let callers modify the cached results
+        return copy.deepcopy(result)
+
+    def _invalidate_lookups(self, path, entity):
+        """
+        Removes the cached lookups affected by a new mapping from the lookup caches
+        of all the path caches using this database.
+
+        :param path: Path of the mapping.
+        :param entity: Shotgun entity dict with keys type and id.
+        """
+        cache_keys = [
+            ("paths", entity["type"], entity["id"], True),
+            ("paths", entity["type"], entity["id"], False),
+        ]
+        try:
+            root_name, relative_path = self._separate_root(path)
+        except TankError:
+            pass
+        else:
+            db_path = self._path_to_dbpath(relative_path)
+            for lookup_type in ("entity", "secondary_entities", "shotgun_id"):
+                cache_keys.append((lookup_type, root_name, db_path))
+
+        for path_cache in self._get_path_caches_sharing_db():
+            path_cache._revision += 1
+            for cache_key in cache_keys:
+                path_cache._lookup_cache.pop(cache_key)
+
+    def _clear_lookup_caches(self):
+        """
+        Clears the lookup caches of all the path caches using this database.
+        """
+        for path_cache in self._get_path_caches_sharing_db():
+            path_cache._revision += 1
+            path_cache.clear_lookup_cache()
                 
     ############################################################################################
     # shotgun synchronization (SG data pushed into path cache database)
 
-    def synchronize(self, full_sync=False):
+    def synchronize(self, full_sync=False, progress_callback=None, items_callback=None):
         """
         Ensure the local path cache is in sync with Shotgun. 
         
@@ -298,6 +676,12 @@ class PathCache(object):
         launch the busy overlay window.
 
         :param full_sync: Boolean to indicate that a full sync should be carried out. 
+        :param progress_callback: Optional callable invoked during full syncs each time
+                                  a page of FilesystemLocation entries has been written,
+                                  with the number of entries processed so far.
+        :param items_callback: Optional callable invoked with the list of new remote items
+                               of each page of entries written, instead of returning them
+                               all at the end. This keeps memory use bounded for large syncs.
         
         :returns: A list of remote items which were detected, created remotely
                   and not existing in this path cache. These are returned as a list of 
@@ -305,12 +689,94 @@ class PathCache(object):
                     - entity
                     - metadata 
                     - path
+                  The list is empty if an items callback was given.
         """
 
         if self._path_cache_disabled:
             log.debug("This project does not have any associated folders.")
             return []        
         
+        with self._sync_lock:
+            try:
+                new_items = self._synchronize(full_sync, progress_callback, items_callback=items_callback)
+            finally:
+                # lookups now need to see the synchronized data.
+                self._refresh_replica()
+                self._clear_lookup_caches()
+
+        return new_items
+
+    def synchronize_incrementally(self, items_callback):
+        """
+        Applies the folder events logged in Shotgun since the last sync, unless the
+        path cache can only be brought up to date with a full sync.
+
+        This is what :class:`PathCacheSynchronizer` runs in the background. The new
+        items found are not returned, they are passed to the items callback once
+        written so that their folders can be created right away.
+
+        :param items_callback: Callable invoked with the list of new remote items of
+                               each page of folder events applied, see :meth:`synchronize`.
+        :returns: True if folder events were applied, False if the path cache was
+                  already up to date and None if a full sync is needed.
+        """
+        if self._path_cache_disabled or not self._sync_with_sg:
+            return False
+
+        with self._sync_lock:
+            last_event_log_id = self._get_last_event_log_synced()
+            try:
+                new_items = self._synchronize(False, None, incremental_only=True, items_callback=items_callback)
+            finally:
+                changed = self._get_last_event_log_synced() != last_event_log_id
+                if changed:
+                    # lookups now need to see the synchronized data.
+                    self._refresh_replica()
+                    self._clear_lookup_caches()
+
+        if new_items is None:
+            return None
+        return changed
+
+    def _get_last_event_log_synced(self):
+        """
+        Returns the id of the last folder event log entry applied to the database.
+
+        :returns: Event log id or None if the path cache was never synchronized.
+        """
+        c = self._connection.cursor()
+        try:
+            return list(c.execute("SELECT max(last_id) FROM event_log_sync"))[0][0]
+        finally:
+            c.close()
+
+    def _fall_back_on_full_sync(self, cursor, progress_callback, incremental_only, items_callback=None):
+        """
+        Runs the full sync needed when the path cache can't be synchronized incrementally.
+
+        :param cursor: Sqlite database cursor
+        :param progress_callback: Optional callable, see :meth:`synchronize`.
+        :param incremental_only: If True, the full sync is left to the next foreground sync.
+        :param items_callback: Optional callable, see :meth:`synchronize`.
+        :returns: A list of remote items which were detected, see :meth:`synchronize`,
+                  or None if the full sync was skipped.
+        """
+        if incremental_only:
+            log.debug("The path cache needs a full sync, skipping.")
+            return None
+        return self._do_full_sync(cursor, progress_callback, items_callback)
+
+    def _synchronize(self, full_sync, progress_callback, incremental_only=False, items_callback=None):
+        """
+        Synchronizes the path cache database with Shotgun.
+
+        :param full_sync: Boolean to indicate that a full sync should be carried out.
+        :param progress_callback: Optional callable, see :meth:`synchronize`.
+        :param incremental_only: If True, only incremental syncs are carried out.
+        :param items_callback: Optional callable, see :meth:`synchronize`.
+        :returns: A list of remote items which were detected, see :meth:`synchronize`,
+                  or None if a full sync was needed but not allowed.
+        """
         if not self._sync_with_sg:
             log.debug("Folder synchronization is turned off for this project.")
             return []
@@ -321,7 +787,7 @@ class PathCache(object):
 
             # check if we should do a full sync
             if full_sync:
-                return self._do_full_sync(c)
+                return self._do_full_sync(c, progress_callback, items_callback)
             
             # first get the last synchronized event log event.        
             res = c.execute("SELECT max(last_id) FROM event_log_sync")
@@ -333,7 +799,7 @@ class PathCache(object):
             # expect back something like [(249660,)] for a running cache and [(None,)] for a clear
             if len(data) != 1 or data[0] is None:
                 # we should do a full sync
-                return self._do_full_sync(c)
+                return self._fall_back_on_full_sync(c, progress_callback, incremental_only, items_callback)
     
             # we have an event log id - so check if there are any more recent events
             event_log_id = data[0]
@@ -349,21 +815,10 @@ class PathCache(object):
                 "entries >= id %s for project %s..." % (event_log_id, self._get_project_link())
             )
             
-            # note that we return the records in ascending order, meaning that they get 
-            # "played back" in the same order as they were created.
-            #
             # for a non-truncated event log table, the first record returned
             # by this query should be the last one previously processed by the 
             # path cache (via the event_log_id variable)
-            response = self._tk.shotgun.find(
-                "EventLogEntry",
-                [["event_type", "in", ["Toolkit_Folders_Create", "Toolkit_Folders_Delete"]],
-                 ["id", "greater_than", (event_log_id - 1)],
-                 ["project", "is", self._get_project_link()]
-                 ],
-                ["id", "meta", "event_type"],
-                [{"field_name": "id", "direction": "asc"}]
-            )
+            response = self._get_folder_events_page(event_log_id - 1)
 
             log.debug("Got %s event log entries" % len(response))
         
@@ -381,7 +836,7 @@ class PathCache(object):
             if len(response) == 0:
                 # nothing in event log. Probably a truncated setup.
                 log.debug("No sync information in the event log. Falling back on a full sync.")
-                return self._do_full_sync(c)
+                return self._fall_back_on_full_sync(c, progress_callback, incremental_only, items_callback)
                 
             elif response[0]["id"] != event_log_id:
                 # there is either no event log data at all or a gap
@@ -393,7 +848,7 @@ class PathCache(object):
                     "like the event log has been truncated, so falling back "
                     "on a full sync." % (event_log_id, response[0]["id"])
                 )
-                return self._do_full_sync(c)
+                return self._fall_back_on_full_sync(c, progress_callback, incremental_only, items_callback)
             
             elif len(response) == 1 and response[0]["id"] == event_log_id:
                 # nothing has changed since the last sync
@@ -403,7 +858,17 @@ class PathCache(object):
                 # we have a complete trail of increments.
                 # note that we skip the current entity.
                 log.debug("Full event log history traced. Running incremental sync.")
-                return self._do_incremental_sync(c, response[1:])
+                new_items = []
+                add_new_items = items_callback or new_items.extend
+                add_new_items(self._do_incremental_sync(c, response[1:]))
+
+                # the event log entries are synced page by page, a short page is the last one.
+                while len(response) >= self.SHOTGUN_EVENT_QUERY_PAGE_SIZE:
+                    response = self._get_folder_events_page(response[-1]["id"])
+                    log.debug("Got %s more event log entries" % len(response))
+                    add_new_items(self._do_incremental_sync(c, response))
+
+                return new_items
 
             else:
                 # should never be here
@@ -412,11 +877,37 @@ class PathCache(object):
         finally:       
             c.close()
 
+    def _get_folder_events_page(self, after_id):
+        """
+        Retrieves a page of the folder creation and deletion event log entries of the
+        project from Shotgun.
+
+        :param int after_id: Only entries with a greater id are returned.
+        :returns: List of at most ``SHOTGUN_EVENT_QUERY_PAGE_SIZE`` EventLogEntry
+                  dictionaries with keys id, meta and event_type, in ascending id order.
+        """
+        # note that we return the records in ascending order, meaning that they get 
+        # "played back" in the same order as they were created.
+        return self._tk.shotgun.find(
+            "EventLogEntry",
+            [["event_type", "in", ["Toolkit_Folders_Create", "Toolkit_Folders_Delete"]],
+             ["id", "greater_than", after_id],
+             ["project", "is", self._get_project_link()]
+             ],
+            ["id", "meta", "event_type"],
+            [{"field_name": "id", "direction": "asc"}],
+            limit=self.SHOTGUN_EVENT_QUERY_PAGE_SIZE
+        )
+
     def _upload_cache_data_to_shotgun(self, data, event_log_desc):
         """
         Takes a standard chunk of Shotgun data and uploads it to Shotgun
-        using a single batch statement. Then writes a single event log entry record
-        which binds the created path records. Returns the id of this event log record.
+        using batch requests of at most ``SHOTGUN_CREATE_BATCH_SIZE`` entities. Then
+        writes a single event log entry record which binds the created path records.
+        Returns the id of this event log record.
+
+        If any of the requests fails, the entities already created are deleted
+        so that no FilesystemLocation is left without its event log entry.
         
         data needs to be a list of dicts with the following keys:
         - entity - std sg entity dict with name, id and type
@@ -468,29 +959,32 @@ class PathCache(object):
             
             sg_batch_data.append(req)
         
-        # push to shotgun in a single xact
+        # push to shotgun in bounded batches
         log.debug("Uploading %s path entries to Shotgun..." % len(sg_batch_data))
         
-        try:    
-            response = self._tk.shotgun.batch(sg_batch_data)
+        response = []
+        try:
+            for start in range(0, len(sg_batch_data), self.SHOTGUN_CREATE_BATCH_SIZE):
+                response.extend(
+                    self._tk.shotgun.batch(sg_batch_data[start:start + self.SHOTGUN_CREATE_BATCH_SIZE])
+                )
         except Exception, e:
+            self._delete_uploaded_entities([x["id"] for x in response])
             raise TankError("Critical! Could not update Shotgun with folder "
                             "data. Please contact support. Error details: %s" % e)
         
         # now create a dictionary where input path cache rowid (path_cache_row_id)
-        # is mapped to the shotgun ids that were just created
-        def _rowid_from_path(path):
-            for d in data:
-                if d["path"] == path:
-                    return d["path_cache_row_id"] 
-            raise TankError("Could not resolve row id for path! Please contact support! "
-                            "trying to resolve path '%s'. Source data set: %s" % (path, data))
-        
+        # is mapped to the shotgun ids that were just created. Batch requests return
+        # their results in the order of the requests, so they are paired by position:
+        # the primary and secondary mappings of a path share the same path.
+        if len(response) != len(data):
+            self._delete_uploaded_entities([x["id"] for x in response])
+            raise TankError("Could not resolve row ids for the created paths! Please contact support! "
+                            "Got %s results for %s paths. Source data set: %s" % (len(response), len(data), data))
+
         rowid_sgid_lookup = {}
-        for sg_obj in response:
-            sg_id = sg_obj["id"]
-            pc_row_id = _rowid_from_path( sg_obj[SG_PATH_FIELD]["local_path"] )
-            rowid_sgid_lookup[pc_row_id] = sg_id
+        for d, sg_obj in zip(data, response):
+            rowid_sgid_lookup[d["path_cache_row_id"]] = sg_obj["id"]
         
         # now register the created ids in the event log
         # this will later on be read by the synchronization            
@@ -514,12 +1008,36 @@ class PathCache(object):
             log.debug("Creating event log entry %s" % sg_event_data)
             response = self._tk.shotgun.create("EventLogEntry", sg_event_data)
         except Exception, e:
+            self._delete_uploaded_entities(meta["sg_folder_ids"])
             raise TankError("Critical! Could not update Shotgun with folder data event log "
                             "history marker. Please contact support. Error details: %s" % e)            
         
         # return the event log id which represents this uploaded slab
         return (response["id"], rowid_sgid_lookup)
 
+    def _delete_uploaded_entities(self, sg_ids):
+        """
+        Deletes FilesystemLocation entities created by a failed upload.
+
+        Errors are logged rather than raised, the caller reports the failure
+        of the upload itself.
+
+        :param sg_ids: Ids of the FilesystemLocation entities to delete.
+        """
+        if not sg_ids:
+            return
+
+        log.debug("Deleting the %s FilesystemLocation entities created by the failed upload..." % len(sg_ids))
+        sg_batch_data = [
+            {"request_type": "delete", "entity_type": SHOTGUN_ENTITY, "entity_id": sg_id}
+            for sg_id in sg_ids
+        ]
+        try:
+            for start in range(0, len(sg_batch_data), self.SHOTGUN_CREATE_BATCH_SIZE):
+                self._tk.shotgun.batch(sg_batch_data[start:start + self.SHOTGUN_CREATE_BATCH_SIZE])
+        except Exception, e:
+            log.warning("Could not delete the FilesystemLocation entities %s: %s" % (sg_ids, e))
+
     def _get_project_link(self):
         """
         Returns the project link dictionary.
@@ -535,7 +1053,7 @@ class PathCache(object):
                 "id": self._tk.pipeline_configuration.get_project_id()
             }
 
-    def _do_full_sync(self, cursor):
+    def _do_full_sync(self, cursor, progress_callback=None, items_callback=None):
         """
         Ensure the local path cache is in sync with Shotgun.
         
@@ -547,6 +1065,8 @@ class PathCache(object):
             - path
             
         :param cursor: Sqlite database cursor
+        :param progress_callback: Optional callable, see :meth:`synchronize`.
+        :param items_callback: Optional callable, see :meth:`synchronize`.
         """
         
         show_global_busy("Hang on, Toolkit is preparing folders...", 
@@ -571,7 +1091,7 @@ class PathCache(object):
             else:
                 max_event_log_id = sg_data["id"]
             
-            data = self._replay_folder_entities(cursor, max_event_log_id)
+            data = self._replay_folder_entities(cursor, max_event_log_id, progress_callback, items_callback)
 
         finally:
             clear_global_busy()
@@ -638,6 +1158,9 @@ class PathCache(object):
                             "log entry after having successfully removed folders. Please contact support for "
                             "assistance. Error details: %s Data: %s" % (e, sg_event_data))
 
+        # the lookups cached by the path caches using this database can't be trusted anymore.
+        tk.get_path_cache()._clear_lookup_caches()
+
     def _do_incremental_sync(self, cursor, sg_data):
         """
         Ensure the local path cache is in sync with Shotgun.
@@ -697,28 +1220,40 @@ class PathCache(object):
 
         new_items = []
 
-        for event in sg_data:
-            sg_folder_ids = event["meta"].get("sg_folder_ids")
+        # folders created by consecutive events are imported together
+        entities_to_import = []
 
-            if event["event_type"] == "Toolkit_Folders_Delete":
-                # Remove all the entries associated with that event.
-                self._remove_filesystem_location_entities(cursor, sg_folder_ids)
-            elif event["event_type"] == "Toolkit_Folders_Create":
-                # For every folder in the create event.
-                for folder_id in sg_folder_ids:
+        try:
+            for event in sg_data:
+                sg_folder_ids = event["meta"].get("sg_folder_ids")
+
+                if event["event_type"] == "Toolkit_Folders_Delete":
+                    # the folders created by the previous events must be there to be removed.
+                    if entities_to_import:
+                        new_items.extend(self._import_filesystem_location_entries(cursor, entities_to_import))
+                        entities_to_import = []
+                    # Remove all the entries associated with that event.
+                    self._remove_filesystem_location_entities(cursor, sg_folder_ids)
+                elif event["event_type"] == "Toolkit_Folders_Create":
                     # If the entry is actually part of the end result, we'll add it!
-                    if folder_id in created_folder_entities:
-                        new_item = self._import_filesystem_location_entry(cursor, created_folder_entities[folder_id])
-                        # If the entry was actually imported.
-                        if new_item:
-                            new_items.append(new_item)
+                    entities_to_import.extend(
+                        created_folder_entities[folder_id] for folder_id in sg_folder_ids
+                        if folder_id in created_folder_entities
+                    )
 
-        self._update_last_event_log_synced(cursor, max_event_log_id)
+            if entities_to_import:
+                new_items.extend(self._import_filesystem_location_entries(cursor, entities_to_import))
+
+            # insert the event_log_sync data marker into the database to show where
+            # to start syncing from next time.
+            self._update_last_event_log_synced(cursor, max_event_log_id)
+        except:
+            # leave the database as it was after the previous page
+            self._connection.rollback()
+            raise
 
         self._connection.commit()
 
-        # run the actual sync - and at the end, inser the event_log_sync data marker
-        # into the database to show where to start syncing from next time.
         return new_items
 
     def _get_filesystem_location_entities(self, folder_ids):
@@ -785,15 +1320,7 @@ class PathCache(object):
                 self._tk.shotgun.find(
                     SHOTGUN_ENTITY,
                     batched_filter,
-                    [
-                        "id",
-                        SG_METADATA_FIELD,
-                        SG_IS_PRIMARY_FIELD,
-                        SG_ENTITY_ID_FIELD,
-                        SG_PATH_FIELD,
-                        SG_ENTITY_TYPE_FIELD,
-                        SG_ENTITY_NAME_FIELD
-                    ],
+                    SG_FILESYSTEM_LOCATION_FIELDS,
                     [{"field_name": "id", "direction": "asc"}]
                 )
             )
@@ -802,49 +1329,126 @@ class PathCache(object):
 
         return sg_data
 
-    def _replay_folder_entities(self, cursor, max_event_log_id):
+    def _iter_filesystem_location_entity_pages(self):
+        """
+        Retrieves all the project's filesystem location entities from Shotgun, page by page.
+
+        The entities are retrieved in id order, each page holding at most
+        ``SHOTGUN_ENTITY_QUERY_BATCH_SIZE`` entities, so that only one page is held
+        in memory at a time.
+
+        :returns: Iterator over lists of FilesystemLocation entity dictionaries,
+                  see :meth:`_get_filesystem_location_entities`.
+        """
+        project_entity = self._get_project_link()
+        last_id = 0
+        while True:
+            sg_data = self._tk.shotgun.find(
+                SHOTGUN_ENTITY,
+                [["project", "is", project_entity], ["id", "greater_than", last_id]],
+                SG_FILESYSTEM_LOCATION_FIELDS,
+                [{"field_name": "id", "direction": "asc"}],
+                limit=self.SHOTGUN_ENTITY_QUERY_BATCH_SIZE
+            )
+            log.debug("...Retrieved %s records after id %s.", len(sg_data), last_id)
+            if sg_data:
+                yield sg_data
+            # a short page is the last one
+            if len(sg_data) < self.SHOTGUN_ENTITY_QUERY_BATCH_SIZE:
+                return
+            last_id = sg_data[-1]["id"]
+
+    def _replay_folder_entities(self, cursor, max_event_log_id, progress_callback=None, items_callback=None):
         """
         Downloads all the filesystem location entities from Shotgun and repopulates the
         path cache with them.
 
+        The entities are downloaded and written page by page to temporary tables, each
+        page being committed separately, so that memory use doesn't grow with the number
+        of entities. The path cache tables are only replaced with the temporary ones once
+        all the pages are written, in a single transaction, so other processes never see
+        a partially synchronized path cache. An interrupted sync leaves the path cache as
+        it was.
+
         Lastly, this method updates the event_log_sync marker in the sqlite database
         that tracks what the most recent event log id was being synced.
 
         :param cursor: Sqlite database cursor
         :param max_event_log_id: max event log marker to write to the path
                                  cache database after a full operation.
+        :param progress_callback: Optional callable, see :meth:`synchronize`.
+        :param items_callback: Optional callable, see :meth:`synchronize`.
         :returns: A list of remote items which were detected, created remotely
                   and not existing in this path cache. These are returned as a list of
                   dictionaries, each containing keys:
                     - entity
                     - metadata
                     - path
-
+                  The list is empty if an items callback was given.
         """
-        log.debug("Fetching already registered folders from Shotgun...")
+        # the temporary tables live in a local database private to the connection.
+        log.debug("Full sync - creating the temporary path cache tables...")
+        cursor.executescript("""
+            DROP TABLE IF EXISTS temp.full_sync_path_cache;
+            DROP TABLE IF EXISTS temp.full_sync_shotgun_status;
 
-        sg_data = self._get_filesystem_location_entities(folder_ids=None)
+            CREATE TEMP TABLE full_sync_path_cache (entity_type text, entity_id integer, entity_name text, root text, path text, primary_entity integer);
 
-        # complete sync - clear our tables first
-        log.debug("Full sync - clearing local sqlite path cache tables...")
-        cursor.execute("DELETE FROM event_log_sync")
-        cursor.execute("DELETE FROM shotgun_status")
-        cursor.execute("DELETE FROM path_cache")
+            CREATE INDEX temp.full_sync_path_cache_path ON full_sync_path_cache(root, path, primary_entity);
 
-        return_data = []
+            CREATE UNIQUE INDEX temp.full_sync_path_cache_all ON full_sync_path_cache(entity_type, entity_id, root, path, primary_entity);
 
-        for x in sg_data:
-            imported_data = self._import_filesystem_location_entry(cursor, x)
-            if imported_data:
-                return_data.append(imported_data)
+            CREATE TEMP TABLE full_sync_shotgun_status (path_cache_id integer, shotgun_id integer);
 
-        # lastly, save the id of this event log entry for purpose of future syncing
-        # note - we don't maintain a list of event log entries but just a single
-        # value in the db, so start by clearing the table.
+            CREATE UNIQUE INDEX temp.full_sync_shotgun_status_id ON full_sync_shotgun_status(path_cache_id);
+            """)
 
-        self._update_last_event_log_synced(cursor, max_event_log_id)
+        log.debug("Fetching already registered folders from Shotgun...")
 
-        self._connection.commit()
+        return_data = []
+        add_new_items = items_callback or return_data.extend
+        num_processed = 0
+        try:
+            try:
+                for sg_data in self._iter_filesystem_location_entity_pages():
+                    new_items = self._import_filesystem_location_entries(
+                        cursor, sg_data, self._FULL_SYNC_TABLE_PREFIX
+                    )
+                    self._connection.commit()
+                    add_new_items(new_items)
+
+                    num_processed += len(sg_data)
+                    log.debug("Imported %s FilesystemLocation entries." % num_processed)
+                    if progress_callback:
+                        progress_callback(num_processed)
+
+                # complete sync - replace the content of our tables
+                log.debug("Full sync - replacing the local sqlite path cache tables...")
+                cursor.execute("DELETE FROM shotgun_status")
+                cursor.execute("DELETE FROM path_cache")
+                # rowids are copied, shotgun_status refers to path_cache entries by rowid.
+                cursor.execute("""
+                    INSERT INTO path_cache(rowid, entity_type, entity_id, entity_name, root, path, primary_entity)
+                    SELECT rowid, entity_type, entity_id, entity_name, root, path, primary_entity
+                    FROM temp.full_sync_path_cache
+                """)
+                cursor.execute(
+                    "INSERT INTO shotgun_status SELECT path_cache_id, shotgun_id FROM temp.full_sync_shotgun_status"
+                )
+
+                # lastly, save the id of this event log entry for purpose of future syncing
+                # note - we don't maintain a list of event log entries but just a single
+                # value in the db.
+                self._update_last_event_log_synced(cursor, max_event_log_id)
+            except:
+                self._connection.rollback()
+                raise
+            self._connection.commit()
+        finally:
+            cursor.executescript("""
+                DROP TABLE IF EXISTS temp.full_sync_path_cache;
+                DROP TABLE IF EXISTS temp.full_sync_shotgun_status;
+                """)
 
         return return_data
 
@@ -860,13 +1464,18 @@ class PathCache(object):
         cursor.execute("DELETE FROM event_log_sync")
         cursor.execute("INSERT INTO event_log_sync(last_id) VALUES(?)", (event_log_id, ))
 
-    def _import_filesystem_location_entry(self, cursor, fsl_entity):
+    def _import_filesystem_location_entries(self, cursor, fsl_entities, table_prefix=""):
         """
-        Imports a single filesystem location into the path cache.
+        Imports filesystem locations into the path cache.
+
+        The entries are inserted with bulk statements, in chunks of
+        ``SQLITE_MAX_ITEMS_FOR_IN_STATEMENT`` entries. Nothing is committed.
 
         :param cursor: Database cursor.
-        :type :class:`sqlite3.Cursor`
-        :param dict fsl_entry: Filesystem location entity dictionary with keys:
+        :type cursor: :class:`sqlite3.Cursor`
+        :param str table_prefix: Prefix of the names of the path_cache and shotgun_status
+                                 tables to import into.
+        :param list fsl_entities: Filesystem location entity dictionaries with keys:
             - id
             - type
             - configuration_metadata
@@ -875,6 +1484,35 @@ class PathCache(object):
             - path
             - linked_entity_type
             - code
+        :returns: A list of the imported items, as dictionaries with keys:
+            - entity
+            - metadata
+            - path
+        """
+        rows = []
+        for fsl_entity in fsl_entities:
+            row = self._get_filesystem_location_row(fsl_entity)
+            if row:
+                rows.append(row)
+
+        new_items = []
+        for start in range(0, len(rows), self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT):
+            new_items.extend(
+                self._insert_filesystem_location_rows(
+                    cursor, rows[start:start + self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT], table_prefix
+                )
+            )
+        return new_items
+
+    def _get_filesystem_location_row(self, fsl_entity):
+        """
+        Validates a filesystem location and converts it into the values stored in
+        the path cache.
+
+        :param dict fsl_entity: Filesystem location entity dictionary, see
+                                :meth:`_import_filesystem_location_entries`.
+        :returns: A (shotgun id, entity, is primary, local path, root name, db path)
+                  tuple or None if the filesystem location can't be imported.
         """
         # get entity data from our entry
         entity = {"id": fsl_entity[SG_ENTITY_ID_FIELD],
@@ -948,29 +1586,121 @@ class PathCache(object):
             log.debug("Could not resolve storages - skipping: %s" % e)
             return None
 
-        # all validation checks seem ok - go ahead and make the changes.
-        new_rowid = self._add_db_mapping(cursor, local_os_path, entity, is_primary)
-        if new_rowid:
-            # something was inserted into the db!
-            # because this record came from shotgun, insert a record in the
-            # shotgun_status table to indicate that this record exists in sg
-            cursor.execute("INSERT INTO shotgun_status(path_cache_id, shotgun_id) "
-                           "VALUES(?, ?)", (new_rowid, fsl_entity["id"]))
+        return (fsl_entity["id"], entity, is_primary, local_os_path, root_name, self._path_to_dbpath(relative_path))
 
-            # and add this entry to our list of new things that we will return later on.
-            return {
-                "entity": entity,
-                "path": local_os_path,
-                "metadata": SG_METADATA_FIELD
-            }
+    def _insert_filesystem_location_rows(self, cursor, rows, table_prefix=""):
+        """
+        Inserts filesystem locations into the path cache with bulk statements,
+        skipping the ones which are already there.
 
-        else:
-            # Note: edge case - for some reason there was already an entry in the path cache
-            # representing this. This could be because of duplicate entries and is
-            # not necessarily an anomaly. It could also happen because a previos sync failed
-            # at some point half way through.
-            log.debug("Found existing record for '%s', %s. Skipping." % (local_os_path, entity))
-            return None
+        If a filesystem location associates a path with a primary entity while the
+        path cache associates it with another one, a TankError is raised.
+
+        :param cursor: Database cursor.
+        :type cursor: :class:`sqlite3.Cursor`
+        :param list rows: At most ``SQLITE_MAX_ITEMS_FOR_IN_STATEMENT`` tuples returned
+                          by :meth:`_get_filesystem_location_row`.
+        :param str table_prefix: Prefix of the names of the path_cache and shotgun_status
+                                 tables to insert into.
+        :returns: A list of the inserted items, as dictionaries with keys:
+            - entity
+            - metadata
+            - path
+        """
+        # find what the path cache already knows about these paths
+        db_paths_by_root = {}
+        for (_, _, _, _, root_name, db_path) in rows:
+            db_paths_by_root.setdefault(root_name, set()).add(db_path)
+
+        primary_entities = {}
+        associations = set()
+        for root_name, db_paths in db_paths_by_root.iteritems():
+            db_paths = list(db_paths)
+            res = cursor.execute(
+                "SELECT path, entity_type, entity_id, entity_name, primary_entity "
+                "FROM %spath_cache WHERE root = ? AND path IN (%s)" % (
+                    table_prefix, self._gen_param_string(db_paths)
+                ),
+                [root_name] + db_paths
+            )
+            for db_path, entity_type, entity_id, entity_name, primary in res:
+                associations.add((root_name, db_path, entity_type, entity_id))
+                if primary:
+                    primary_entities[(root_name, db_path)] = {
+                        "type": str(entity_type), "id": entity_id, "name": str(entity_name)
+                    }
+
+        new_rows = []
+        for row in rows:
+            (_, entity, is_primary, local_os_path, root_name, db_path) = row
+            association = (root_name, db_path, entity["type"], entity["id"])
+
+            if is_primary:
+                # the primary entity must be unique: path/id/type
+                curr_entity = primary_entities.get((root_name, db_path))
+                if curr_entity is not None:
+                    # Note! We are only comparing against the type and the id
+                    # not against the name.
+                    if curr_entity["type"] != entity["type"] or curr_entity["id"] != entity["id"]:
+                        raise TankError("Database concurrency problems: The path '%s' is "
+                                        "already associated with Shotgun entity %s. Please re-run "
+                                        "folder creation to try again." % (local_os_path, str(curr_entity)))
+                    # Note: edge case - for some reason there was already an entry in the path cache
+                    # representing this. This could be because of duplicate entries and is
+                    # not necessarily an anomaly. It could also happen because a previous sync failed
+                    # at some point half way through.
+                    log.debug("Found existing record for '%s', %s. Skipping." % (local_os_path, entity))
+                    continue
+                primary_entities[(root_name, db_path)] = entity
+
+            elif association in associations:
+                # secondary entity - we already have the association present in the db.
+                log.debug("Found existing record for '%s', %s. Skipping." % (local_os_path, entity))
+                continue
+
+            associations.add(association)
+            new_rows.append(row)
+
+        if not new_rows:
+            return []
+
+        # note: the INSERT OR IGNORE INTO checks if we already have a
+        # record in the db for this combination - if we do, the insert
+        # is ignored. This is to avoid reported realtime issues when two
+        # processes are doing an incremental sync at the same time,
+        # download new data from shotgun and then attempts to insert it.
+        cursor.executemany(
+            """INSERT OR IGNORE INTO %spath_cache(entity_type,
+                                                  entity_id,
+                                                  entity_name,
+                                                  root,
+                                                  path,
+                                                  primary_entity)
+               VALUES(?, ?, ?, ?, ?, ?)""" % table_prefix,
+            [
+                (entity["type"], entity["id"], entity["name"], root_name, db_path, is_primary)
+                for (_, entity, is_primary, _, root_name, db_path) in new_rows
+            ]
+        )
+
+        # because these records came from shotgun, insert records in the
+        # shotgun_status table to indicate that they exist in sg
+        cursor.executemany(
+            """INSERT OR IGNORE INTO %sshotgun_status(path_cache_id, shotgun_id)
+               SELECT rowid, ? FROM %spath_cache
+               WHERE entity_type = ? AND entity_id = ? AND root = ? AND path = ? AND primary_entity = ?""" % (
+                table_prefix, table_prefix
+            ),
+            [
+                (sg_id, entity["type"], entity["id"], root_name, db_path, is_primary)
+                for (sg_id, entity, is_primary, _, root_name, db_path) in new_rows
+            ]
+        )
+
+        return [
+            {"entity": entity, "path": local_os_path, "metadata": SG_METADATA_FIELD}
+            for (_, entity, _, local_os_path, _, _) in new_rows
+        ]
 
     def _gen_param_string(self, items):
         """
@@ -1049,6 +1779,190 @@ class PathCache(object):
                 subset_folder_ids
             )
 
+    ############################################################################################
+    # snapshots (path cache database copied between computers)
+
+    # version of the snapshot file format
+    SNAPSHOT_FORMAT_VERSION = 1
+
+    def export_snapshot(self, path):
+        """
+        Writes a snapshot of the path cache to a file.
+
+        The snapshot holds the path cache entries, their FilesystemLocation ids and the
+        sync marker, so that a path cache seeded from it with :meth:`import_snapshot`
+        only needs an incremental sync to catch up with Shotgun. It is a gzip compressed
+        sqlite database without any indices.
+
+        :param path: Path of the snapshot file to write.
+        :returns: The number of path cache entries in the snapshot.
+        :raises: :class:`~tank.errors.TankError` if this project doesn't have a path cache.
+        """
+        if self._path_cache_disabled:
+            raise TankError("This project does not have any associated folders.")
+
+        tmp_file = "%s.%d.%d.tmp" % (path, os.getpid(), thread.get_ident())
+        try:
+            with self._sync_lock:
+                num_entries = self._write_snapshot_db(tmp_file)
+
+            # compress the database, path strings compress well.
+            with open(tmp_file, "rb") as src:
+                dst = gzip.open("%s.gz" % tmp_file, "wb")
+                try:
+                    shutil.copyfileobj(src, dst)
+                finally:
+                    dst.close()
+
+            if sys.platform == "win32" and os.path.exists(path):
+                # renaming doesn't replace existing files on windows
+                filesystem.safe_delete_file(path)
+            os.rename("%s.gz" % tmp_file, path)
+        finally:
+            for file_name in (tmp_file, "%s.gz" % tmp_file):
+                if os.path.exists(file_name):
+                    filesystem.safe_delete_file(file_name)
+
+        log.debug("Exported %d path cache entries to %s" % (num_entries, path))
+        return num_entries
+
+    def _write_snapshot_db(self, snapshot_file):
+        """
+        Copies the path cache tables to a new sqlite database.
+
+        The tables are copied in a single transaction, the snapshot is therefore
+        consistent even if other processes are writing to the path cache.
+
+        :param snapshot_file: Path of the database to create.
+        :returns: The number of path cache entries copied.
+        """
+        connection = self._connection
+        c = connection.cursor()
+        try:
+            c.execute("ATTACH DATABASE ? AS snapshot", (snapshot_file,))
+            try:
+                c.executescript("""
+                    CREATE TABLE snapshot.snapshot_info (format_version integer, project_id integer);
+                    CREATE TABLE snapshot.path_cache (entity_type text, entity_id integer, entity_name text, root text, path text, primary_entity integer);
+                    CREATE TABLE snapshot.event_log_sync (last_id integer);
+                    CREATE TABLE snapshot.shotgun_status (path_cache_id integer, shotgun_id integer);
+                """)
+                c.execute(
+                    "INSERT INTO snapshot.snapshot_info VALUES (?, ?)",
+                    (self.SNAPSHOT_FORMAT_VERSION, self._tk.pipeline_configuration.get_project_id())
+                )
+                try:
+                    # rowids are copied, shotgun_status refers to path_cache entries by rowid.
+                    c.execute("""
+                        INSERT INTO snapshot.path_cache(rowid, entity_type, entity_id, entity_name, root, path, primary_entity)
+                        SELECT rowid, entity_type, entity_id, entity_name, root, path, primary_entity FROM path_cache
+                    """)
+                    num_entries = c.rowcount
+                    c.execute("INSERT INTO snapshot.event_log_sync SELECT max(last_id) FROM event_log_sync")
+                    c.execute("INSERT INTO snapshot.shotgun_status SELECT path_cache_id, shotgun_id FROM shotgun_status")
+                except:
+                    connection.rollback()
+                    raise
+                connection.commit()
+            finally:
+                c.execute("DETACH DATABASE snapshot")
+        finally:
+            c.close()
+
+        return num_entries
+
+    def import_snapshot(self, path):
+        """
+        Replaces the contents of the path cache with a snapshot written by
+        :meth:`export_snapshot`.
+
+        The next sync applies the folder events logged in Shotgun since the snapshot
+        was taken.
+
+        :param path: Path of the snapshot file to read.
+        :returns: The number of path cache entries imported.
+        :raises: :class:`~tank.errors.TankError` if the file is not a snapshot of
+                 this project's path cache.
+        """
+        if self._path_cache_disabled:
+            raise TankError("This project does not have any associated folders.")
+
+        tmp_file = "%s.%d.%d.tmp" % (self._path_cache_file, os.getpid(), thread.get_ident())
+        try:
+            try:
+                src = gzip.open(path, "rb")
+                try:
+                    with open(tmp_file, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                finally:
+                    src.close()
+            except IOError, e:
+                raise TankError("Could not read path cache snapshot %s: %s" % (path, e))
+
+            with self._sync_lock:
+                try:
+                    num_entries = self._read_snapshot_db(tmp_file)
+                finally:
+                    self._refresh_replica()
+                    self._clear_lookup_caches()
+        finally:
+            if os.path.exists(tmp_file):
+                filesystem.safe_delete_file(tmp_file)
+
+        log.debug("Imported %d path cache entries from %s" % (num_entries, path))
+        return num_entries
+
+    def _read_snapshot_db(self, snapshot_file):
+        """
+        Replaces the path cache tables with the ones of a snapshot database.
+
+        :param snapshot_file: Path of the snapshot database.
+        :returns: The number of path cache entries imported.
+        :raises: :class:`~tank.errors.TankError` if the database is not a snapshot of
+                 this project's path cache.
+        """
+        connection = self._connection
+        c = connection.cursor()
+        try:
+            c.execute("ATTACH DATABASE ? AS snapshot", (snapshot_file,))
+            try:
+                try:
+                    info = list(c.execute("SELECT format_version, project_id FROM snapshot.snapshot_info"))
+                except sqlite3.DatabaseError, e:
+                    raise TankError("Invalid path cache snapshot: %s" % e)
+
+                if len(info) != 1 or info[0][0] != self.SNAPSHOT_FORMAT_VERSION:
+                    raise TankError("Unsupported path cache snapshot format.")
+
+                project_id = self._tk.pipeline_configuration.get_project_id()
+                if info[0][1] != project_id:
+                    raise TankError(
+                        "The path cache snapshot was taken from project %s, not from "
+                        "project %s." % (info[0][1], project_id)
+                    )
+
+                try:
+                    c.execute("DELETE FROM path_cache")
+                    c.execute("DELETE FROM shotgun_status")
+                    c.execute("DELETE FROM event_log_sync")
+                    c.execute("""
+                        INSERT INTO path_cache(rowid, entity_type, entity_id, entity_name, root, path, primary_entity)
+                        SELECT rowid, entity_type, entity_id, entity_name, root, path, primary_entity FROM snapshot.path_cache
+                    """)
+                    num_entries = c.rowcount
+                    c.execute("INSERT INTO shotgun_status SELECT path_cache_id, shotgun_id FROM snapshot.shotgun_status")
+                    c.execute("INSERT INTO event_log_sync SELECT last_id FROM snapshot.event_log_sync")
+                except:
+                    connection.rollback()
+                    raise
+                connection.commit()
+            finally:
+                c.execute("DETACH DATABASE snapshot")
+        finally:
+            c.close()
+
+        return num_entries
+
     ############################################################################################
     # pre-insertion validation
 
@@ -1080,11 +1994,28 @@ class PathCache(object):
                            being more loosely tied to the path.
         """
         
+        # these checks guard the writes which follow, so they are done against the
+        # database itself rather than against its replica.
+        c = self._connection.cursor()
+        try:
+            self._validate_mapping_with_cursor(c, path, entity, is_primary)
+        finally:
+            c.close()
+
+    def _validate_mapping_with_cursor(self, cursor, path, entity, is_primary):
+        """
+        Consistency checks for a mapping, see :meth:`_validate_mapping`.
+
+        :param cursor: Database cursor to use.
+        :param path: The path calculated
+        :param entity: Sg entity dict with keys id, type and name
+        :param is_primary: indicates that this is a primary mapping
+        """
         # Make sure that there isn't already a record with the same
         # name in the database and file system, but with a different id.
         # We only do this for primary items - for secondary items, multiple items can exist
         if is_primary:
-            entity_in_db = self.get_entity(path)
+            entity_in_db = self.get_entity(path, cursor)
             
             if entity_in_db is not None:
                 if entity_in_db["id"] != entity["id"] or entity_in_db["type"] != entity["type"]:
@@ -1119,7 +2050,7 @@ class PathCache(object):
         # we only check for primary entities, doing the check for secondary
         # would only be to carry out the same check twice.
         if is_primary:
-            for p in self.get_paths(entity["type"], entity["id"], primary_only=False):
+            for p in self.get_paths(entity["type"], entity["id"], primary_only=False, cursor=cursor):
                 # so we got a path that matches our entity
                 if p != path and os.path.dirname(p) == os.path.dirname(path):
                     # this path is identical to our path we are about to create except for the name. 
@@ -1204,9 +2135,8 @@ class PathCache(object):
                 (event_log_id, sg_id_lookup) = self._upload_cache_data_to_shotgun(data_for_sg, desc)
                 self._update_last_event_log_synced(c, event_log_id)
                 # and indicate in the path cache that all these records have been pushed
-                for (pc_row_id, sg_id) in sg_id_lookup.items():
-                    c.execute("INSERT INTO shotgun_status(path_cache_id, shotgun_id) "
-                              "VALUES(?, ?)", (pc_row_id, sg_id) )
+                c.executemany("INSERT INTO shotgun_status(path_cache_id, shotgun_id) "
+                              "VALUES(?, ?)", sg_id_lookup.items())
                     
 
         except:
@@ -1222,6 +2152,11 @@ class PathCache(object):
         finally:
             c.close()
 
+        # make the new mappings visible to lookups
+        self._refresh_replica()
+        for d in data:
+            self._invalidate_lookups(d["path"], d["entity"])
+
 
 
 
@@ -1367,12 +2302,24 @@ class PathCache(object):
             # eg. doesn't belong to the project
             return None
 
-        # use built in cursor unless specifically provided - means this
-        # is part of a larger transaction
-        c = self._connection.cursor()        
+        db_path = self._path_to_dbpath(relative_path)
+        return self._cached_lookup(
+            ("shotgun_id", root_path, db_path),
+            self._get_shotgun_id_from_db_path, root_path, db_path, path
+        )
+
+    def _get_shotgun_id_from_db_path(self, root_path, db_path, path):
+        """
+        Looks up a FilesystemLocation id in the database.
+
+        :param root_path: Name of the root of the path.
+        :param db_path: Path relative to the root, in db form.
+        :param path: Path to look for, used in error messages.
+        :returns: A shotgun FilesystemLocation id or None if not found.
+        """
+        c = self._read_connection.cursor()
 
         try:
-            db_path = self._path_to_dbpath(relative_path)
             res = c.execute("""
                             select ss.shotgun_id 
                             from shotgun_status ss 
@@ -1425,22 +2372,89 @@ class PathCache(object):
                          
         
         # now get all paths that are child paths
-        like_path = "%s/%%" % path
-        res = c.execute("""SELECT pc.root, pc.path, ss.shotgun_id
-                          FROM path_cache pc
-                          INNER JOIN shotgun_status ss on pc.rowid = ss.path_cache_id
-                          WHERE root = ? and path like ?""", (root_name, like_path))
-        
-        for x in list(res):
-            root_name = x[0]
-            path = x[1]
-            sg_id = x[2]
-            # first append this match
-            root_path = self._roots.get(root_name)
-            matches.append( {"path": self._dbpath_to_path(root_path, path), "sg_id": sg_id } )
+        for (child_path, _, _, _, _, sg_id) in self._get_subtree_rows(c, root_name, path):
+            if child_path == path or sg_id is None:
+                continue
+            matches.append( {"path": self._dbpath_to_path(root_path, child_path), "sg_id": sg_id } )
             
         return matches
 
+    def get_entities_under(self, path, primary_only=False):
+        """
+        Returns the entities registered for a folder and for all the folders below it.
+
+        All the entries are retrieved by a single range query on the path index.
+
+        :param path: a path on disk
+        :param primary_only: Only return the primary entities of the folders.
+        :returns: list of dictionaries sorted by path, each with keys:
+                    - path: path on disk of the folder
+                    - entity: Shotgun entity dict, e.g. {"type": "Shot", "name": "xxx", "id": 123}
+                    - primary: True if the entity is the primary entity of the folder
+                    - sg_id: Id of the matching FilesystemLocation or None if the
+                      folder isn't registered in Shotgun
+        """
+        if self._path_cache_disabled:
+            # no entries because we don't have a path cache
+            return []
+
+        try:
+            root_name, relative_path = self._separate_root(path)
+        except TankError:
+            # fail gracefully if path is not a valid path
+            # eg. doesn't belong to the project
+            return []
+
+        root_path = self._roots.get(root_name)
+        db_path = self._path_to_dbpath(relative_path)
+
+        c = self._read_connection.cursor()
+        try:
+            rows = self._get_subtree_rows(c, root_name, db_path)
+        finally:
+            c.close()
+
+        matches = []
+        for (child_path, entity_type, entity_id, entity_name, is_primary, sg_id) in rows:
+            if primary_only and not is_primary:
+                continue
+            matches.append({
+                "path": self._dbpath_to_path(root_path, child_path),
+                # convert to string, not unicode!
+                "entity": {"type": str(entity_type), "id": entity_id, "name": str(entity_name)},
+                "primary": bool(is_primary),
+                "sg_id": sg_id,
+            })
+
+        return matches
+
+    def _get_subtree_rows(self, cursor, root_name, db_path):
+        """
+        Returns the path cache entries of a folder and of all the folders below it.
+
+        The paths below /foo/bar sort between /foo/bar/ and /foo/bar0, "0" being the
+        character following "/", which allows sqlite to use the path index rather than
+        to scan the table like a LIKE query would.
+
+        :param cursor: Sqlite database cursor
+        :param root_name: Name of the root of the folder.
+        :param db_path: Path of the folder relative to the root, in db form.
+        :returns: list of (path, entity_type, entity_id, entity_name, primary_entity,
+                  shotgun_id) tuples sorted by path, shotgun_id being None for entries
+                  not registered in Shotgun.
+        """
+        db_path = db_path.rstrip("/")
+        res = cursor.execute("""SELECT pc.path, pc.entity_type, pc.entity_id, pc.entity_name, pc.primary_entity, ss.shotgun_id
+                                FROM path_cache pc
+                                LEFT JOIN shotgun_status ss ON pc.rowid = ss.path_cache_id
+                                WHERE pc.root = ? AND pc.path >= ? AND pc.path < ?
+                                ORDER BY pc.path, pc.primary_entity DESC""", (root_name, db_path, "%s0" % db_path))
+
+        # the range also matches the siblings sorting between /foo/bar and /foo/bar/,
+        # e.g /foo/bar-baz.
+        subtree_prefix = "%s/" % db_path
+        return [x for x in res if x[0] == db_path or x[0].startswith(subtree_prefix)]
+
 
     def get_paths(self, entity_type, entity_id, primary_only, cursor=None):
         """
@@ -1456,12 +2470,29 @@ class PathCache(object):
         if self._path_cache_disabled:
             # no entries because we don't have a path cache
             return []
-        
+
+        if cursor is None:
+            return self._cached_lookup(
+                ("paths", entity_type, entity_id, bool(primary_only)),
+                self._get_paths, entity_type, entity_id, primary_only
+            )
+        return self._get_paths(entity_type, entity_id, primary_only, cursor)
+
+    def _get_paths(self, entity_type, entity_id, primary_only, cursor=None):
+        """
+        Looks up the paths of a shotgun entity in the database, see :meth:`get_paths`.
+
+        :param entity_type: A Shotgun entity type
+        :param entity_id: A Shotgun entity id
+        :param primary_only: Only return items marked as primary
+        :param cursor: Database cursor to use. If none, a new cursor will be created.
+        :returns: List of paths on disk
+        """
         paths = []
         
         # use built in cursor unless specifically provided - means this
         # is part of a larger transaction
-        c = cursor or self._connection.cursor()
+        c = cursor or self._read_connection.cursor()
         
         try:
             if primary_only:
@@ -1487,6 +2518,47 @@ class PathCache(object):
         
         return paths
 
+    def get_paths_for_entities(self, entity_type, entity_ids, primary_only):
+        """
+        Returns the paths of several shotgun entities of the same type, see :meth:`get_paths`.
+
+        The entities are looked up together, in chunks of ``SQLITE_MAX_ITEMS_FOR_IN_STATEMENT``.
+
+        :param entity_type: A Shotgun entity type
+        :param entity_ids: List of Shotgun entity ids
+        :param primary_only: Only return items marked as primary
+        :returns: Dictionary with, for each entity id, the list of its paths on disk.
+        """
+        paths = dict((entity_id, []) for entity_id in entity_ids)
+        if self._path_cache_disabled:
+            # no entries because we don't have a path cache
+            return paths
+
+        entity_ids = paths.keys()
+        c = self._read_connection.cursor()
+        try:
+            for start in range(0, len(entity_ids), self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT):
+                chunk = entity_ids[start:start + self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT]
+                sql = (
+                    "SELECT entity_id, root, path FROM path_cache "
+                    "WHERE entity_type = ? AND entity_id IN (%s)" % self._gen_param_string(chunk)
+                )
+                if primary_only:
+                    sql += " AND primary_entity = 1"
+                # keep the order of the single entity lookups
+                res = c.execute(sql + " ORDER BY rowid", [entity_type] + chunk)
+
+                for entity_id, root_name, relative_path in res:
+                    root_path = self._roots.get(root_name)
+                    if not root_path:
+                        # The root name doesn't match a recognized name, so skip this entry
+                        continue
+                    paths[entity_id].append(self._dbpath_to_path(root_path, relative_path))
+        finally:
+            c.close()
+
+        return paths
+
     def get_entity(self, path, cursor=None):
         """
         Returns an entity given a path.
@@ -1517,12 +2589,29 @@ class PathCache(object):
             # eg. doesn't belong to the project
             return None
 
+        db_path = self._path_to_dbpath(relative_path)
+        if cursor is None:
+            return self._cached_lookup(
+                ("entity", root_path, db_path),
+                self._get_entity, root_path, db_path, path
+            )
+        return self._get_entity(root_path, db_path, path, cursor)
+
+    def _get_entity(self, root_path, db_path, path, cursor=None):
+        """
+        Looks up the primary entity of a path in the database, see :meth:`get_entity`.
+
+        :param root_path: Name of the root of the path.
+        :param db_path: Path relative to the root, in db form.
+        :param path: Path to look for, used in error messages.
+        :param cursor: Database cursor to use. If none, a new cursor will be created.
+        :returns: Shotgun entity dict or None if not found
+        """
         # use built in cursor unless specifically provided - means this
         # is part of a larger transaction
-        c = cursor or self._connection.cursor()        
+        c = cursor or self._read_connection.cursor()        
 
         try:
-            db_path = self._path_to_dbpath(relative_path)
             res = c.execute("SELECT entity_type, entity_id, entity_name FROM path_cache WHERE path = ? AND root = ? and primary_entity = 1", (db_path, root_path))
             data = list(res)
         finally:
@@ -1560,9 +2649,22 @@ class PathCache(object):
             # eg. doesn't belong to the project
             return []
 
-        c = self._connection.cursor()
+        db_path = self._path_to_dbpath(relative_path)
+        return self._cached_lookup(
+            ("secondary_entities", root_path, db_path),
+            self._get_secondary_entities, root_path, db_path
+        )
+
+    def _get_secondary_entities(self, root_path, db_path):
+        """
+        Looks up the secondary entities of a path in the database.
+
+        :param root_path: Name of the root of the path.
+        :param db_path: Path relative to the root, in db form.
+        :returns: list of shotgun entity dicts.
+        """
+        c = self._read_connection.cursor()
         try:
-            db_path = self._path_to_dbpath(relative_path)
             res = c.execute("SELECT entity_type, entity_id, entity_name FROM path_cache WHERE path = ? AND root = ? and primary_entity = 0", (db_path, root_path))
             data = list(res)
         finally:
@@ -1576,7 +2678,120 @@ class PathCache(object):
             matches.append( {"type": type_str, "id": d[1], "name": name_str } )
 
         return matches
-    
+
+    def get_ancestor_entities(self, path):
+        """
+        Returns the primary and secondary entities of a path and of all its parent
+        folders, up to the storage root the path belongs to.
+
+        This is equivalent to calling :meth:`get_entity` and :meth:`get_secondary_entities`
+        for each folder but only runs a single query per storage root (split into chunks
+        of ``SQLITE_MAX_ITEMS_FOR_IN_STATEMENT`` folders for very deep paths), which
+        matters when the database sits on a network storage.
+
+        :param path: a path on disk
+        :returns: list of (path, primary entity, secondary entities) tuples, starting with
+                  the path itself and going up the folder hierarchy. The primary entity is
+                  a Shotgun entity dict, e.g. {"type": "Shot", "name": "xxx", "id": 123},
+                  or None if not found and the secondary entities are a possibly empty list
+                  of entity dicts. An empty list is returned if there is no path cache.
+        """
+        return self.get_ancestor_entities_for_paths([path])[0]
+
+    def get_ancestor_entities_for_paths(self, paths):
+        """
+        Returns the primary and secondary entities of several paths and of all their
+        parent folders, see :meth:`get_ancestor_entities`.
+
+        The folders shared by the paths are only looked up once and all the folders
+        of a storage root are looked up together, in chunks of
+        ``SQLITE_MAX_ITEMS_FOR_IN_STATEMENT`` folders.
+
+        :param paths: list of paths on disk
+        :returns: list with, for each path in the same order, the list returned by
+                  :meth:`get_ancestor_entities` for the path.
+        """
+        if self._path_cache_disabled:
+            # no entries because we don't have a path cache
+            return [[] for _ in paths]
+
+        root_paths = [x.lower() for x in self._roots.values()]
+
+        # walk up the folder hierarchies, grouping the folders by storage root.
+        folders_by_path = {}
+        db_paths_by_root = {}
+        db_keys_by_folder = {}
+        for path in paths:
+            if path is None or path in folders_by_path:
+                continue
+            folders = folders_by_path[path] = []
+            curr_path = path
+            while True:
+                folders.append(curr_path)
+                try:
+                    root_name, relative_path = self._separate_root(curr_path)
+                except TankError:
+                    # fail gracefully if path is not a valid path
+                    # eg. doesn't belong to the project
+                    pass
+                else:
+                    db_path = self._path_to_dbpath(relative_path)
+                    db_paths_by_root.setdefault(root_name, set()).add(db_path)
+                    db_keys_by_folder[curr_path] = (root_name, db_path)
+
+                if curr_path.lower() in root_paths:
+                    # we have reached a root!
+                    break
+
+                # and continue with parent path
+                parent_path = os.path.abspath(os.path.join(curr_path, ".."))
+                if curr_path == parent_path:
+                    # We're at the disk root, probably a degenerate path
+                    break
+                curr_path = parent_path
+
+        primary_entities = {}
+        secondary_entities = {}
+        c = self._read_connection.cursor()
+        try:
+            for root_name, db_paths in db_paths_by_root.iteritems():
+                db_paths = list(db_paths)
+                for start in range(0, len(db_paths), self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT):
+                    chunk = db_paths[start:start + self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT]
+                    res = c.execute(
+                        "SELECT path, entity_type, entity_id, entity_name, primary_entity "
+                        "FROM path_cache WHERE root = ? AND path IN (%s) "
+                        "ORDER BY rowid" % self._gen_param_string(chunk),
+                        [root_name] + chunk
+                    )
+                    for db_path, entity_type, entity_id, entity_name, primary in res:
+                        db_key = (root_name, db_path)
+                        # convert to string, not unicode!
+                        entity = {"type": str(entity_type), "id": entity_id, "name": str(entity_name)}
+                        if primary:
+                            if db_key in primary_entities:
+                                # never supposed to happen!
+                                raise TankError("More than one entry in path database for %s!" % db_path)
+                            primary_entities[db_key] = entity
+                        else:
+                            secondary_entities.setdefault(db_key, []).append(entity)
+        finally:
+            c.close()
+
+        results = []
+        for path in paths:
+            ancestor_entities = []
+            for folder in folders_by_path.get(path, []):
+                db_key = db_keys_by_folder.get(folder)
+                # each path gets its own copies of the entities
+                ancestor_entities.append((
+                    folder,
+                    copy.copy(primary_entities.get(db_key)),
+                    [copy.copy(x) for x in secondary_entities.get(db_key, [])]
+                ))
+            results.append(ancestor_entities)
+        return results
+
 
     def ensure_all_entries_are_in_shotgun(self):
         """
@@ -1722,4 +2937,115 @@ class PathCache(object):
         
         log.info("")
         log.info("Migration complete. %s records created in Shotgun" % len(sg_valid_records))
-     
+
+
+# marker for lookups not in the lookup cache
+_NOT_CACHED = object()
+
+
+def _get_default_lookup_cache_size():
+    """
+    Returns the maximum number of lookups whose results are kept in memory by each
+    path cache, as set by the ``SGTK_PATH_CACHE_LOOKUP_CACHE_SIZE`` environment variable.
+
+    :returns: Cache size.
+    """
+    size = os.environ.get(constants.PATH_CACHE_LOOKUP_CACHE_SIZE_ENV_VAR)
+    if size is None:
+        return constants.PATH_CACHE_LOOKUP_CACHE_SIZE
+    try:
+        return int(size)
+    except ValueError:
+        return constants.PATH_CACHE_LOOKUP_CACHE_SIZE
+
+
+class PathCacheSynchronizer(threading.Thread):
+    """
+    Thread keeping the path cache of a Toolkit instance in sync with Shotgun in the
+    background, so that the syncs done before creating folders have little left to
+    apply.
+
+    The thread polls Shotgun for new folder events and applies them with
+    :meth:`PathCache.synchronize_incrementally`. The folders registered from other
+    computers are then created by the folder creation hook, as for foreground syncs.
+    The polling interval doubles, up to a maximum, each time there is nothing to
+    apply or the sync fails, and goes back to its initial value as soon as events
+    are applied. Full syncs are never run in the background.
+
+    Engines start a synchronizer when the ``SGTK_PATH_CACHE_SYNC_INTERVAL`` environment
+    variable is set to the initial polling interval, in seconds.
+    """
+
+    # the interval grows up to this many times the initial interval
+    MAX_INTERVAL_FACTOR = 16
+
+    def __init__(self, tk, interval, max_interval=None):
+        """
+        Constructor.
+
+        :param tk: Toolkit API instance whose path cache is synchronized.
+        :param float interval: Initial polling interval, in seconds.
+        :param float max_interval: Maximum polling interval, in seconds. Defaults to
+                                   ``MAX_INTERVAL_FACTOR`` times the initial interval.
+        """
+        super(PathCacheSynchronizer, self).__init__(name="PathCacheSynchronizer")
+
+        # the process shouldn't wait for this thread before exiting.
+        self.daemon = True
+
+        self._tk = tk
+        self._interval = interval
+        self._max_interval = max_interval or interval * self.MAX_INTERVAL_FACTOR
+        self._halt_event = threading.Event()
+
+    def run(self):
+        """
+        Polls Shotgun for folder events until halted.
+        """
+        interval = self._interval
+        while True:
+            self._halt_event.wait(interval)
+            if self._halt_event.isSet():
+                break
+
+            try:
+                changed = self._tk.get_path_cache().synchronize_incrementally(self._create_folders)
+            except Exception, e:
+                log.debug("Background path cache sync failed: %s" % e)
+                changed = None
+
+            if changed:
+                log.debug("Background path cache sync applied new folder events.")
+                interval = self._interval
+            else:
+                interval = min(interval * 2, self._max_interval)
+
+    def _create_folders(self, items):
+        """
+        Creates the folders of the new items found by a background sync.
+
+        :param items: List of dicts with keys entity, metadata and path.
+        """
+        from .folder.folder_io import FolderIOReceiver
+        FolderIOReceiver.create_remote_folders(self._tk, items)
+
+    def halt(self):
+        """
+        Indicates that the thread should stop as soon as possible.
+        """
+        self._halt_event.set()
+
+
+def get_path_cache_sync_interval():
+    """
+    Returns the interval at which engines poll for folder events in the background,
+    as set by the ``SGTK_PATH_CACHE_SYNC_INTERVAL`` environment variable.
+
+    :returns: Interval in seconds, or None if background syncs are disabled.
+    """
+    interval = os.environ.get(constants.PATH_CACHE_SYNC_INTERVAL_ENV_VAR)
+    try:
+        interval = float(interval)
+    except (TypeError, ValueError):
+        return None
+    return interval if interval > 0 else None
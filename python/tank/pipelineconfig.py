@@ -935,17 +935,26 @@ class PipelineConfiguration(object):
         """
         return os.path.join(self._pc_root, "config", "env", "%s.yml" % env_name)
     
-    def get_templates_config(self):
+    def get_templates_config_path(self):
         """
-        Returns the templates configuration as an object
+        Returns the path to the templates configuration file. The file
+        may include other files.
+
+        :returns: path string
         """
-        templates_file = os.path.join(
+        return os.path.join(
             self._pc_root,
             "config",
             "core",
             constants.CONTENT_TEMPLATES_FILE,
         )
 
+    def get_templates_config(self):
+        """
+        Returns the templates configuration as an object
+        """
+        templates_file = self.get_templates_config_path()
+
         try:
             data = yaml_cache.g_yaml_cache.get(templates_file, deepcopy_data=False) or {}
             data = template_includes.process_includes(templates_file, data)
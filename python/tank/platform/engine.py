@@ -97,6 +97,7 @@ class Engine(TankBundle):
         self.__fonts_loaded = False
 
         self._metrics_dispatcher = None
+        self._path_cache_synchronizer = None
 
         # Initialize these early on so that methods implemented in the derived class and trying
         # to access the invoker don't trip on undefined variables.
@@ -273,6 +274,31 @@ class Engine(TankBundle):
             self._metrics_dispatcher.start()
             self.log_debug("Metrics dispatcher started.")
 
+        # keep the path cache in sync in the background if requested
+        self._start_path_cache_synchronizer()
+
+    def _start_path_cache_synchronizer(self):
+        """
+        Starts synchronizing the path cache with Shotgun in the background if the
+        ``SGTK_PATH_CACHE_SYNC_INTERVAL`` environment variable is set and the project
+        synchronizes its folders with Shotgun.
+        """
+        # path_cache imports from this module
+        from .. import path_cache
+
+        interval = path_cache.get_path_cache_sync_interval()
+        if interval is None:
+            return
+
+        if not self.tank.pipeline_configuration.get_shotgun_path_cache_enabled():
+            self.log_debug("Folders are not synchronized with Shotgun, not starting "
+                           "the path cache synchronizer.")
+            return
+
+        self._path_cache_synchronizer = path_cache.PathCacheSynchronizer(self.tank, interval)
+        self.log_debug("Starting path cache synchronizer, polling every %s seconds..." % interval)
+        self._path_cache_synchronizer.start()
+
     def __repr__(self):
         return "<Sgtk Engine 0x%08x: %s, env: %s>" % (id(self),  
                                                       self.name, 
@@ -716,6 +742,12 @@ class Engine(TankBundle):
                 self._metrics_dispatcher.stop()
                 self.log_debug("Metrics dispatcher stopped.")
 
+            # halt background path cache syncs
+            if self._path_cache_synchronizer:
+                self.log_debug("Stopping path cache synchronizer.")
+                self._path_cache_synchronizer.halt()
+                self._path_cache_synchronizer = None
+
         # kill log handler
         LogManager().root_logger.removeHandler(self.__log_handler)
         self.__log_handler = None
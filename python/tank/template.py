@@ -16,11 +16,15 @@ Management of file and directory templates.
 import os
 import re
 import sys
+import threading
+import collections
 
 from . import templatekey
 from .errors import TankError
 from . import constants
 from .template_path_parser import TemplatePathParser
+from .template_cache import TemplateCache
+from .util.lru_cache import LRUCache
 
 class Template(object):
     """
@@ -104,6 +108,31 @@ class Template(object):
         self._prefix = ''
         self._static_tokens = []
 
+        # compiled regular expressions for each of the definition variations,
+        # shared by all the parsers created for this template
+        self._path_parser_caches = None
+
+        # results of parsing paths, keyed by normalized path and skipped keys
+        self._fields_cache = LRUCache(_get_default_fields_cache_size())
+
+        # _FormatPlan for each of the definition variations, built on first use
+        self._format_plans = None
+
+    def __getstate__(self):
+        """
+        Returns the state of the template for pickling, without the cached fields.
+        """
+        state = self.__dict__.copy()
+        del state["_fields_cache"]
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the state of a pickled template, with an empty fields cache.
+        """
+        self.__dict__.update(state)
+        self._fields_cache = LRUCache(_get_default_fields_cache_size())
+
     def __repr__(self):
         class_name = self.__class__.__name__
         if self.name:
@@ -242,7 +271,28 @@ class Template(object):
         """
         return self._apply_fields(fields, platform=platform)
 
-    def _apply_fields(self, fields, ignore_types=None, platform=None):
+    def apply_fields_many(self, fields_list, platform=None):
+        """
+        Creates paths for several sets of fields at once. This is equivalent to calling
+        :meth:`apply_fields` for each of them, but values shared by the sets of fields,
+        for example all the fields but the frame number when building the paths of an
+        image sequence, are only validated and formatted once. Example::
+
+            >>> fields = {"Shot": "shot_2", "name": "henry", "version": 3}
+            >>> template_path.apply_fields_many([dict(fields, SEQ=f) for f in range(1, 4)])
+            ['/studio_root/shots/shot_2/henry.v003.0001.exr',
+             '/studio_root/shots/shot_2/henry.v003.0002.exr',
+             '/studio_root/shots/shot_2/henry.v003.0003.exr']
+
+        :param fields_list: Iterable of mappings of keys to fields.
+        :param platform: Optional operating system platform, as for :meth:`apply_fields`.
+
+        :returns: List of paths, in the same order as the sets of fields.
+        """
+        str_cache = {}
+        return [self._apply_fields(fields, platform=platform, str_cache=str_cache) for fields in fields_list]
+
+    def _apply_fields(self, fields, ignore_types=None, platform=None, str_cache=None):
         """
         Creates path using fields.
 
@@ -255,35 +305,33 @@ class Template(object):
                          current operating system. If you pass in a sys.platform-style string
                          (e.g. 'win32', 'linux2' or 'darwin'), paths will be generated to 
                          match that platform.
+        :param str_cache: Optional dictionary used to reuse the string values of fields
+                          between calls.
 
         :returns: Full path, matching the template with the given fields inserted.
         """        
-        ignore_types = ignore_types or []
-
-        # find largest key mapping without missing values
-        keys = None
-        # index of matching keys will be used to find cleaned_definition
-        index = -1
-        for index, cur_keys in enumerate(self._keys):
-            missing_keys = self._missing_keys(fields, cur_keys, skip_defaults=True)
-            if not missing_keys:
-                keys = cur_keys
-                break
+        # use the largest variation without missing values
+        for plan in self._get_format_plans():
+            if plan.accepts(fields):
+                return plan.format(fields, ignore_types, str_cache)
 
-        
-        if keys is None:
-            raise TankError("Tried to resolve a path from the template %s and a set "
-                            "of input fields '%s' but the following required fields were missing "
-                            "from the input: %s" % (self, fields, missing_keys))
+        missing_keys = self._missing_keys(fields, self._keys[-1], skip_defaults=True)
+        raise TankError("Tried to resolve a path from the template %s and a set "
+                        "of input fields '%s' but the following required fields were missing "
+                        "from the input: %s" % (self, fields, missing_keys))
 
-        # Process all field values through template keys 
-        processed_fields = {}
-        for key_name, key in keys.items():
-            value = fields.get(key_name)
-            ignore_type =  key_name in ignore_types
-            processed_fields[key_name] = key.str_from_value(value, ignore_type=ignore_type)
+    def _get_format_plans(self):
+        """
+        Returns the plans used to build strings from fields for each of the
+        definition variations, building them on first use.
 
-        return self._cleaned_definitions[index] % processed_fields
+        :returns: List of :class:`_FormatPlan`, longest variation first.
+        """
+        if self._format_plans is None:
+            self._format_plans = [
+                _FormatPlan(definition, keys) for definition, keys in zip(self._definitions, self._keys)
+            ]
+        return self._format_plans
 
     def _definition_variations(self, definition):
         """
@@ -369,6 +417,23 @@ class Template(object):
         """
         raise NotImplementedError
 
+    def _create_path_parsers(self):
+        """
+        Creates parsers for each of the definition variations, most inclusive
+        first. Parsers hold the state of a single parse so new ones are created
+        each time but they share the regular expressions they compile for the
+        lifetime of the template.
+
+        :returns: List of :class:`TemplatePathParser`
+        """
+        if self._path_parser_caches is None:
+            self._path_parser_caches = [{} for _ in self._ordered_keys]
+        return [
+            TemplatePathParser(ordered_keys, static_tokens, regex_cache)
+            for ordered_keys, static_tokens, regex_cache
+            in zip(self._ordered_keys, self._static_tokens, self._path_parser_caches)
+        ]
+
     def validate_and_get_fields(self, path, required_fields=None, skip_keys=None):
         """
         Takes an input string and determines whether it can be mapped to the template pattern.
@@ -397,11 +462,11 @@ class Template(object):
         required_fields = required_fields or {}
         skip_keys = skip_keys or []
         
-        # Path should split into keys as per template
-        path_fields = {}
-        try:
-            path_fields = self.get_fields(path, skip_keys=skip_keys)
-        except TankError:
+        # Path should split into keys as per template. Parse the path directly
+        # rather than through get_fields as we don't need to know why the path
+        # isn't valid.
+        path_fields = self._get_fields(path, skip_keys)
+        if path_fields is None:
             return None
         
         # Check that all required fields were found in the path:
@@ -456,19 +521,91 @@ class Template(object):
         :returns: Values found in the path based on keys in template
         :rtype: Dictionary
         """
+        fields = self._get_fields(input_path, skip_keys)
+
+        if fields is None:
+            # parse the path again to find out why it doesn't match
+            path_parser = self._parse_path(input_path, skip_keys)[0]
+            raise TankError("Template %s: %s" % (str(self), path_parser.last_error))
+
+        return fields
+
+    def get_fields_cache_stats(self):
+        """
+        Returns statistics about the cache of the results of :meth:`get_fields`,
+        :meth:`validate` and :meth:`validate_and_get_fields` for this template::
+
+            >>> template_path.get_fields_cache_stats()
+            {'hits': 3, 'misses': 2, 'size': 2, 'max_size': 1000}
+
+        :returns: Dictionary with the number of ``hits`` and ``misses`` since the
+                  cache was created or last cleared, the current ``size`` and the
+                  ``max_size`` of the cache.
+        """
+        return self._fields_cache.get_stats()
+
+    def set_fields_cache_size(self, max_size):
+        """
+        Sets the maximum number of paths whose fields are cached for this template.
+        The default size can be set with the ``SGTK_TEMPLATE_FIELDS_CACHE_SIZE``
+        environment variable.
+
+        :param int max_size: Maximum number of cached paths. Use 0 to disable the cache.
+        """
+        self._fields_cache.max_size = max_size
+
+    def clear_fields_cache(self):
+        """
+        Removes all the cached fields for this template and resets the cache statistics.
+        """
+        self._fields_cache.clear()
+
+    def _get_fields(self, input_path, skip_keys):
+        """
+        Returns the fields found in a path, caching the result.
+
+        :param input_path: Source path for values
+        :param skip_keys: Optional keys to skip
+
+        :returns: Copy of the fields found in the path or None if the path doesn't match.
+        """
+        if not self._fields_cache.max_size:
+            return self._parse_path(input_path, skip_keys)[1]
+
+        # the parser normalizes the path and only checks if key names are in the
+        # skipped keys so different forms of the same inputs share the same results
+        if isinstance(skip_keys, basestring):
+            cache_key = (os.path.normpath(input_path), skip_keys)
+        else:
+            cache_key = (os.path.normpath(input_path), frozenset(skip_keys or []))
+
+        fields = self._fields_cache.get(cache_key, _NOT_CACHED)
+        if fields is _NOT_CACHED:
+            fields = self._parse_path(input_path, skip_keys)[1]
+            self._fields_cache.set(cache_key, fields)
+
+        # don't let callers modify the cached fields
+        return None if fields is None else dict(fields)
+
+    def _parse_path(self, input_path, skip_keys):
+        """
+        Parses a path with each of the definition variations until one matches.
+
+        :param input_path: Source path for values
+        :param skip_keys: Optional keys to skip
+
+        :returns: Tuple (parser, fields) with the last parser used and the fields
+                  found in the path or None if the path doesn't match.
+        """
         path_parser = None
         fields = None
 
-        for ordered_keys, static_tokens in zip(self._ordered_keys, self._static_tokens):
-            path_parser = TemplatePathParser(ordered_keys, static_tokens)
+        for path_parser in self._create_path_parsers():
             fields = path_parser.parse_path(input_path, skip_keys)
             if fields != None:
                 break
 
-        if fields is None:
-            raise TankError("Template %s: %s" % (str(self), path_parser.last_error))
-
-        return fields
+        return path_parser, fields
 
 
 class TemplatePath(Template):
@@ -527,7 +664,7 @@ class TemplatePath(Template):
             return TemplatePath(parent_definition, self.keys, self.root_path, None, self._per_platform_roots)
         return None
 
-    def _apply_fields(self, fields, ignore_types=None, platform=None):
+    def _apply_fields(self, fields, ignore_types=None, platform=None, str_cache=None):
         """
         Creates path using fields.
 
@@ -540,10 +677,12 @@ class TemplatePath(Template):
                          current operating system. If you pass in a sys.platform-style string
                          (e.g. 'win32', 'linux2' or 'darwin'), paths will be generated to 
                          match that platform.
+        :param str_cache: Optional dictionary used to reuse the string values of fields
+                          between calls.
 
         :returns: Full path, matching the template with the given fields inserted.
         """        
-        relative_path = super(TemplatePath, self)._apply_fields(fields, ignore_types, platform)
+        relative_path = super(TemplatePath, self)._apply_fields(fields, ignore_types, platform, str_cache)
         
         if platform is None:
             # return the current OS platform's path
@@ -638,9 +777,253 @@ class TemplateString(Template):
         :returns: Values found in the path based on keys in template
         :rtype: Dictionary
         """
+        return super(TemplateString, self).get_fields(input_path, skip_keys=skip_keys)
+
+    def _parse_path(self, input_path, skip_keys):
+        """
+        Parses a string with each of the definition variations until one matches.
+
+        :param input_path: Source string for values
+        :param skip_keys: Optional keys to skip
+
+        :returns: Tuple (parser, fields) with the last parser used and the fields
+                  found in the string or None if the string doesn't match.
+        """
         # add path prefix as original design was to require project root
         adj_path = os.path.join(self._prefix, input_path)
-        return super(TemplateString, self).get_fields(adj_path, skip_keys=skip_keys)
+        return super(TemplateString, self)._parse_path(adj_path, skip_keys)
+
+
+class _FormatPlan(object):
+    """
+    Precompiled form of a definition variation, used to build strings from fields
+    without parsing the definition again.
+    """
+    __slots__ = ["_keys", "_required_names", "_segments", "_key_segments"]
+
+    def __init__(self, definition, keys):
+        """
+        Construction
+
+        :param definition: Definition variation, with aliased key names substituted.
+        :param keys: Mapping of key names to keys used by the definition.
+        """
+        self._keys = keys.items()
+        # keys without a default value need a value in the fields
+        self._required_names = [name for name, key in self._keys if key.default is None]
+        # literal segments alternate with key names
+        self._segments = re.split(r"{(%s)}" % constants.TEMPLATE_KEY_NAME_REGEX, definition)
+        self._key_segments = [(index, self._segments[index]) for index in range(1, len(self._segments), 2)]
+
+    def accepts(self, fields):
+        """
+        Checks if the fields have values for all the keys requiring one.
+
+        :param fields: Mapping of key names to values.
+        :returns: True if a string can be built from the fields, False otherwise.
+        """
+        for name in self._required_names:
+            if fields.get(name) is None:
+                return False
+        return True
+
+    def format(self, fields, ignore_types=None, str_cache=None):
+        """
+        Builds a string from fields.
+
+        :param fields: Mapping of key names to values.
+        :param ignore_types: Names of the keys whose values aren't validated.
+        :param str_cache: Optional dictionary of string values already computed for
+                          the keys, which is updated with the new values.
+        :returns: The string.
+        :raises: :class:`TankError` if a value is not valid for its key.
+        """
+        strings = {}
+        for name, key in self._keys:
+            value = fields.get(name)
+            ignore_type = bool(ignore_types) and name in ignore_types
+            if str_cache is None:
+                strings[name] = key.str_from_value(value, ignore_type=ignore_type)
+                continue
+
+            # the type is part of the key as values which compare equal, such as
+            # 1 and True, can be formatted differently.
+            cache_key = (name, type(value), value, ignore_type)
+            try:
+                strings[name] = str_cache[cache_key]
+            except KeyError:
+                strings[name] = str_cache[cache_key] = key.str_from_value(value, ignore_type=ignore_type)
+            except TypeError:
+                # unhashable value
+                strings[name] = key.str_from_value(value, ignore_type=ignore_type)
+
+        segments = self._segments[:]
+        for index, name in self._key_segments:
+            segments[index] = strings[name]
+        return "".join(segments)
+
+
+class LazyTemplates(collections.MutableMapping):
+    """
+    Dictionary of templates keyed by template name, as returned by :func:`read_templates`.
+
+    Templates are registered with their definitions but the :class:`TemplatePath` and
+    :class:`TemplateString` objects are only built when they are first accessed, so
+    that processes only pay for the templates they use. Iterating over the values
+    builds all the templates. Names are always iterated over in alphabetical order
+    so that errors in template definitions surface in the same order every time.
+
+    Templates can be added, replaced or removed as with a regular dictionary.
+    """
+
+    def __init__(self, keys):
+        """
+        Construction
+
+        :param keys: Mapping of key names to keys used by the templates.
+        """
+        self._keys = keys
+        # templates already built, keyed by name
+        self._templates = {}
+        # (template class, arguments) tuples for the templates still to be
+        # built, keyed by name
+        self._pending = {}
+        # incremented whenever templates are added, replaced or removed
+        self._revision = 0
+        # building a string template can build the template it is validated
+        # with, hence the reentrant lock
+        self._lock = threading.RLock()
+
+    def add_path(self, name, definition, root_path, per_platform_roots=None):
+        """
+        Registers a :class:`TemplatePath` to build on first access.
+
+        :param name: Name of the template.
+        :param definition: Template definition string.
+        :param root_path: Path to project root for this template.
+        :param per_platform_roots: Root paths for all supported operating systems.
+        """
+        with self._lock:
+            self._templates.pop(name, None)
+            self._pending[name] = (TemplatePath, (definition, root_path, per_platform_roots))
+            self._revision += 1
+
+    def add_string(self, name, definition, validator_name=None):
+        """
+        Registers a :class:`TemplateString` to build on first access.
+
+        :param name: Name of the template.
+        :param definition: Template definition string.
+        :param validator_name: Optional name of the template to validate with.
+        """
+        with self._lock:
+            self._templates.pop(name, None)
+            self._pending[name] = (TemplateString, (definition, validator_name))
+            self._revision += 1
+
+    def get_revision(self):
+        """
+        Returns a number which changes whenever templates are added, replaced or
+        removed. Building a template doesn't change it.
+
+        :returns: Revision number.
+        """
+        return self._revision
+
+    def get_built_templates(self):
+        """
+        Returns the templates built so far, without building any other.
+
+        :returns: List of templates.
+        """
+        with self._lock:
+            return self._templates.values()
+
+    def build_all(self):
+        """
+        Builds all the templates not built yet.
+
+        :raises: :class:`TankError` for the first template, in alphabetical order,
+                 with an invalid definition.
+        """
+        for name in self:
+            self[name]
+
+    def copy(self):
+        """
+        Returns a regular dictionary with all the templates, building them if needed.
+        """
+        return dict(self.iteritems())
+
+    def __getitem__(self, name):
+        try:
+            return self._templates[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name in self._templates:
+                return self._templates[name]
+            # raises a KeyError for unknown templates
+            template_class, args = self._pending[name]
+            try:
+                if template_class is TemplatePath:
+                    definition, root_path, per_platform_roots = args
+                    template = TemplatePath(definition, self._keys, root_path, name, per_platform_roots)
+                else:
+                    definition, validator_name = args
+                    validator = self.get(validator_name) if validator_name else None
+                    template = TemplateString(definition, self._keys, name, validate_with=validator)
+            except TankError, e:
+                raise TankError("Invalid template %s: %s" % (name, e))
+
+            self._templates[name] = template
+            del self._pending[name]
+            return template
+
+    def __setitem__(self, name, template):
+        with self._lock:
+            self._pending.pop(name, None)
+            self._templates[name] = template
+            self._revision += 1
+
+    def __delitem__(self, name):
+        with self._lock:
+            if name in self._pending:
+                del self._pending[name]
+            else:
+                del self._templates[name]
+            self._revision += 1
+
+    def __contains__(self, name):
+        return name in self._templates or name in self._pending
+
+    def __iter__(self):
+        with self._lock:
+            names = sorted(set(self._templates) | set(self._pending))
+        return iter(names)
+
+    def __len__(self):
+        return len(self._templates) + len(self._pending)
+
+    def __repr__(self):
+        return "<Sgtk LazyTemplates %d templates, %d built>" % (len(self), len(self._templates))
+
+    def __getstate__(self):
+        """
+        Returns the state of the templates for pickling, without the lock.
+        """
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the state of pickled templates.
+        """
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
 
 def split_path(input_path):
     """
@@ -656,15 +1039,52 @@ def split_path(input_path):
     cur_path = cur_path.replace("\\", "/")
     return cur_path.split("/")
 
-def read_templates(pipeline_configuration):
+# marker for paths not in the fields cache
+_NOT_CACHED = object()
+
+
+def _get_default_fields_cache_size():
+    """
+    Returns the maximum number of paths whose fields are cached by each template,
+    as set by the ``SGTK_TEMPLATE_FIELDS_CACHE_SIZE`` environment variable.
+
+    :returns: Cache size.
+    """
+    size = os.environ.get(constants.TEMPLATE_FIELDS_CACHE_SIZE_ENV_VAR)
+    if size is None:
+        return constants.TEMPLATE_FIELDS_CACHE_SIZE
+    try:
+        return int(size)
+    except ValueError:
+        return constants.TEMPLATE_FIELDS_CACHE_SIZE
+
+
+def read_templates(pipeline_configuration, eager=False):
     """
     Creates templates and keys based on contents of templates file.
 
+    Template definitions are checked right away but the template objects are only
+    built when first accessed, unless ``eager`` is set or the ``SGTK_EAGER_TEMPLATES``
+    environment variable is set.
+
     :param pipeline_configuration: pipeline config object
+    :param eager: If True, all the templates are built right away so that errors in
+                  their definitions are raised by this function.
 
-    :returns: Dictionary of form {template name: template object}
+    :returns: :class:`LazyTemplates` dictionary of form {template name: template object}
     """    
+    eager = eager or bool(os.environ.get(constants.EAGER_TEMPLATES_ENV_VAR))
     per_platform_roots = pipeline_configuration.get_all_platform_data_roots()
+
+    # templates built by a previous process from the same configuration
+    # can be reused as is.
+    cache = TemplateCache(pipeline_configuration, per_platform_roots)
+    templates = cache.load()
+    if templates is not None:
+        if eager:
+            templates.build_all()
+        return templates
+
     data = pipeline_configuration.get_templates_config()            
     
     # get dictionaries from the templates config file:
@@ -677,17 +1097,29 @@ def read_templates(pipeline_configuration):
         return d            
             
     keys = templatekey.make_keys(get_data_section("keys"))
-    template_paths = make_template_paths(get_data_section("paths"), keys, per_platform_roots)
-    template_strings = make_template_strings(get_data_section("strings"), keys, template_paths)
+    templates = LazyTemplates(keys)
+
+    paths_data = _process_templates_data(get_data_section("paths"), "path")
+    for template_name, template_data in paths_data.iteritems():
+        definition, root_path, platform_roots = _get_template_path_args(
+            template_name, template_data, per_platform_roots
+        )
+        templates.add_path(template_name, definition, root_path, platform_roots)
+
+    strings_data = _process_templates_data(get_data_section("strings"), "path")
+    for template_name, template_data in strings_data.iteritems():
+        definition, validator_name = _get_template_string_args(template_name, template_data, paths_data)
+        templates.add_string(template_name, definition, validator_name)
 
     # Detect duplicate names across paths and strings
-    dup_names =  set(template_paths).intersection(set(template_strings))
+    dup_names =  set(paths_data).intersection(set(strings_data))
     if dup_names:
         raise TankError("Detected paths and strings with the same name: %s" % str(list(dup_names)))
 
-    # Put path and strings together
-    templates = template_paths
-    templates.update(template_strings)
+    if eager:
+        templates.build_all()
+
+    cache.save(templates)
     return templates
 
 
@@ -707,22 +1139,10 @@ def make_template_paths(data, keys, all_per_platform_roots):
     templates_data = _process_templates_data(data, "path")
 
     for template_name, template_data in templates_data.items():
-        definition = template_data["definition"]
-        root_name = template_data["root_name"]
-        # to avoid confusion between strings and paths, validate to check
-        # that each item contains at least a "/" (#19098)
-        if "/" not in definition:
-            raise TankError("The template %s (%s) does not seem to be a valid path. A valid "
-                            "path needs to contain at least one '/' character. Perhaps this "
-                            "template should be in the strings section "
-                            "instead?" % (template_name, definition))
-
-        root_path = all_per_platform_roots[root_name].get(sys.platform)
-        if root_path is None:
-            raise TankError("Undefined Shotgun storage! The local file storage '%s' is not defined for this "
-                            "operating system." % root_name)
-
-        template_path = TemplatePath(definition, keys, root_path, template_name, all_per_platform_roots[root_name])
+        definition, root_path, per_platform_roots = _get_template_path_args(
+            template_name, template_data, all_per_platform_roots
+        )
+        template_path = TemplatePath(definition, keys, root_path, template_name, per_platform_roots)
         template_paths[template_name] = template_path
 
     return template_paths
@@ -744,23 +1164,62 @@ def make_template_strings(data, keys, template_paths):
     templates_data = _process_templates_data(data, "path")
 
     for template_name, template_data in templates_data.items():
-        definition = template_data["definition"]
-
-        validator_name = template_data.get("validate_with")
-        validator = template_paths.get(validator_name)
-        if validator_name and not validator:
-            msg = "Template %s validate_with is set to undefined template %s."
-            raise TankError(msg %(template_name, validator_name))
+        definition, validator_name = _get_template_string_args(template_name, template_data, template_paths)
 
         template_string = TemplateString(definition,
                                          keys,
                                          template_name,
-                                         validate_with=validator)
+                                         validate_with=template_paths.get(validator_name))
 
         template_strings[template_name] = template_string
 
     return template_strings
 
+def _get_template_path_args(template_name, template_data, all_per_platform_roots):
+    """
+    Checks the data of a template path.
+
+    :param template_name: Name of the template.
+    :param template_data: Conformed data of the template.
+    :param all_per_platform_roots: Root paths for all platforms, keyed by storage root name.
+
+    :returns: Tuple (definition, root path, per platform roots) for the template.
+    """
+    definition = template_data["definition"]
+    root_name = template_data["root_name"]
+    # to avoid confusion between strings and paths, validate to check
+    # that each item contains at least a "/" (#19098)
+    if "/" not in definition:
+        raise TankError("The template %s (%s) does not seem to be a valid path. A valid "
+                        "path needs to contain at least one '/' character. Perhaps this "
+                        "template should be in the strings section "
+                        "instead?" % (template_name, definition))
+
+    root_path = all_per_platform_roots[root_name].get(sys.platform)
+    if root_path is None:
+        raise TankError("Undefined Shotgun storage! The local file storage '%s' is not defined for this "
+                        "operating system." % root_name)
+
+    return definition, root_path, all_per_platform_roots[root_name]
+
+def _get_template_string_args(template_name, template_data, template_paths):
+    """
+    Checks the data of a template string.
+
+    :param template_name: Name of the template.
+    :param template_data: Conformed data of the template.
+    :param template_paths: Dictionary of the template paths available for validation,
+                           keyed by name.
+
+    :returns: Tuple (definition, name of the template to validate with or None).
+    """
+    validator_name = template_data.get("validate_with")
+    if validator_name and validator_name not in template_paths:
+        msg = "Template %s validate_with is set to undefined template %s."
+        raise TankError(msg %(template_name, validator_name))
+
+    return template_data["definition"], validator_name
+
 def _conform_template_data(template_data, template_name):
     """
     Takes data for single template and conforms it expected data structure.
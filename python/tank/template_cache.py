@@ -0,0 +1,279 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+On disk cache of the templates built from the templates configuration of a
+pipeline configuration.
+"""
+
+import os
+import sys
+import stat
+import hashlib
+import tempfile
+import cPickle as pickle
+
+from . import constants
+from .errors import TankUnreadableFileError
+from .log import LogManager
+from .util import filesystem
+from .util import yaml_cache
+from .util.includes import resolve_include
+
+log = LogManager.get_logger(__name__)
+
+# version of the cache file format, to be bumped whenever the content of the
+# cache or the way it is fingerprinted changes.
+_CACHE_FORMAT_VERSION = 2
+
+# modules defining the classes stored in the cache, relative to this module.
+# Changing them invalidates the cache.
+_CODE_FILES = [
+    "template.py",
+    "templatekey.py",
+    "template_path_parser.py",
+    os.path.join("util", "lru_cache.py"),
+]
+
+
+class TemplateCache(object):
+    """
+    Stores the :class:`~sgtk.template.LazyTemplates` read from the templates configuration
+    of a pipeline configuration in a file, so that processes using the same configuration
+    don't have to read the configuration again. The cache holds the keys, the definitions of
+    all the templates and the templates which were already built when it was saved.
+
+    Since templates are built on first access, the cache is usually saved before any
+    template is built, unless they are read eagerly. It then only spares reading and
+    checking the configuration: each process still builds the templates, including
+    their parsers, when it first uses them.
+
+    The cache file is only writable by its owner, since loading it runs code defined
+    by its contents. Cache files writable by others are ignored and replaced.
+
+    The cache is invalidated by a fingerprint of:
+
+    - the contents of the templates file and of all the files it includes,
+    - the files the includes resolve to, as they can depend on environment variables,
+    - the storage roots of the pipeline configuration and the current platform,
+    - the modules defining the template classes.
+
+    Reading or writing the cache never fails: any error is logged and treated as
+    a cache miss. The cache can be disabled by setting the ``SGTK_DISABLE_TEMPLATES_CACHE``
+    environment variable.
+    """
+
+    def __init__(self, pipeline_configuration, per_platform_roots):
+        """
+        Construction
+
+        :param pipeline_configuration: :class:`~sgtk.pipelineconfig.PipelineConfiguration`
+                                       the templates are read from.
+        :param per_platform_roots: Storage roots for all platforms, as returned by
+                                   :meth:`~sgtk.pipelineconfig.PipelineConfiguration.get_all_platform_data_roots`.
+        """
+        self._templates_file = pipeline_configuration.get_templates_config_path()
+        self._cache_file = os.path.join(
+            pipeline_configuration.get_shotgun_menu_cache_location(),
+            constants.TEMPLATES_CACHE_FILE
+        )
+        self._per_platform_roots = per_platform_roots
+
+    @property
+    def path(self):
+        """
+        Path to the cache file.
+        """
+        return self._cache_file
+
+    @classmethod
+    def is_enabled(cls):
+        """
+        Checks if the cache is enabled.
+
+        :returns: False if the cache was disabled with an environment variable.
+        """
+        return not os.environ.get(constants.DISABLE_TEMPLATES_CACHE_ENV_VAR)
+
+    def load(self):
+        """
+        Loads the templates from the cache.
+
+        :returns: :class:`~sgtk.template.LazyTemplates` or None if the cache doesn't
+                  exist or is out of date.
+        """
+        if not self.is_enabled() or not os.path.exists(self._cache_file):
+            return None
+
+        try:
+            # unpickling can run arbitrary code, don't trust what anyone could have written.
+            mode = os.stat(self._cache_file).st_mode
+            if sys.platform != "win32" and mode & (stat.S_IWGRP | stat.S_IWOTH):
+                log.debug("Ignoring templates cache %s writable by other users." % self._cache_file)
+                return None
+
+            fh = open(self._cache_file, "rb")
+            try:
+                # the header is read on its own so that the templates are only
+                # loaded if they are up to date.
+                header = pickle.load(fh)
+                if header.get("version") != _CACHE_FORMAT_VERSION:
+                    log.debug("Ignoring templates cache %s with a different format." % self._cache_file)
+                    return None
+
+                fingerprint = self._get_fingerprint(header["files"], header["includes"])
+                if fingerprint != header["fingerprint"]:
+                    log.debug("Templates cache %s is out of date." % self._cache_file)
+                    return None
+
+                templates = pickle.load(fh)
+            finally:
+                fh.close()
+        except Exception, e:
+            log.debug("Could not read templates cache %s: %s" % (self._cache_file, e))
+            return None
+
+        log.debug("Read %d templates from cache %s" % (len(templates), self._cache_file))
+        return templates
+
+    @filesystem.with_cleared_umask
+    def save(self, templates):
+        """
+        Saves templates to the cache.
+
+        :param templates: :class:`~sgtk.template.LazyTemplates` read from the current
+                          templates configuration.
+        """
+        if not self.is_enabled():
+            return
+
+        try:
+            files, includes = self._get_template_files()
+            header = {
+                "version": _CACHE_FORMAT_VERSION,
+                "files": files,
+                "includes": includes,
+                "fingerprint": self._get_fingerprint(files, includes),
+            }
+
+            # build what is built lazily by the templates so that it's cached as well.
+            # Templates not built yet are stored as definitions.
+            for template in templates.get_built_templates():
+                template._get_format_plans()
+
+            filesystem.ensure_folder_exists(os.path.dirname(self._cache_file))
+
+            # write to a temporary file first so that other processes never
+            # read a partially written cache. The file is created with a unique
+            # name since processes on several hosts can write the cache
+            # concurrently on shared storage.
+            (fd, tmp_file) = tempfile.mkstemp(
+                prefix="%s." % os.path.basename(self._cache_file),
+                suffix=".tmp",
+                dir=os.path.dirname(self._cache_file)
+            )
+            try:
+                fh = os.fdopen(fd, "wb")
+                try:
+                    pickle.dump(header, fh, pickle.HIGHEST_PROTOCOL)
+                    pickle.dump(templates, fh, pickle.HIGHEST_PROTOCOL)
+                finally:
+                    fh.close()
+                # readable by all, the temporary file is only readable by its owner.
+                os.chmod(tmp_file, 0644)
+
+                if sys.platform == "win32" and os.path.exists(self._cache_file):
+                    # renaming doesn't replace existing files on windows
+                    filesystem.safe_delete_file(self._cache_file)
+                os.rename(tmp_file, self._cache_file)
+            except:
+                filesystem.safe_delete_file(tmp_file)
+                raise
+        except Exception, e:
+            log.debug("Could not write templates cache %s: %s" % (self._cache_file, e))
+            return
+
+        log.debug("Wrote %d templates to cache %s" % (len(templates), self._cache_file))
+
+    def _get_template_files(self):
+        """
+        Finds the templates file and all the files it includes, recursively.
+
+        :returns: Tuple with the list of files and a list of (file, include) tuples
+                  for each include found in the files, include being the raw value
+                  found in the file.
+        """
+        files = []
+        includes = []
+        pending_files = [self._templates_file]
+        while pending_files:
+            file_name = pending_files.pop(0)
+            if file_name in files:
+                continue
+            files.append(file_name)
+
+            try:
+                data = yaml_cache.g_yaml_cache.get(file_name, deepcopy_data=False) or {}
+            except TankUnreadableFileError:
+                # missing files are part of the fingerprint as such
+                continue
+
+            file_includes = []
+            if constants.SINGLE_INCLUDE_SECTION in data:
+                file_includes.append(data[constants.SINGLE_INCLUDE_SECTION])
+            if constants.MULTI_INCLUDE_SECTION in data:
+                file_includes.extend(data[constants.MULTI_INCLUDE_SECTION])
+
+            for include in file_includes:
+                includes.append((file_name, include))
+                resolved = resolve_include(file_name, include)
+                if resolved:
+                    pending_files.append(resolved)
+
+        return files, includes
+
+    def _get_fingerprint(self, files, includes):
+        """
+        Computes the fingerprint of the templates configuration.
+
+        :param files: List of files the configuration is made of.
+        :param includes: List of (file, include) tuples for the includes found in the files.
+        :returns: Fingerprint string.
+        """
+        sha = hashlib.sha1()
+        sha.update(sys.platform)
+        sha.update(repr(sorted(
+            (root_name, sorted(roots.items())) for root_name, roots in self._per_platform_roots.iteritems()
+        )))
+
+        code_root = os.path.dirname(__file__)
+        for code_file in _CODE_FILES:
+            try:
+                stat = os.stat(os.path.join(code_root, code_file))
+            except OSError:
+                # running from an archive or with compiled files only
+                continue
+            sha.update("%s:%s:%s" % (code_file, stat.st_size, stat.st_mtime))
+
+        for file_name in files:
+            sha.update(file_name.encode("utf-8") if isinstance(file_name, unicode) else file_name)
+            try:
+                fh = open(file_name, "rb")
+                try:
+                    sha.update(hashlib.sha1(fh.read()).hexdigest())
+                finally:
+                    fh.close()
+            except IOError:
+                sha.update("<missing>")
+
+        for file_name, include in includes:
+            sha.update(repr(resolve_include(file_name, include)))
+
+        return sha.hexdigest()
@@ -0,0 +1,243 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Index of templates keyed by their static tokens, used to quickly narrow down the
+set of templates that could possibly match a given path.
+"""
+
+import os
+
+from .template import TemplatePath, TemplateString, LazyTemplates
+
+
+class TemplateIndex(object):
+    """
+    Index over a collection of templates which, given an input path, returns the
+    subset of templates which could possibly match that path.
+
+    Each :class:`TemplatePathParser` anchors its first static token (for a path
+    template this is the storage root followed by any leading static part of the
+    definition) either at the very start of the path or, if the template has at
+    least as many keys as static tokens, right after a leading key value. Templates
+    are stored in a trie keyed on the path components of that first static token
+    so that a lookup only needs to walk the components of the input path rather
+    than run the full parser for every template.
+
+    The parser also requires all the static tokens to be found in the path, in
+    order and without overlapping, and key values can't contain path separators.
+    A path can therefore only match a definition variation with exactly as many
+    separators in its static tokens as there are in the path. There is one trie
+    per number of separators, and the candidates found in it are only returned if
+    all their static tokens can be found in the path.
+
+    The index never excludes a template that would validate the path so the set
+    of candidates, when fully validated, gives exactly the same result as
+    validating every template.
+    """
+
+    def __init__(self, templates):
+        """
+        Construction
+
+        :param templates: Dictionary of templates keyed by template name, as
+                          found in :meth:`Sgtk.templates`.
+        """
+        # remember which templates the index was built from so that we can detect
+        # when it no longer reflects them. Lazy templates keep track of their changes
+        # so checking their revision is enough, for other dictionaries keep a shallow
+        # copy to compare with.
+        if isinstance(templates, LazyTemplates):
+            self._templates = templates
+            self._revision = templates.get_revision()
+        else:
+            self._templates = dict(templates)
+            self._revision = None
+
+        # the templates in the order that they were found in the dictionary. All
+        # candidates are returned in this order to maintain the ordering that a
+        # straight iteration over the templates dictionary would produce.
+        self._ordered_templates = []
+
+        # templates that can't be indexed and always need to be validated
+        self._unindexed = []
+
+        # tries for path templates and for string templates as the two types of
+        # templates parse different versions of the input path, keyed by the number
+        # of path separators in the static tokens of the definition variations.
+        self._path_tries = {}
+        self._string_tries = {}
+
+        for template in templates.itervalues():
+            order = len(self._ordered_templates)
+            self._ordered_templates.append(template)
+
+            if isinstance(template, TemplatePath):
+                tries = self._path_tries
+            elif isinstance(template, TemplateString):
+                tries = self._string_tries
+            else:
+                # unknown template type - we don't know how it parses paths so
+                # it always has to be considered.
+                self._unindexed.append(order)
+                continue
+
+            for ordered_keys, static_tokens in zip(template._ordered_keys, template._static_tokens):
+                if not static_tokens:
+                    # can't happen with the standard templates as there will always be
+                    # a prefix but play it safe!
+                    self._unindexed.append(order)
+                    break
+                num_separators = sum([token.count(os.path.sep) for token in static_tokens])
+                trie = tries.setdefault(num_separators, _StaticPrefixTrie())
+                # the parser only considers a path starting with a key value if there
+                # are at least as many keys as there are static tokens
+                trie.add(static_tokens[0], (order, static_tokens), len(ordered_keys) >= len(static_tokens))
+
+    def is_valid_for(self, templates):
+        """
+        Checks that this index was built from the given templates. Template
+        objects are compared by identity so any addition, removal or replacement
+        of a template will invalidate the index.
+
+        :param templates: Dictionary of templates keyed by template name.
+        :returns: True if the index can be used for the templates, False otherwise.
+        """
+        if self._revision is not None:
+            return templates is self._templates and templates.get_revision() == self._revision
+        return self._templates == templates
+
+    def get_candidates(self, path):
+        """
+        Returns all templates that could possibly match the given path. Templates
+        which are not returned are guaranteed not to validate the path.
+
+        :param path: Path to find candidate templates for.
+        :returns: List of templates, in the order they were found in the templates
+                  dictionary used to build this index.
+        """
+        # mimic the transformations done in Template.get_fields and
+        # TemplatePathParser.parse_path:
+        lower_path = os.path.normpath(path).lower()
+        lower_string_path = os.path.normpath(os.path.join("@", path)).lower()
+
+        orders = set(self._unindexed)
+        for tries, parsed_path in [(self._path_tries, lower_path), (self._string_tries, lower_string_path)]:
+            trie = tries.get(parsed_path.count(os.path.sep))
+            if trie is None:
+                continue
+            for order, static_tokens in trie.find(parsed_path):
+                if order not in orders and _contains_tokens(parsed_path, static_tokens):
+                    orders.add(order)
+
+        return [self._ordered_templates[order] for order in sorted(orders)]
+
+
+def _contains_tokens(lower_path, static_tokens):
+    """
+    Checks that all the static tokens can be found in the path, in order and without
+    overlapping, as required by :class:`TemplatePathParser`.
+
+    :param lower_path: Normalized, lower case path.
+    :param static_tokens: Lower case static tokens of a definition variation.
+    :returns: True if all the tokens were found, False otherwise.
+    """
+    position = 0
+    for token in static_tokens:
+        position = lower_path.find(token, position)
+        if position == -1:
+            return False
+        position += len(token)
+    return True
+
+
+class _StaticPrefixTrie(object):
+    """
+    Trie storing values keyed by the path components of a static token.
+
+    Every component of the token except the last is used as an edge in the trie;
+    the last (possibly partial or empty) component is stored alongside the value
+    in the node it leads to and is compared with the corresponding component of
+    the looked-up path.
+    """
+
+    def __init__(self):
+        """
+        Construction
+        """
+        self._root = _TrieNode()
+        # (token, value) for entries that may also match after a leading key value
+        self._unanchored = []
+
+    def add(self, token, value, unanchored=False):
+        """
+        Adds a value to the trie.
+
+        :param token:       Lower case static token the value is keyed by.
+        :param value:       Value to store.
+        :param unanchored:  True if the token may also be found after a leading key
+                            value rather than at the very start of a path.
+        """
+        components = token.split(os.path.sep)
+        node = self._root
+        for component in components[:-1]:
+            node = node.children.setdefault(component, _TrieNode())
+        node.tails.append((components[-1], value))
+
+        if unanchored:
+            self._unanchored.append((token, value))
+
+    def find(self, lower_path):
+        """
+        Finds all values whose static token could be found in the path at a position
+        where the template parser would consider it.
+
+        :param lower_path: Normalized, lower case path.
+        :returns: List of values.
+        """
+        values = []
+
+        # values whose token the path starts with:
+        components = lower_path.split(os.path.sep)
+        node = self._root
+        for component in components:
+            for tail, value in node.tails:
+                if component.startswith(tail):
+                    values.append(value)
+            node = node.children.get(component)
+            if node is None:
+                break
+
+        # values whose token can be found after a leading key. Key values
+        # can't contain path separators so the token has to start before
+        # or at the first separator in the path.
+        if self._unanchored:
+            first_sep = lower_path.find(os.path.sep)
+            if first_sep == -1:
+                first_sep = len(lower_path)
+            for token, value in self._unanchored:
+                if lower_path.find(token, 1, first_sep + len(token)) != -1:
+                    values.append(value)
+
+        return values
+
+
+class _TrieNode(object):
+    """
+    Node in a :class:`_StaticPrefixTrie`.
+    """
+    __slots__ = ["children", "tails"]
+
+    def __init__(self):
+        """
+        Construction
+        """
+        self.children = {}
+        self.tails = []
@@ -0,0 +1,249 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Grouping of paths matching a template into abstract paths, such as image sequences.
+"""
+
+import os
+import re
+
+from .errors import TankError
+from .templatekey import SequenceKey
+
+# matches the parts of a file name which typically change between the
+# files of a sequence.
+_DIGITS_RE = re.compile(r"\d+")
+
+
+class AbstractPathGrouper(object):
+    """
+    Groups paths matching a template into abstract paths, in which the values of
+    the template's abstract keys are replaced by their abstract values (for example
+    ``%04d`` for a :class:`SequenceKey`).
+
+    Rather than parsing every path, file names in the same directory are grouped by
+    their static signature (the file name with all digits masked out). The first
+    file found for a group is parsed with the template and a regular expression
+    matching the files which only differ from it by the values of their abstract
+    keys is derived from it. All other files of the group are then matched with
+    this expression, which is much cheaper than running the template parser for
+    each frame of a sequence. Files which don't match the expression of any group
+    are parsed with the template.
+    """
+
+    def __init__(self, template, fields):
+        """
+        Construction
+
+        :param template: :class:`TemplatePath` the paths match.
+        :param fields: Fields used to find the paths. Values given for abstract
+                       keys are kept in the abstract paths.
+        """
+        self._template = template
+        self._fields = fields
+        self._abstract_key_names = [k.name for k in template.keys.values() if k.is_abstract]
+
+        # list of _PathGroup for each (directory, signature) pair
+        self._groups = {}
+
+        # values found for the sequence keys of each abstract path, keyed by
+        # abstract path and then by key name
+        self._abstract_paths = {}
+
+    def add(self, path):
+        """
+        Adds a path to the groups. Paths which don't match the template are ignored.
+
+        :param path: Path to add.
+        """
+        dir_name, file_name = os.path.split(path)
+        signature = (dir_name, _DIGITS_RE.sub("#", file_name))
+
+        groups = self._groups.setdefault(signature, [])
+        for group in groups:
+            values = group.match(file_name)
+            if values is not None:
+                self._add_values(group.abstract_path, values)
+                return
+
+        path_fields = self._template.validate_and_get_fields(path)
+        if path_fields is None:
+            return
+
+        group = self._create_group(path, path_fields)
+        groups.append(group)
+        self._add_values(group.abstract_path, path_fields)
+
+    def get_abstract_paths(self):
+        """
+        Returns the abstract paths for all the paths added so far.
+
+        :returns: List of abstract paths.
+        """
+        return self._abstract_paths.keys()
+
+    def get_frame_ranges(self):
+        """
+        Returns the ranges of integer values found for the sequence keys of
+        each abstract path.
+
+        :returns: Dictionary keyed by abstract path of dictionaries keyed by sequence
+                  key name, with sorted lists of inclusive (first, last) ranges as values.
+        """
+        return dict(
+            (abstract_path, dict((name, _to_ranges(values)) for name, values in key_values.iteritems()))
+            for abstract_path, key_values in self._abstract_paths.iteritems()
+        )
+
+    def _add_values(self, abstract_path, path_fields):
+        """
+        Records the sequence key values of a path for an abstract path.
+
+        :param abstract_path: Abstract path the path belongs to.
+        :param path_fields: Fields extracted from the path.
+        """
+        key_values = self._abstract_paths.setdefault(abstract_path, {})
+        for name in self._abstract_key_names:
+            key = self._template.keys[name]
+            value = path_fields.get(name)
+            if isinstance(key, SequenceKey) and isinstance(value, int):
+                key_values.setdefault(name, set()).add(value)
+
+    def _create_group(self, path, path_fields):
+        """
+        Creates a group for a path parsed with the template.
+
+        :param path: Path that was parsed.
+        :param path_fields: Fields extracted from the path.
+        :returns: :class:`_PathGroup`
+        """
+        # collapse the abstract fields so that their default value is used,
+        # unless a value was explicitly given.
+        abstract_fields = dict(path_fields)
+        for name in self._abstract_key_names:
+            abstract_fields.pop(name, None)
+        for name, value in self._fields.iteritems():
+            if name not in abstract_fields:
+                abstract_fields[name] = value
+        abstract_path = self._template.apply_fields(abstract_fields)
+
+        # find the abstract keys whose values can change between files of the group.
+        # Keys also found in the directory have to keep the same value.
+        dir_name, file_name = os.path.split(path)
+        names = [name for name in self._abstract_key_names if name in path_fields and name not in self._fields]
+        markers = dict((name, "\0%d\0" % index) for index, name in enumerate(names))
+        marked_path = self._apply_markers(path_fields, markers)
+        if marked_path is None:
+            return _PathGroup(abstract_path, None, [])
+        marked_dir_name = os.path.dirname(marked_path)
+        names = [name for name in names if markers[name] not in marked_dir_name]
+        markers = dict((name, markers[name]) for name in names)
+        marked_path = self._apply_markers(path_fields, markers)
+        if marked_path is None or os.path.dirname(marked_path) != dir_name:
+            return _PathGroup(abstract_path, None, [])
+
+        # build a regular expression from the file name with the markers replaced
+        # by groups.
+        pattern = []
+        group_keys = []
+        marker_names = dict((marker, name) for name, marker in markers.iteritems())
+        for index, part in enumerate(re.split("(\0\d+\0)", os.path.basename(marked_path))):
+            if index % 2 == 0:
+                pattern.append(re.escape(part))
+            else:
+                key = self._template.keys[marker_names[part]]
+                pattern.append(r"(\d+)" if isinstance(key, SequenceKey) else "(.+?)")
+                group_keys.append(key)
+        regex = re.compile(r"%s\Z" % "".join(pattern), re.DOTALL)
+
+        group = _PathGroup(abstract_path, regex, group_keys)
+        if group.match(file_name) is None:
+            # the path doesn't have its canonical form, e.g. integer values with
+            # a different padding, so only use the group for identical paths.
+            return _PathGroup(abstract_path, None, [])
+        return group
+
+    def _apply_markers(self, path_fields, markers):
+        """
+        Builds a path from fields with markers in place of some values.
+
+        :param path_fields: Fields to build the path from.
+        :param markers: Dictionary of markers, keyed by key name.
+        :returns: The path or None if it can't be built.
+        """
+        marked_fields = dict(path_fields)
+        marked_fields.update(markers)
+        try:
+            return self._template._apply_fields(marked_fields, ignore_types=markers.keys())
+        except TankError:
+            return None
+
+
+class _PathGroup(object):
+    """
+    Group of file names belonging to the same abstract path.
+    """
+    __slots__ = ["abstract_path", "_regex", "_keys"]
+
+    def __init__(self, abstract_path, regex, keys):
+        """
+        Construction
+
+        :param abstract_path: Abstract path of the group.
+        :param regex: Regular expression matching the file names of the group, with one
+                      group for each value of an abstract key, or None if the group
+                      can't match any other file name.
+        :param keys: Key for each group of the regular expression.
+        """
+        self.abstract_path = abstract_path
+        self._regex = regex
+        self._keys = keys
+
+    def match(self, file_name):
+        """
+        Checks if a file name belongs to the group.
+
+        :param file_name: File name to check.
+        :returns: Dictionary of the abstract key values found in the file name or None
+                  if the file name doesn't belong to the group.
+        """
+        if self._regex is None:
+            return None
+        match = self._regex.match(file_name)
+        if not match:
+            return None
+
+        values = {}
+        for key, value_str in zip(self._keys, match.groups()):
+            try:
+                value = key.value_from_str(value_str)
+            except TankError:
+                return None
+            if values.setdefault(key.name, value) != value:
+                # a repeated key with different values
+                return None
+        return values
+
+
+def _to_ranges(values):
+    """
+    Turns a collection of integers into a list of contiguous ranges.
+
+    :param values: Collection of integers.
+    :returns: Sorted list of inclusive (first, last) tuples.
+    """
+    ranges = []
+    for value in sorted(values):
+        if ranges and ranges[-1][1] == value - 1:
+            ranges[-1] = (ranges[-1][0], value)
+        else:
+            ranges.append((value, value))
+    return ranges
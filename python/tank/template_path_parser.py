@@ -13,6 +13,7 @@ Parsing of template paths into values for specified keys using a list of static
 """
 
 import os
+import re
 from .errors import TankError
 
 class TemplatePathParser(object):
@@ -46,19 +47,48 @@ class TemplatePathParser(object):
             self.fully_resolved = fully_resolved
             self.last_error = last_error    
     
-    def __init__(self, ordered_keys, static_tokens):
+    def __init__(self, ordered_keys, static_tokens, regex_cache=None):
         """
         Construction
                                 
         :param ordered_keys:    Template key objects in order that they appear in the
                                 template definition.
         :param static_tokens:   Pieces of the definition that don't represent Template Keys.
+        :param regex_cache:     Optional dictionary used to store the compiled regular
+                                expressions so that they can be shared between parsers
+                                created for the same keys and static tokens.
         """
         self.ordered_keys = ordered_keys
         self.static_tokens = static_tokens
         self.fields = {}
         self.input_path = None
-        self.last_error = "Unable to parse path" 
+        self._last_error = "Unable to parse path"
+
+        # arguments of the last parse if it failed and the error for it
+        # hasn't been computed yet
+        self._deferred_error_args = None
+
+        # compiled regular expressions used to parse paths, keyed by the
+        # names of the keys being skipped.
+        self._regexes = {} if regex_cache is None else regex_cache
+
+    @property
+    def last_error(self):
+        """
+        The last error found whilst parsing a path.
+        """
+        if self._deferred_error_args:
+            # the regular expression rejected the path - run the full parser
+            # to find out exactly why.
+            input_path, skip_keys = self._deferred_error_args
+            self._deferred_error_args = None
+            self.__parse_path_recursive(input_path, skip_keys)
+        return self._last_error
+
+    @last_error.setter
+    def last_error(self, value):
+        self._last_error = value
+        self._deferred_error_args = None
 
     def parse_path(self, input_path, skip_keys):
         """
@@ -89,6 +119,7 @@ class TemplatePathParser(object):
         """
         skip_keys = skip_keys or []
         input_path = os.path.normpath(input_path)
+        self.last_error = "Unable to parse path"
 
         # all token comparisons are done case insensitively.
         lower_path = input_path.lower()
@@ -105,50 +136,53 @@ class TemplatePathParser(object):
                 # template with no keys - in this case not matching 
                 # the input path. Return for no match.
                 return None        
-            
-        # find all occurances of all tokens in the path.  This will 
-        # produce a list of lists, one list of positions for each token.
-        #
-        # Possible token positions are split into domains where the first
-        # occurance of a token must be after the first occurance of the
-        # preceding token and the last occurance must be before the last
-        # occurance of the following token.  e.g. The valid tokens for
-        # the example path are shown below:
-        #
-        # Template : {shot}_{name}_v{version}.ma
-        # Path     : shot_010_name_v010.ma  
-        # Token _  :    [_   _]
-        # Token _v :             [_v]
-        # Token .ma:                  [.ma]
-        token_positions = []
-        start_pos = 0
-        for token in self.static_tokens:
-            positions = []
-            token_pos = start_pos
-                
-            while token_pos >= 0:
-                token_pos = lower_path.find(token, token_pos)
-                if token_pos >= 0:
-                    if not positions:
-                        # this is the first instance of this token we found so it
-                        # will be the start position to look for the next token
-                        # as it will be the first possible location available!
-                        start_pos = token_pos + len(token)
-                    positions.append(token_pos)
-                    token_pos += len(token)
-            if not positions:
-                # didn't find token!
-                self.last_error = ("Tried to extract fields from path '%s', "
-                                   "but the path does not fit the template." % input_path)
+
+        # first try to match the path against the compiled regular expressions.
+        # The greedy expression matches any path that the recursive solver could
+        # possibly resolve so if it doesn't match, the path can't be parsed.
+        # If the greedy and lazy expressions agree on the values then there is
+        # only a single way to split the path and the values only need to be
+        # validated.
+        regexes = self.__get_regexes(skip_keys)
+        if regexes:
+            greedy_regex, lazy_regex, group_names = regexes
+            match = greedy_regex.match(lower_path)
+            if not match:
+                self._deferred_error_args = (input_path, skip_keys)
                 return None
-            token_positions.append(positions)
-            
-        # disgard positions that can't be valid - e.g. where the position is greater than the
-        # last possible position of any subsequent tokens:
-        max_position = len(lower_path)+1
-        for ti in reversed(range(len(token_positions))):
-            token_positions[ti] = [p for p in token_positions[ti] if p < max_position]
-            max_position = max(token_positions[ti]) if token_positions[ti] else 0
+
+            lazy_match = lazy_regex.match(lower_path)
+            if [match.span(n) for n in group_names] == [lazy_match.span(n) for n in group_names]:
+                fields = self.__fields_from_match(match, input_path, skip_keys)
+                if fields is None:
+                    self._deferred_error_args = (input_path, skip_keys)
+                    return None
+                elif fields is not False:
+                    return fields
+
+        # the path is ambiguous as far as the regular expression is concerned
+        # so fall back to the recursive solver:
+        return self.__parse_path_recursive(input_path, skip_keys)
+
+    def __parse_path_recursive(self, input_path, skip_keys):
+        """
+        Parses a path using the recursive solver which explores all possible
+        values for each key.
+
+        :param input_path:  The normalized path to parse.
+        :param skip_keys:   List of keys for whom we do not need to find values.
+
+        :returns:           If succesful, a dictionary of fields mapping key names to 
+                            their values. None if the fields can't be resolved. 
+        """
+        lower_path = input_path.lower()
+
+        token_positions = self.__find_token_positions(lower_path)
+        if token_positions is None:
+            # didn't find token!
+            self.last_error = ("Tried to extract fields from path '%s', "
+                               "but the path does not fit the template." % input_path)
+            return None
 
         # find all possible values for keys based on token positions - this will 
         # return a list of lists including all potential variations:
@@ -237,6 +271,270 @@ class TemplatePathParser(object):
         # return the single unique set of fields:
         return fields
     
+    def __find_token_positions(self, lower_path):
+        """
+        Finds the positions in the path where each static token could be found.
+
+        :param lower_path:  The lower case path to search.
+
+        :returns:           A list containing a list of positions for each token or None
+                            if any of the tokens can't be found.
+        """
+        # find all occurances of all tokens in the path.  This will 
+        # produce a list of lists, one list of positions for each token.
+        #
+        # Possible token positions are split into domains where the first
+        # occurance of a token must be after the first occurance of the
+        # preceding token and the last occurance must be before the last
+        # occurance of the following token.  e.g. The valid tokens for
+        # the example path are shown below:
+        #
+        # Template : {shot}_{name}_v{version}.ma
+        # Path     : shot_010_name_v010.ma  
+        # Token _  :    [_   _]
+        # Token _v :             [_v]
+        # Token .ma:                  [.ma]
+        token_positions = []
+        start_pos = 0
+        for token in self.static_tokens:
+            positions = []
+            token_pos = start_pos
+                
+            while token_pos >= 0:
+                token_pos = lower_path.find(token, token_pos)
+                if token_pos >= 0:
+                    if not positions:
+                        # this is the first instance of this token we found so it
+                        # will be the start position to look for the next token
+                        # as it will be the first possible location available!
+                        start_pos = token_pos + len(token)
+                    positions.append(token_pos)
+                    token_pos += len(token)
+            if not positions:
+                # didn't find token!
+                return None
+            token_positions.append(positions)
+            
+        # disgard positions that can't be valid - e.g. where the position is greater than the
+        # last possible position of any subsequent tokens:
+        max_position = len(lower_path)+1
+        for ti in reversed(range(len(token_positions))):
+            token_positions[ti] = [p for p in token_positions[ti] if p < max_position]
+            max_position = max(token_positions[ti]) if token_positions[ti] else 0
+
+        return token_positions
+
+    def __fields_from_match(self, match, input_path, skip_keys):
+        """
+        Extracts and validates the key values from a regular expression match.
+
+        :param match:       The match object returned by the greedy regular expression.
+        :param input_path:  The normalized path that was matched.
+        :param skip_keys:   List of keys for whom we do not need to find values.
+
+        :returns:           A dictionary of fields mapping key names to their values, None
+                            if any of the values are invalid or False if the match can't be
+                            relied on and the recursive solver needs to be used.
+        """
+        # find which of the token-first or key-first expressions matched:
+        group_values = match.groupdict()
+        if group_values.get("t0") is not None:
+            prefix = "t"
+            token_index = 1
+        else:
+            prefix = "k"
+            token_index = 0
+
+        spans = []
+        for index in range(len(self.ordered_keys)):
+            group_name = "%s%d" % (prefix, index)
+            if group_values.get(group_name) is None:
+                # the path ended before this key
+                break
+            spans.append(match.span(group_name))
+
+        # the recursive solver requires all static tokens to be found in the path,
+        # even when the path ends after a token with keys remaining. Only trust the
+        # match if it went through all the tokens.
+        if token_index + len(spans) < len(self.static_tokens):
+            return False
+
+        # the recursive solver only considers non-overlapping occurrences of the tokens
+        # so an occurrence overlapping a previous occurrence of the same token may have
+        # been skipped. This is very unlikely so just let the solver deal with it.
+        lower_path = None
+        for offset, (start, end) in enumerate(spans):
+            if token_index + offset < len(self.static_tokens):
+                token = self.static_tokens[token_index + offset]
+                if len(token) > 1:
+                    lower_path = lower_path or input_path.lower()
+                    if lower_path.find(token, max(end - len(token) + 1, 0), end + len(token) - 1) != -1:
+                        return False
+
+        fields = {}
+        key_values = {}
+        for key, (start, end) in zip(self.ordered_keys, spans):
+            value_str = input_path[start:end]
+
+            if key.name in skip_keys:
+                value = value_str
+            else:
+                # can't have two different values for the same key:
+                if key_values.get(key.name, value_str) != value_str:
+                    return None
+                try:
+                    value = key.value_from_str(value_str)
+                except TankError:
+                    return None
+                if value is not None:
+                    fields[key.name] = value
+            key_values[key.name] = value_str
+
+        return fields
+
+    def __get_regexes(self, skip_keys):
+        """
+        Returns the compiled regular expressions to use when parsing a path with
+        the given keys skipped. Expressions are compiled on first use.
+
+        :param skip_keys:   List of keys for whom we do not need to find values.
+
+        :returns:           Tuple containing the greedy and lazy regular expressions and
+                            the names of all the groups in them, or None if no regular
+                            expression can be used.
+        """
+        if skip_keys:
+            skip_names = frozenset([k.name for k in self.ordered_keys if k.name in skip_keys])
+        else:
+            skip_names = frozenset()
+        regexes = self._regexes.get(skip_names, False)
+        if regexes is False:
+            regexes = self.__compile_regexes(skip_names)
+            self._regexes[skip_names] = regexes
+        return regexes
+
+    def __compile_regexes(self, skip_names):
+        """
+        Compiles the regular expressions matching the paths that the recursive solver
+        could resolve. There is one named group per key and per way the solver considers
+        the path - either starting with the first static token (groups t0, t1, ...) or
+        with a key value (groups k0, k1, ...).
+
+        The greedy expression finds the split of the path with the longest key values
+        and the lazy expression the one with the shortest key values. The lazy expression
+        tries the two ways of considering the path in the opposite order so that if both
+        expressions return the same values, no other split of the path is possible.
+
+        :param skip_names:  Names of the keys being skipped.
+
+        :returns:           Tuple containing the greedy and lazy regular expressions and
+                            the names of all the groups in them, or None if no regular
+                            expression can be used.
+        """
+        num_keys = len(self.ordered_keys)
+        num_tokens = len(self.static_tokens)
+
+        key_classes = [self.__key_char_class(key, key.name in skip_names) for key in self.ordered_keys]
+
+        # (group name prefix, static prefix, index of the first token following a key)
+        branches = []
+        if num_keys >= num_tokens - 1:
+            branches.append(("t", re.escape(self.static_tokens[0]), 1))
+        if num_keys >= num_tokens:
+            branches.append(("k", "", 0))
+
+        greedy_patterns = []
+        lazy_patterns = []
+        for name_prefix, static_prefix, token_index in branches:
+            greedy_patterns.append(static_prefix + self.__branch_pattern(name_prefix, key_classes, token_index, False))
+            lazy_patterns.append(static_prefix + self.__branch_pattern(name_prefix, key_classes, token_index, True))
+
+        try:
+            greedy_regex = re.compile("(?:%s)" % "|".join(greedy_patterns), re.DOTALL)
+            lazy_regex = re.compile("(?:%s)" % "|".join(reversed(lazy_patterns)), re.DOTALL)
+        except (re.error, AssertionError):
+            # too many groups for the regular expression engine - just use the
+            # recursive solver.
+            return None
+
+        # keys following a key which runs to the end of the path have no group
+        group_names = sorted(greedy_regex.groupindex.keys())
+        return greedy_regex, lazy_regex, group_names
+
+    def __branch_pattern(self, name_prefix, key_classes, token_index, lazy):
+        """
+        Builds the pattern matching the keys and static tokens in the order they are
+        considered by the recursive solver, starting with the first key.
+
+        :param name_prefix:     Prefix for the key group names.
+        :param key_classes:     Character classes matching the value for each key.
+        :param token_index:     Index of the static token following the first key.
+        :param lazy:            True to match the shortest key values, False to match
+                                the longest ones.
+
+        :returns:               Pattern string.
+        """
+        num_keys = len(self.ordered_keys)
+        num_tokens = len(self.static_tokens)
+
+        # build the pattern from the last key backwards:
+        pattern = ""
+        for key_index in reversed(range(num_keys)):
+            # the recursive solver never considers values shorter than the key
+            # length, whether the key is skipped or not.
+            min_length = self.ordered_keys[key_index].length
+            if min_length and min_length > 1:
+                quantifier = "{%d,}" % min_length
+            else:
+                quantifier = "+"
+            if lazy:
+                quantifier += "?"
+            group = "(?P<%s%d>%s%s)" % (name_prefix, key_index, key_classes[key_index], quantifier)
+            current_token_index = token_index + key_index
+            if current_token_index >= num_tokens:
+                # no more tokens so the key value runs to the end of the path
+                pattern = group + r"\Z"
+            elif key_index == num_keys - 1:
+                if current_token_index == num_tokens - 1:
+                    # last key followed by the last token
+                    pattern = group + re.escape(self.static_tokens[current_token_index]) + r"\Z"
+                else:
+                    # more tokens than keys, this can never resolve
+                    pattern = group + r"(?!)"
+            else:
+                # the path can either end after the token or go on with the next key
+                pattern = (group + re.escape(self.static_tokens[current_token_index])
+                           + r"(?:\Z|%s)" % pattern)
+        return pattern
+
+    def __key_char_class(self, key, skip):
+        """
+        Returns a regular expression character class matching any character
+        that can be found in the value for a key.
+
+        :param key:     The template key.
+        :param skip:    True if the key is being skipped, in which case its value
+                        isn't validated.
+
+        :returns:       Character class pattern string.
+        """
+        if skip:
+            # skipped keys can contain anything, including path separators
+            return "."
+
+        negated, chars = key._value_char_class()
+        if negated:
+            # slashes are not allowed in key values
+            chars = set(chars) | set([os.path.sep])
+        else:
+            chars = set(chars) - set([os.path.sep])
+            if not chars:
+                # no valid values - match nothing
+                return r"[^\s\S]"
+
+        chars = "".join(["\\x%02x" % ord(c) for c in sorted(chars)])
+        return "[^%s]" % chars if negated else "[%s]" % chars
+
     def __find_possible_key_values_recursive(self, path, key_position, tokens, token_positions, 
                                              keys, skip_keys, key_values=None):
         """
@@ -358,4 +656,5 @@ class TemplatePathParser(object):
                                                                     fully_resolved, 
                                                                     last_error))
             
-        return possible_values
\ No newline at end of file
+        return possible_values
+
@@ -0,0 +1,296 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Incremental search of the file system for paths matching a template.
+"""
+
+import os
+import sys
+import glob
+import Queue
+import fnmatch
+import threading
+
+from .template import TemplatePath
+
+
+class TemplatePathWalker(object):
+    """
+    Walks the file system one directory level at a time looking for paths
+    matching a :class:`TemplatePath`.
+
+    Rather than expanding a glob pattern for the whole path and validating every
+    result, the walker matches each level of the pattern in turn and validates the
+    directories it finds against the template for that level (as returned by
+    :meth:`TemplatePath.parent`) so that directories which can't possibly lead to a
+    valid path are never listed. Directory listings are cached so that searching
+    for several key sets of the same template only lists each directory once.
+
+    Directories can optionally be listed by a pool of threads, which greatly
+    reduces the time taken to search high latency storage such as network file
+    systems.
+    """
+
+    def __init__(self, template, max_workers=None):
+        """
+        Construction
+
+        :param template: :class:`TemplatePath` to find paths for.
+        :param max_workers: Optional maximum number of threads used to list directories
+                            concurrently. If not set, directories are listed one at a time
+                            in the calling thread.
+        """
+        self._template = template
+        self._max_workers = max_workers or 1
+        # directory listings keyed by directory path
+        self._listings = {}
+        # templates used to validate each level of a definition, keyed by
+        # definition index
+        self._level_templates = {}
+
+    def walk(self, fields, ignore_types=None):
+        """
+        Finds existing paths matching the template with the given fields. This
+        is equivalent to iterating over ``glob.iglob()`` with the search string
+        returned by ``template._apply_fields(fields, ignore_types)`` except that
+        the directories found are checked against the template as the search goes.
+
+        Paths are not validated against the full template so callers are expected
+        to do this.
+
+        :param fields: Mapping of key names to values, using ``*`` for the values
+                       of the keys to search for.
+        :param ignore_types: Names of the keys whose values are search patterns.
+        :returns: Generator yielding the paths found.
+        """
+        return self.walk_all([(fields, ignore_types)])
+
+    def walk_all(self, searches):
+        """
+        Finds existing paths matching the template for several sets of fields, as
+        returned by :meth:`walk` for each of them. When using several threads, all
+        the searches are done concurrently.
+
+        :param searches: List of (fields, ignore_types) tuples.
+        :returns: Generator yielding the paths found, in no particular order. A path
+                  matching several searches is returned once for each of them.
+        """
+        # (level, path, patterns, level templates) for each directory to search
+        tasks = []
+        for fields, ignore_types in searches:
+            search_path = self._template._apply_fields(fields, ignore_types=ignore_types)
+            root_path = self._template.root_path
+
+            if not search_path.startswith(root_path):
+                # not something we know how to walk, search the whole path at once
+                for path in glob.iglob(search_path):
+                    yield path
+                continue
+
+            relative_path = search_path[len(root_path):].lstrip(os.path.sep)
+            if not relative_path:
+                if os.path.lexists(search_path):
+                    yield search_path
+                continue
+
+            patterns = relative_path.split(os.path.sep)
+            level_templates = self._get_level_templates(self._get_definition_index(fields), len(patterns))
+            tasks.append((0, root_path, patterns, level_templates))
+
+        if self._max_workers > 1:
+            paths = self._walk_threaded(tasks)
+        else:
+            paths = self._walk_serial(tasks)
+        for path in paths:
+            yield path
+
+    def _walk_serial(self, tasks):
+        """
+        Searches directories one at a time, depth first.
+
+        :param tasks: List of (level, path, patterns, level templates) tuples for
+                      the directories to search.
+        :returns: Generator yielding the paths found.
+        """
+        for _, root_path, patterns, level_templates in tasks:
+            # use a stack of generators to avoid recursion
+            last_level = len(patterns) - 1
+            stack = [self._iter_level(root_path, patterns[0], level_templates[0], 0 == last_level)]
+            while stack:
+                path = next(stack[-1], None)
+                if path is None:
+                    stack.pop()
+                elif len(stack) - 1 == last_level:
+                    yield path
+                else:
+                    level = len(stack)
+                    stack.append(
+                        self._iter_level(path, patterns[level], level_templates[level], level == last_level)
+                    )
+
+    def _walk_threaded(self, tasks):
+        """
+        Searches directories using a pool of threads. All the directories known
+        about are searched concurrently so the time taken depends on the depth
+        of the search rather than on the number of directories.
+
+        :param tasks: List of (level, path, patterns, level templates) tuples for
+                      the directories to search.
+        :returns: Generator yielding the paths found.
+        """
+        task_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+
+        def worker():
+            while True:
+                task = task_queue.get()
+                if task is None:
+                    return
+                level, path, patterns, level_templates = task
+                try:
+                    children = list(
+                        self._iter_level(path, patterns[level], level_templates[level],
+                                         level == len(patterns) - 1)
+                    )
+                except Exception:
+                    result_queue.put((task, None, sys.exc_info()))
+                else:
+                    result_queue.put((task, children, None))
+
+        workers = []
+        try:
+            for task in tasks:
+                task_queue.put(task)
+            num_pending = len(tasks)
+
+            while num_pending:
+                # start more workers if there are more directories to list than
+                # workers, up to the maximum allowed.
+                while len(workers) < min(self._max_workers, num_pending):
+                    thread = threading.Thread(target=worker)
+                    thread.daemon = True
+                    thread.start()
+                    workers.append(thread)
+
+                (level, _, patterns, level_templates), children, exc_info = result_queue.get()
+                num_pending -= 1
+                if exc_info:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+
+                if level == len(patterns) - 1:
+                    for path in children:
+                        yield path
+                else:
+                    num_pending += len(children)
+                    for path in children:
+                        task_queue.put((level + 1, path, patterns, level_templates))
+        finally:
+            # stop the workers, even if we didn't get to the end of the search.
+            # Tasks still in the queue are dropped.
+            while True:
+                try:
+                    task_queue.get_nowait()
+                except Queue.Empty:
+                    break
+            for _ in workers:
+                task_queue.put(None)
+
+    def _iter_level(self, parent_path, pattern, level_template, is_last_level):
+        """
+        Finds the children of a directory matching a pattern.
+
+        :param parent_path: Directory to look in.
+        :param pattern: Glob pattern for the path component.
+        :param level_template: Optional template to validate the children with.
+        :param is_last_level: True if the pattern is for the last component of the path.
+        :returns: Generator yielding the full paths of the matching children.
+        """
+        if not glob.has_magic(pattern):
+            path = os.path.join(parent_path, pattern)
+            # no need to check intermediate directories exist, listing their
+            # contents will fail if they don't.
+            if not is_last_level or os.path.lexists(path):
+                yield path
+            return
+
+        for name in self._list_dir(parent_path, pattern):
+            path = os.path.join(parent_path, name)
+            if level_template is None or level_template.validate(path):
+                yield path
+
+    def _list_dir(self, path, pattern):
+        """
+        Lists the entries of a directory matching a pattern. Hidden entries are only
+        returned if the pattern explicitly starts with a dot, as with ``glob``.
+
+        :param path: Directory to list.
+        :param pattern: Glob pattern entries must match.
+        :returns: List of entry names.
+        """
+        names = self._listings.get(path)
+        if names is None:
+            try:
+                names = os.listdir(path)
+            except OSError:
+                names = []
+            self._listings[path] = names
+
+        if not pattern.startswith("."):
+            names = [name for name in names if not name.startswith(".")]
+        return fnmatch.filter(names, pattern)
+
+    def _get_definition_index(self, fields):
+        """
+        Finds the definition used to build a path from fields, using the same
+        logic as :meth:`Template._apply_fields`.
+
+        :param fields: Mapping of key names to values.
+        :returns: Index of the definition.
+        """
+        for index, keys in enumerate(self._template._keys):
+            if not self._template._missing_keys(fields, keys, skip_defaults=True):
+                return index
+        return 0
+
+    def _get_level_templates(self, definition_index, num_levels):
+        """
+        Returns templates to validate each level of a definition with. The last
+        level, as well as levels where keys appear again further down the definition,
+        have no template as the values can't be validated on their own.
+
+        :param definition_index: Index of the definition being searched.
+        :param num_levels: Number of levels in the path being searched.
+        :returns: List of :class:`TemplatePath` or None for each level.
+        """
+        if definition_index not in self._level_templates:
+            definition = self._template._definitions[definition_index]
+            components = definition.split(os.path.sep)
+            level_templates = [None] * len(components)
+
+            for level in range(len(components) - 1):
+                level_definition = os.path.join(*components[:level + 1])
+                level_template = TemplatePath(level_definition, self._template.keys, self._template.root_path)
+                # only use the template if the values it finds can't be affected by
+                # the values of the same keys deeper in the path
+                remaining_template = TemplatePath(os.path.join(*components[level + 1:]),
+                                                  self._template.keys,
+                                                  self._template.root_path)
+                if not set(level_template.keys) & set(remaining_template.keys):
+                    level_templates[level] = level_template
+
+            self._level_templates[definition_index] = level_templates
+
+        level_templates = self._level_templates[definition_index]
+        if len(level_templates) != num_levels:
+            # values containing path separators mean we can't tell which part of the
+            # path relates to which part of the definition.
+            return [None] * num_levels
+        return level_templates
@@ -18,6 +18,13 @@ import datetime
 from . import constants
 from .errors import TankError
 
+# ascii characters that can't be found in values for the various key types
+_ASCII_CHARS = [chr(x) for x in range(128)]
+_ASCII_NON_ALPHA_CHARS = "".join([c for c in _ASCII_CHARS if not c.isalpha()])
+_ASCII_NON_ALPHANUMERIC_CHARS = "".join([c for c in _ASCII_CHARS if not c.isalnum()])
+_ASCII_NON_INTEGER_CHARS = "".join([c for c in _ASCII_CHARS if not (c.isdigit() or c == " ")])
+
+
 class TemplateKey(object):
     """
     Base class for all template key types. Should not be used directly.
@@ -275,6 +282,24 @@ class TemplateKey(object):
     def _as_value(self, str_value):
         return str_value
 
+    def _value_char_class(self):
+        """
+        Describes the characters that the lower case string representation of a
+        valid value for this key can contain. This is used by the template path parser
+        to quickly locate values in a path and can be a superset of what is actually valid.
+
+        :returns: Tuple (negated, chars) where chars is a string of ascii characters. If
+                  negated is True, any character except the ones in chars can be used,
+                  otherwise only the characters in chars can be used.
+        """
+        choices = [x for x in self.choices if isinstance(x, (basestring, int))]
+        if choices and len(choices) == len(self.choices):
+            # values have to be one of the choices
+            chars = set("".join([("%s" % x).lower() for x in choices]))
+            if all(ord(c) < 128 for c in chars):
+                return False, "".join(sorted(chars))
+        return True, ""
+
     def __repr__(self):
         return "<Sgtk %s %s>" % (self.__class__.__name__, self.name)
 
@@ -567,6 +592,26 @@ class StringKey(TemplateKey):
 
         return super(StringKey, self).validate(value)
 
+    def _value_char_class(self):
+        """
+        Describes the characters that the lower case string representation of a
+        valid value for this key can contain.
+
+        :returns: Tuple (negated, chars), see :meth:`TemplateKey._value_char_class`.
+        """
+        negated, chars = super(StringKey, self)._value_char_class()
+        if not negated:
+            # restricted by choices
+            return negated, chars
+
+        # non-ascii characters can be letters so only exclude ascii characters
+        if self._filter_by == "alphanumeric":
+            return True, _ASCII_NON_ALPHANUMERIC_CHARS
+        elif self._filter_by == "alpha":
+            return True, _ASCII_NON_ALPHA_CHARS
+
+        # custom regexes only need to match the start of the value
+        return True, ""
 
 
 class TimestampKey(TemplateKey):
@@ -638,6 +683,28 @@ class TimestampKey(TemplateKey):
         """
         return self._format_spec
 
+    def __getstate__(self):
+        """
+        Returns the state of the key for pickling. Defaults computing the current
+        time are bound methods, which can't be pickled, so they are stored by name.
+        """
+        state = self.__dict__.copy()
+        if self._default == self.__get_current_time:
+            state["_default"] = "now"
+        elif self._default == self.__get_current_utc_time:
+            state["_default"] = "utc_now"
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the state of a pickled key.
+        """
+        self.__dict__.update(state)
+        if self._default == "now":
+            self._default = self.__get_current_time
+        elif self._default == "utc_now":
+            self._default = self.__get_current_utc_time
+
     def __get_current_time(self):
         """
         Returns the current time as a datetime.datetime instance.
@@ -946,6 +1013,17 @@ class IntegerKey(TemplateKey):
         """
         return int(str_value)
 
+    def _value_char_class(self):
+        """
+        Describes the characters that the lower case string representation of a
+        valid value for this key can contain. Values are made of digits, possibly
+        padded with spaces.
+
+        :returns: Tuple (negated, chars), see :meth:`TemplateKey._value_char_class`.
+        """
+        # non-ascii characters can be unicode digits
+        return True, _ASCII_NON_INTEGER_CHARS
+
 
 class SequenceKey(IntegerKey):
     """
@@ -1102,6 +1180,16 @@ class SequenceKey(IntegerKey):
         # resolve it via the integerKey base class
         return super(SequenceKey, self)._as_value(str_value)
 
+    def _value_char_class(self):
+        """
+        Describes the characters that the lower case string representation of a
+        valid value for this key can contain. Frame specs and format strings can
+        contain a wide variety of characters so no restriction is applied.
+
+        :returns: Tuple (negated, chars), see :meth:`TemplateKey._value_char_class`.
+        """
+        return True, ""
+
     def _extract_format_string(self, value):
         """
         Returns XYZ given the string "FORMAT:    XYZ"
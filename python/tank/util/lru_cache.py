@@ -0,0 +1,187 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Bounded least recently used cache.
+"""
+
+import threading
+
+
+class LRUCache(object):
+    """
+    Thread safe dictionary-like cache holding at most a given number of items.
+    When the cache is full, the least recently used item is discarded to make
+    room for new items.
+
+    The number of lookups which found (hits) or didn't find (misses) an item
+    are tracked to help tune the size of the cache::
+
+        >>> cache = LRUCache(2)
+        >>> cache.set("a", 1)
+        >>> cache.set("b", 2)
+        >>> cache.get("a")
+        1
+        >>> cache.set("c", 3)
+        >>> cache.get("b") is None
+        True
+        >>> cache.get_stats()
+        {'hits': 1, 'misses': 1, 'size': 2, 'max_size': 2}
+    """
+
+    # indices of the fields of a link in the list of items
+    _PREV, _NEXT, _KEY, _VALUE = range(4)
+
+    def __init__(self, max_size):
+        """
+        Construction
+
+        :param int max_size: Maximum number of items held by the cache. A cache with a
+                             maximum size of 0 doesn't hold any item.
+        """
+        self._lock = threading.Lock()
+        self._max_size = max(max_size, 0)
+        self.hits = 0
+        self.misses = 0
+        self._reset()
+
+    def _reset(self):
+        """
+        Removes all items from the cache.
+        """
+        # circular doubly linked list of [prev, next, key, value] links, the root
+        # being a sentinel. The most recently used item follows the root.
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+        self._links = {}
+
+    @property
+    def max_size(self):
+        """
+        Maximum number of items held by the cache. Reducing the size discards the
+        least recently used items. Setting it to 0 disables the cache.
+        """
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, max_size):
+        with self._lock:
+            self._max_size = max(max_size, 0)
+            while len(self._links) > self._max_size:
+                self._remove_oldest()
+
+    def __len__(self):
+        return len(self._links)
+
+    def __contains__(self, key):
+        return key in self._links
+
+    def get(self, key, default=None):
+        """
+        Returns an item from the cache, marking it as the most recently used.
+
+        :param key: Key of the item.
+        :param default: Value returned if the item is not in the cache.
+        :returns: The cached value or the default value.
+        """
+        with self._lock:
+            link = self._links.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._unlink(link)
+            self._link_first(link)
+            return link[self._VALUE]
+
+    def set(self, key, value):
+        """
+        Adds or replaces an item in the cache, marking it as the most recently used.
+
+        :param key: Key of the item.
+        :param value: Value of the item.
+        """
+        with self._lock:
+            if not self._max_size:
+                return
+            link = self._links.get(key)
+            if link is not None:
+                self._unlink(link)
+                link[self._VALUE] = value
+            else:
+                if len(self._links) >= self._max_size:
+                    self._remove_oldest()
+                link = [None, None, key, value]
+                self._links[key] = link
+            self._link_first(link)
+
+    def pop(self, key, default=None):
+        """
+        Removes an item from the cache.
+
+        :param key: Key of the item.
+        :param default: Value returned if the item is not in the cache.
+        :returns: The value of the removed item or the default value.
+        """
+        with self._lock:
+            link = self._links.pop(key, None)
+            if link is None:
+                return default
+            self._unlink(link)
+            return link[self._VALUE]
+
+    def clear(self):
+        """
+        Removes all the items from the cache and resets the statistics.
+        """
+        with self._lock:
+            self._reset()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        """
+        Returns statistics about the use of the cache.
+
+        :returns: Dictionary with the number of ``hits`` and ``misses`` since the
+                  cache was created or last cleared, the current ``size`` and the
+                  ``max_size`` of the cache.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._links),
+            "max_size": self._max_size,
+        }
+
+    def _remove_oldest(self):
+        """
+        Removes the least recently used item.
+        """
+        link = self._root[self._PREV]
+        self._unlink(link)
+        del self._links[link[self._KEY]]
+
+    def _unlink(self, link):
+        """
+        Removes a link from the list.
+        """
+        link[self._PREV][self._NEXT] = link[self._NEXT]
+        link[self._NEXT][self._PREV] = link[self._PREV]
+
+    def _link_first(self, link):
+        """
+        Inserts a link at the start of the list.
+        """
+        first = self._root[self._NEXT]
+        link[self._PREV] = self._root
+        link[self._NEXT] = first
+        first[self._PREV] = link
+        self._root[self._NEXT] = link
@@ -187,6 +187,105 @@ class TestPathsFromTemplate(TankTestBase):
         self.assertNotIn(bad_file_path, result)
 
 
+class TestIterPathsFromTemplate(TankTestBase):
+    """Tests for tank.iter_paths_from_template."""
+    def setUp(self):
+        super(TestIterPathsFromTemplate, self).setUp()
+        keys = {"Sequence": StringKey("Sequence"),
+                "Shot": StringKey("Shot", filter_by="alphanumeric"),
+                "name": StringKey("name"),
+                "version": IntegerKey("version", format_spec="03"),
+                "ext": StringKey("ext", choices=["ma", "mb"])}
+
+        definition = "sequences/{Sequence}/{Shot}/work/{name}[.v{version}].{ext}"
+        self.template = TemplatePath(definition, keys, self.project_root)
+
+        self.paths = []
+        for seq, shot in [("Seq_1", "AAA"), ("Seq_1", "BBB"), ("Seq_2", "AAA")]:
+            work_path = os.path.join(self.project_root, "sequences", seq, shot, "work")
+            for name in ["scene.v001.ma", "scene.v002.ma", "scene.mb", "other.v001.ma"]:
+                self.paths.append(os.path.join(work_path, name))
+                self.create_file(self.paths[-1])
+            # files not matching the template:
+            self.create_file(os.path.join(work_path, "scene.v001.nk"))
+            self.create_file(os.path.join(work_path, ".hidden.v001.ma"))
+
+        # directory not matching the template
+        self.invalid_path = os.path.join(self.project_root, "sequences", "Seq_1", "bad_shot", "work")
+        self.create_file(os.path.join(self.invalid_path, "scene.v001.ma"))
+
+    def _iter_paths(self, fields, skip_keys=None, skip_missing_optional_keys=False):
+        """
+        Returns the results of iter_paths_from_template, checking that the paths are
+        the same as the ones found by paths_from_template.
+        """
+        results = dict(self.tk.iter_paths_from_template(
+            self.template, fields, skip_keys=skip_keys, skip_missing_optional_keys=skip_missing_optional_keys))
+        expected = self.tk.paths_from_template(
+            self.template, fields, skip_keys=skip_keys, skip_missing_optional_keys=skip_missing_optional_keys)
+        self.assertEquals(sorted(expected), sorted(results.keys()))
+        for path, fields in results.iteritems():
+            self.assertEquals(self.template.get_fields(path), fields)
+        return results
+
+    def test_all(self):
+        results = self._iter_paths({}, skip_missing_optional_keys=True)
+        self.assertEquals(sorted(self.paths), sorted(results.keys()))
+
+    def test_missing_optional(self):
+        results = self._iter_paths({"ext": "mb"})
+        self.assertEquals(3, len(results))
+
+    def test_fields(self):
+        results = self._iter_paths({"Sequence": "Seq_1", "name": "scene", "version": 2, "ext": "ma"})
+        self.assertEquals(2, len(results))
+        fields = results[os.path.join(self.project_root, "sequences", "Seq_1", "AAA", "work", "scene.v002.ma")]
+        self.assertEquals({"Sequence": "Seq_1", "Shot": "AAA", "name": "scene", "version": 2, "ext": "ma"}, fields)
+
+    def test_skip_keys(self):
+        fields = {"Sequence": "Seq_1", "Shot": "AAA", "name": "scene", "version": 2, "ext": "ma"}
+        results = self._iter_paths(fields, skip_keys=["Shot", "version"])
+        self.assertEquals(4, len(results))
+
+    def test_max_workers(self):
+        fields = {"Sequence": "Seq_1", "ext": "ma"}
+        expected = self._iter_paths(fields, skip_missing_optional_keys=True)
+        results = dict(self.tk.iter_paths_from_template(
+            self.template, fields, skip_missing_optional_keys=True, max_workers=4))
+        self.assertEquals(expected, results)
+        paths = self.tk.paths_from_template(self.template, fields, skip_missing_optional_keys=True, max_workers=4)
+        self.assertEquals(sorted(expected.keys()), sorted(paths))
+
+    def test_generator(self):
+        """
+        Results are generated as the search goes.
+        """
+        generator = self.tk.iter_paths_from_template(self.template, {"ext": "ma"})
+        with patch("os.listdir", wraps=os.listdir) as listdir:
+            next(generator)
+            num_listed = listdir.call_count
+            list(generator)
+            self.assertTrue(num_listed < listdir.call_count)
+
+    def test_prune_invalid_directories(self):
+        """
+        Directories not matching the template are not searched and each directory is
+        listed once.
+        """
+        with patch("os.listdir", wraps=os.listdir) as listdir:
+            self._iter_paths({}, skip_missing_optional_keys=True)
+            listed = [call[0][0] for call in listdir.call_args_list]
+        # paths_from_template uses glob which lists directories with
+        # os.listdir too so ignore those calls.
+        with patch("os.listdir", wraps=os.listdir) as listdir:
+            self.tk.paths_from_template(self.template, {}, skip_missing_optional_keys=True)
+            glob_listed = [call[0][0] for call in listdir.call_args_list]
+        for path in glob_listed:
+            listed.remove(path)
+        self.assertNotIn(self.invalid_path, listed)
+        self.assertEquals(len(set(listed)), len(listed))
+
+
 class TestAbstractPathsFromTemplate(TankTestBase):
     """Tests Tank.abstract_paths_from_template method."""
     def setUp(self):
@@ -306,6 +405,40 @@ class TestAbstractPathsFromTemplate(TankTestBase):
         result = self.tk.abstract_paths_from_template(self.template, {"name": "filename"})
         self.assertEquals(set(expected), set(result))
 
+    def test_frames_not_parsed(self):
+        """
+        Files of a sequence are grouped without parsing each frame.
+        """
+        with patch.object(self.template, "validate_and_get_fields", wraps=self.template.validate_and_get_fields) as parse:
+            self.tk.abstract_paths_from_template(self.template, {"Shot": "AAA"})
+            # one file per eye and name
+            self.assertEquals(4, parse.call_count)
+
+    def test_abstract_sequences(self):
+        os.remove(os.path.join(self.shot_a_path, "left", "filename.0003.exr"))
+        expected = {
+            os.path.join(self.shot_a_path, "%V", "filename.%04d.exr"): {"SEQ": [(1, 4)]},
+            os.path.join(self.shot_a_path, "%V", "anothername.%04d.exr"): {"SEQ": [(1, 4)]},
+        }
+        result = self.tk.abstract_sequences_from_template(self.template, {"Shot": "AAA"})
+        self.assertEquals(expected, result)
+
+        expected = {
+            os.path.join(self.shot_a_path, "left", "filename.%04d.exr"): {"SEQ": [(1, 2), (4, 4)]},
+            os.path.join(self.shot_a_path, "left", "anothername.%04d.exr"): {"SEQ": [(1, 4)]},
+        }
+        result = self.tk.abstract_sequences_from_template(self.template, {"Shot": "AAA", "eye": "left"})
+        self.assertEquals(expected, result)
+
+        # the leaf level is listed even if it wouldn't be needed for the abstract paths
+        expected = {
+            os.path.join(self.shot_a_path, "left", "filename.%04d.exr"): {"SEQ": [(1, 2), (4, 4)]},
+        }
+        fields = {"Shot": "AAA", "eye": "left", "name": "filename"}
+        result = self.tk.abstract_sequences_from_template(self.template, fields)
+        self.assertEquals(expected, result)
+        self.assertEquals(expected.keys(), self.tk.abstract_paths_from_template(self.template, fields))
+
 
 class TestPathsFromTemplateGlob(TankTestBase):
     """Tests for Tank.paths_from_template method which check the string sent to glob.glob."""
@@ -12,6 +12,7 @@ from __future__ import with_statement
 
 import os
 import copy
+import sqlite3
 
 from tank_test.tank_test_base import *
 
@@ -289,6 +290,191 @@ class TestFromPath(TestContext):
 
 
 
+class TestFromPathCache(TestContext):
+    """
+    Tests the cache of the contexts built from paths.
+    """
+
+    def setUp(self):
+        super(TestFromPathCache, self).setUp()
+        self.tk.get_context_cache().clear()
+        path_cache = self.tk.get_path_cache()
+        patcher = patch.object(path_cache, "get_ancestor_entities", wraps=path_cache.get_ancestor_entities)
+        self.get_ancestor_entities = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_files_in_folder(self):
+        """
+        The files of a folder resolve with a single lookup.
+        """
+        with patch.object(self.tk, "execute_core_hook", wraps=self.tk.execute_core_hook) as hook_mock:
+            contexts = [
+                self.tk.context_from_path(os.path.join(self.step_path, "work", "file_%d.ma" % idx))
+                for idx in range(10)
+            ]
+        self.assertEqual(1, self.get_ancestor_entities.call_count)
+        self.assertEqual(1, hook_mock.call_count)
+
+        for ctx in contexts:
+            self.assertEqual(contexts[0], ctx)
+            self.assertEquals(self.shot["id"], ctx.entity["id"])
+            self.assertEquals(self.step["id"], ctx.step["id"])
+
+        # the folder itself resolves from the cache too
+        self.assertEqual(contexts[0], self.tk.context_from_path(self.step_path))
+        self.assertEqual(1, self.get_ancestor_entities.call_count)
+
+    @patch("tank.util.login.get_current_user")
+    def test_registered_subfolders(self, get_current_user):
+        """
+        Paths below a registered subfolder don't resolve to the cached context.
+        """
+        get_current_user.return_value = self.current_user
+        result = self.tk.context_from_path(os.path.join(self.step_path, "file.ma"))
+        self.assertEquals(self.current_user["id"], result.user["id"])
+
+        result = self.tk.context_from_path(os.path.join(self.other_user_path, "file.ma"))
+        self.assertEquals(self.other_user["id"], result.user["id"])
+        self.assertEquals(self.step["id"], result.step["id"])
+        self.assertEqual(2, self.get_ancestor_entities.call_count)
+
+    def test_path_cache_changes(self):
+        """
+        The cache is cleared when folders are registered.
+        """
+        work_path = os.path.join(self.shot_path, "work")
+        result = self.tk.context_from_path(os.path.join(work_path, "file.ma"))
+        self.assertIsNone(result.step)
+
+        self.add_production_path(work_path, self.step)
+        result = self.tk.context_from_path(os.path.join(work_path, "file.ma"))
+        self.assertEquals(self.step["id"], result.step["id"])
+
+    def test_path_cache_changes_from_other_processes(self):
+        """
+        The cache is cleared when folders are registered by other processes.
+        """
+        work_path = os.path.join(self.shot_path, "work")
+        result = self.tk.context_from_path(os.path.join(work_path, "file.ma"))
+        self.assertIsNone(result.step)
+
+        # emulate another process registering the folder
+        path_cache = self.tk.get_path_cache()
+        root_name, relative_path = path_cache._separate_root(work_path)
+        connection = sqlite3.connect(path_cache._path_cache_file)
+        try:
+            connection.execute(
+                "INSERT INTO path_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (self.step["type"], self.step["id"], self.step["name"],
+                 root_name, path_cache._path_to_dbpath(relative_path), 1)
+            )
+            connection.commit()
+        finally:
+            connection.close()
+        mtime = os.stat(path_cache._path_cache_file).st_mtime + 10
+        os.utime(path_cache._path_cache_file, (mtime, mtime))
+
+        # the path cache checks the database for changes from time to time
+        with patch.object(path_cache, "DB_CHANGE_CHECK_INTERVAL", 0):
+            result = self.tk.context_from_path(os.path.join(work_path, "file.ma"))
+        self.assertEquals(self.step["id"], result.step["id"])
+
+    def test_no_database_queries(self):
+        """
+        Contexts resolved from the cache don't query the path cache database.
+        """
+        file_path = os.path.join(self.step_path, "work", "file.ma")
+        expected = self.tk.context_from_path(file_path)
+        with patch.object(tank.path_cache.PathCache, "_read_connection") as read_connection:
+            with patch.object(tank.path_cache.PathCache, "_connection") as connection:
+                self.assertEqual(expected, self.tk.context_from_path(file_path))
+        self.assertEqual([], read_connection.mock_calls)
+        self.assertEqual([], connection.mock_calls)
+
+    def test_previous_context(self):
+        """
+        Cached contexts are extended from the previous context like the others.
+        """
+        task = {"type": "Task", "id": 1, "content": "task_content"}
+        file_path = os.path.join(self.shot_path, "file.ma")
+        result = self.tk.context_from_path(file_path)
+        self.assertIsNone(result.task)
+
+        prev_ctx = context.Context(
+            self.tk, project=result.project, entity=result.entity, step=self.step, task=task
+        )
+        self.assertEquals(task["id"], self.tk.context_from_path(file_path, prev_ctx).task["id"])
+        self.assertIsNone(self.tk.context_from_path(file_path).task)
+        self.assertEqual(1, self.get_ancestor_entities.call_count)
+
+
+class TestFromPaths(TestContext):
+    """
+    Tests building contexts from several paths at once.
+    """
+
+    def setUp(self):
+        super(TestFromPaths, self).setUp()
+        self.tk.get_context_cache().clear()
+
+    @patch("tank.util.login.get_current_user")
+    def test_same_as_from_path(self, get_current_user):
+        """
+        The contexts are the ones built path by path, in the same order.
+        """
+        get_current_user.return_value = self.current_user
+        paths = [
+            os.path.join(self.step_path, "file.ma"),
+            self.shot_path_alt,
+            os.path.join(self.other_user_path, "file.ma"),
+            self.alt_1_shot_path,
+            os.path.abspath(os.path.join(self.project_root, "..")),
+            os.path.join(self.step_path, "file.ma"),
+        ]
+        path_cache = self.tk.get_path_cache()
+        with patch.object(
+            path_cache, "get_ancestor_entities_for_paths", wraps=path_cache.get_ancestor_entities_for_paths
+        ) as bulk_mock:
+            contexts = self.tk.contexts_from_paths(paths)
+        self.assertEqual(1, bulk_mock.call_count)
+        # repeated paths are only looked up once.
+        self.assertEqual(5, len(bulk_mock.call_args[0][0]))
+
+        self.tk.get_context_cache().clear()
+        self.assertEqual([self.tk.context_from_path(x) for x in paths], contexts)
+        self.assertEquals(self.shot_alt["id"], contexts[1].entity["id"])
+        self.assertEquals(self.other_user["id"], contexts[2].user["id"])
+        self.assertIsNone(contexts[4].project)
+
+        # repeated paths get their own context
+        self.assertIsNot(contexts[0].entity, contexts[5].entity)
+
+    def test_cached_contexts(self):
+        """
+        Cached contexts are not looked up again.
+        """
+        file_path = os.path.join(self.step_path, "file.ma")
+        self.tk.context_from_path(file_path)
+
+        path_cache = self.tk.get_path_cache()
+        with patch.object(path_cache, "get_ancestor_entities_for_paths") as bulk_mock:
+            contexts = self.tk.contexts_from_paths([file_path, os.path.join(self.step_path, "other_file.ma")])
+        self.assertEqual(0, bulk_mock.call_count)
+        self.assertEquals(self.step["id"], contexts[1].step["id"])
+
+        self.assertEqual([], self.tk.contexts_from_paths([]))
+
+    def test_revision_read_once(self):
+        """
+        The revision of the path cache is read once for all the paths.
+        """
+        paths = [os.path.join(self.step_path, "file_%d.ma" % idx) for idx in range(10)]
+        path_cache = self.tk.get_path_cache()
+        with patch.object(path_cache, "get_revision", wraps=path_cache.get_revision) as get_revision:
+            self.tk.contexts_from_paths(paths)
+        self.assertEqual(1, get_revision.call_count)
+
+
 class TestFromPathWithPrevious(TestContext):
 
     @patch("tank.util.login.get_current_user")
@@ -663,6 +849,70 @@ class TestFromEntity(TestContext):
         self.assertEquals(self.task["content"], result.task["name"])
         self.assertEquals(3, len(result.task))
 
+    @patch("tank.util.login.get_current_user")
+    def test_from_entities(self, get_current_user):
+        """
+        Test that context.from_entities returns the same contexts as from_entity,
+        in the order of the given entities.
+        """
+        get_current_user.return_value = self.current_user
+
+        entities = [
+            self.task,
+            self.shot,
+            self.publishedfile,
+            self.project,
+            {"type": "Shot", "id": 13},
+            self.shot,
+        ]
+        results = context.from_entities(self.tk, entities)
+        self.assertEquals(len(entities), len(results))
+
+        for entity, result in zip(entities, results):
+            expected = context.from_entity(self.tk, entity["type"], entity["id"])
+            self.assertEquals(expected, result)
+            self.assertEquals(expected.source_entity, result.source_entity)
+
+        # contexts built for the same entity should not share their data
+        self.assertFalse(results[1].entity is results[5].entity)
+
+    @patch("tank.util.login.get_current_user")
+    def test_from_entities_single_find(self, get_current_user):
+        """
+        Test that the Shotgun data for several entities of a type is retrieved with
+        a single query.
+        """
+        get_current_user.return_value = self.current_user
+
+        other_task = {"id": 5,
+                      "type": "Task",
+                      "content": "other_task_content",
+                      "project": self.project,
+                      "entity": self.shot_alt,
+                      "step": self.step}
+        self.add_to_sg_mock_db(other_task)
+
+        num_finds_before = self.tk.shotgun.finds
+        results = context.from_entities(self.tk, [self.task, other_task])
+        self.assertEquals(1, self.tk.shotgun.finds - num_finds_before)
+
+        self.assertEquals(self.task["id"], results[0].task["id"])
+        self.check_entity(self.shot, results[0].entity, check_name=False)
+        self.assertEquals(other_task["id"], results[1].task["id"])
+        self.check_entity(self.shot_alt, results[1].entity, check_name=False)
+
+    def test_from_entities_missing(self):
+        """
+        Test that an entity which cannot be found in Shotgun raises an error.
+        """
+        task = {"type": "Task", "id": 13}
+        self.assertRaises(TankError, context.from_entities, self.tk, [self.task, task])
+
+        publishedfile = {"type": "PublishedFile", "id": 13}
+        self.assertRaises(TankError, context.from_entities, self.tk, [publishedfile])
+
+        self.assertRaises(TankError, context.from_entities, self.tk, [{"type": "Shot", "id": None}])
+
     def check_entity(self, first_entity, second_entity, check_name=True):
         "Checks two entity dictionaries have the same values for keys type, id and name."
         self.assertEquals(first_entity["type"], second_entity["type"])
@@ -860,6 +1110,51 @@ class TestAsTemplateFields(TestContext):
         # Check that the shotgun method find_one was not used
         self.assertEqual(finds, self.tk.shotgun.finds)
 
+    def test_query_single_find(self):
+        """
+        Test that the Shotgun fields of an entity used by a template are
+        retrieved with a single query.
+        """
+        self.keys["shot_extra"] = StringKey("shot_extra", shotgun_entity_type="Shot", shotgun_field_name="extra_field")
+        self.keys["shot_seq"] = StringKey("shot_seq", shotgun_entity_type="Shot", shotgun_field_name="sg_sequence")
+        template_def = "/sequence/{Sequence}/{Shot}/{Step}/work/{shot_extra}.{shot_seq}.ext"
+        template = TemplatePath(template_def, self.keys, self.project_root)
+
+        finds = self.tk.shotgun.finds
+        result = self.ctx.as_template_fields(template)
+        self.assertEquals(1, self.tk.shotgun.finds - finds)
+        self.assertEquals("extravalue", result["shot_extra"])
+        self.assertEquals("seq_name", result["shot_seq"])
+
+    def test_as_template_fields_many(self):
+        """
+        Test that as_template_fields_many returns the fields of each template and
+        queries Shotgun once for all of them.
+        """
+        self.keys["shot_extra"] = StringKey("shot_extra", shotgun_entity_type="Shot", shotgun_field_name="extra_field")
+        self.keys["shot_seq"] = StringKey("shot_seq", shotgun_entity_type="Shot", shotgun_field_name="sg_sequence")
+        templates = [
+            TemplatePath("/sequence/{Sequence}/{Shot}/{Step}/work/{shot_extra}.ext", self.keys, self.project_root),
+            TemplatePath("/sequence/{Sequence}/{Shot}/{Step}/work/{shot_seq}.ext", self.keys, self.project_root),
+            self.template,
+        ]
+
+        finds = self.tk.shotgun.finds
+        results = self.ctx.as_template_fields_many(templates)
+        self.assertEquals(1, self.tk.shotgun.finds - finds)
+
+        # the results should be the same as the ones for the individual templates,
+        # which are now cached.
+        finds = self.tk.shotgun.finds
+        self.assertEquals([self.ctx.as_template_fields(x) for x in templates], results)
+        self.assertEquals(finds, self.tk.shotgun.finds)
+
+        self.assertEquals("extravalue", results[0]["shot_extra"])
+        self.assertEquals("seq_name", results[1]["shot_seq"])
+        self.assertEquals({"Sequence": "Seq", "Shot": "shot_code", "Step": "step_short_name"}, results[2])
+
+        self.assertEquals([], self.ctx.as_template_fields_many([]))
+
     def test_shot_step(self):
         expected_step_name = "step_short_name"
         expected_shot_name = "shot_code"
@@ -1173,3 +1468,91 @@ class TestSerialize(TestContext):
         """
         with self.assertRaises(TankContextDeserializationError):
             tank.Context.deserialize("ajkadshadsjkhadsjkasd")
+
+    def test_json_round_trip(self):
+        """
+        Make sure contexts are restored identically from their JSON representation.
+        """
+        publishedfile = {
+            "type": "PublishedFile",
+            "id": 12,
+            "code": "caf\xc3\xa9",
+            "project": self.project,
+            "entity": self.shot,
+            "task": None,
+        }
+        ctx = context.Context(
+            user=self.current_user,
+            additional_entities=[{"type": "CustomEntity01", "id": 3, "name": "custom"}],
+            source_entity=publishedfile,
+            **self.kws
+        )
+        ctx_str = ctx.to_json()
+
+        new_ctx = tank.Context.from_json(ctx_str)
+        self.assertEqual(ctx, new_ctx)
+        for key in ["project", "entity", "step", "task", "user", "additional_entities", "source_entity"]:
+            self.assertEqual(getattr(ctx, key), getattr(new_ctx, key))
+        # strings are restored as they are returned by the Shotgun API
+        self.assertEqual(str, type(new_ctx.source_entity["code"]))
+        self.assertEqual(str, type(new_ctx.entity["type"]))
+
+        # serializing the restored context gives back the same string
+        self.assertEqual(ctx_str, new_ctx.to_json())
+
+        # the deserialize method understands the JSON format
+        self.assertEqual(ctx, tank.Context.deserialize(ctx_str))
+
+        # an empty context can be restored too, empty values are left out
+        empty_ctx = context.Context(self.tk, user=self.current_user)
+        ctx_str = empty_ctx.to_json()
+        self.assertFalse("entity" in ctx_str)
+        self.assertFalse("additional_entities" in ctx_str)
+        self.assertEqual(empty_ctx, tank.Context.from_json(ctx_str))
+
+    def test_json_lazy_tk(self):
+        """
+        Make sure restoring a context from JSON doesn't create a tk instance, touch
+        Shotgun or change the current user.
+        """
+        ctx = context.Context(user=self.current_user, **self.kws)
+        ctx_str = ctx.to_json()
+
+        tank.set_authenticated_user(self._user)
+        finds = self.tk.shotgun.finds
+        with patch("tank.api.Tank") as tank_mock:
+            new_ctx = tank.Context.from_json(ctx_str)
+            self.assertEqual(self.shot["id"], new_ctx.entity["id"])
+            self.assertEqual(self.current_user["id"], new_ctx.user["id"])
+            self.assertFalse(tank_mock.called)
+        self.assertEqual(finds, self.tk.shotgun.finds)
+        self._assert_same_user(tank.get_authenticated_user(), self._user)
+
+        # the tk instance is created on first access, and copies don't need their own
+        ctx_copy = copy.deepcopy(new_ctx)
+        self.assertEqual(
+            self.tk.pipeline_configuration.get_path(),
+            new_ctx.sgtk.pipeline_configuration.get_path()
+        )
+        self.assertTrue(new_ctx.tank is new_ctx.sgtk)
+        self.assertEqual(
+            self.tk.pipeline_configuration.get_path(),
+            ctx_copy.sgtk.pipeline_configuration.get_path()
+        )
+
+    def test_json_invalid_data(self):
+        """
+        Expects from_json to raise an error for invalid or unsupported data, and
+        to_json to raise an error for values which can't be represented in JSON.
+        """
+        ctx_str = context.Context(user=self.current_user, **self.kws).to_json()
+
+        with self.assertRaises(TankContextDeserializationError):
+            tank.Context.from_json("ajkadshadsjkhadsjkasd")
+        with self.assertRaises(TankContextDeserializationError):
+            tank.Context.from_json("[]")
+        with self.assertRaises(TankContextDeserializationError):
+            tank.Context.from_json(ctx_str.replace('"_v":1', '"_v":1000'))
+
+        ctx = context.Context(source_entity={"type": "Version", "id": 1, "bad": object()}, **self.kws)
+        self.assertRaises(TankError, ctx.to_json)
@@ -17,7 +17,9 @@ import Queue
 import StringIO
 import shutil
 import contextlib
+import threading
 import logging
+import sqlite3
 
 from mock import Mock, patch, call
 
@@ -278,6 +280,129 @@ class TestAddMapping(TestPathCache):
         self.assertEquals(entity_name, entry[0])
 
 
+class TestBatchedUpload(TestPathCache):
+    """
+    Tests that new mappings are uploaded to Shotgun in bounded batches.
+    """
+
+    def setUp(self):
+        super(TestBatchedUpload, self).setUp()
+        patcher = patch.object(path_cache.PathCache, "SHOTGUN_CREATE_BATCH_SIZE", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.shots = []
+        for idx in range(5):
+            shot = {"type": "Shot", "id": 100 + idx, "name": "shot_%d" % idx}
+            self.shots.append((shot, os.path.join(self.project_root, "seq", shot["name"])))
+
+    def _add_shots(self):
+        data = [
+            {"entity": shot, "path": shot_path, "primary": True, "metadata": {}}
+            for (shot, shot_path) in self.shots
+        ]
+        self.path_cache.add_mappings(data, "Sequence", [1])
+
+    def _get_filesystem_locations(self):
+        return self.mockgun.find(path_cache.SHOTGUN_ENTITY, [["linked_entity_type", "is", "Shot"]])
+
+    def _get_folder_events(self):
+        return self.mockgun.find("EventLogEntry", [["event_type", "is", "Toolkit_Folders_Create"]], ["meta"])
+
+    def test_batches(self):
+        """
+        The entities are created by bounded batch requests, bound by a single event.
+        """
+        num_events = len(self._get_folder_events())
+        with patch.object(self.mockgun, "batch", wraps=self.mockgun.batch) as batch_mock:
+            self._add_shots()
+        self.assertEqual([2, 2, 1], [len(x[0][0]) for x in batch_mock.call_args_list])
+
+        sg_ids = sorted(x["id"] for x in self._get_filesystem_locations())
+        self.assertEqual(5, len(sg_ids))
+        events = self._get_folder_events()
+        self.assertEqual(num_events + 1, len(events))
+        self.assertEqual(sg_ids, sorted(events[-1]["meta"]["sg_folder_ids"]))
+
+        for shot, shot_path in self.shots:
+            self.assertEqual([shot_path], self.path_cache.get_paths("Shot", shot["id"], True))
+            self.assertIn(self.path_cache.get_shotgun_id_from_path(shot_path), sg_ids)
+
+    def test_secondary_mappings(self):
+        """
+        The primary and secondary mappings of a path are each bound to their own entity.
+        """
+        shot, shot_path = self.shots[0]
+        seq = {"type": "Sequence", "id": 1, "name": "seq"}
+        self.path_cache.add_mappings(
+            [{"entity": shot, "path": shot_path, "primary": True, "metadata": {}},
+             {"entity": seq, "path": shot_path, "primary": False, "metadata": {}}],
+            "Shot", [shot["id"]]
+        )
+
+        cursor = self.path_cache._connection.cursor()
+        try:
+            res = list(cursor.execute(
+                "SELECT pc.entity_type, ss.shotgun_id FROM path_cache pc "
+                "INNER JOIN shotgun_status ss ON pc.rowid = ss.path_cache_id "
+                "WHERE pc.path = ? ORDER BY pc.primary_entity DESC",
+                (self.path_cache._path_to_dbpath(self.path_cache._separate_root(shot_path)[1]),)
+            ))
+        finally:
+            cursor.close()
+        self.assertEqual(["Shot", "Sequence"], [x[0] for x in res])
+
+        sg_entities = dict(
+            (x["id"], x["linked_entity_type"])
+            for x in self.mockgun.find(path_cache.SHOTGUN_ENTITY, [], ["linked_entity_type"])
+        )
+        self.assertEqual(["Shot", "Sequence"], [sg_entities[x[1]] for x in res])
+
+    def test_partial_failure(self):
+        """
+        A failed batch deletes the entities already created and leaves the path cache untouched.
+        """
+        num_events = len(self._get_folder_events())
+        batch = self.mockgun.batch
+
+        def fail_on_second_batch(requests):
+            if batch_mock.call_count == 2:
+                raise Exception("Connection lost")
+            return batch(requests)
+
+        with patch.object(self.mockgun, "batch", side_effect=fail_on_second_batch) as batch_mock:
+            self.assertRaises(tank.TankError, self._add_shots)
+        # the entities of the first batch were deleted by a third batch
+        self.assertEqual(3, batch_mock.call_count)
+
+        self.assertEqual([], self._get_filesystem_locations())
+        self.assertEqual(num_events, len(self._get_folder_events()))
+        for shot, shot_path in self.shots:
+            self.assertEqual([], self.path_cache.get_paths("Shot", shot["id"], True))
+            self.assertEqual(None, self.path_cache.get_entity(shot_path))
+
+        # nothing prevents creating the folders again
+        self._add_shots()
+        self.assertEqual(5, len(self._get_filesystem_locations()))
+
+    def test_event_failure(self):
+        """
+        The entities created are deleted if their event can't be logged.
+        """
+        create = self.mockgun.create
+
+        def fail_on_event(entity_type, data, *args, **kwargs):
+            if entity_type == "EventLogEntry":
+                raise Exception("Connection lost")
+            return create(entity_type, data, *args, **kwargs)
+
+        with patch.object(self.mockgun, "create", side_effect=fail_on_event):
+            self.assertRaises(tank.TankError, self._add_shots)
+
+        self.assertEqual([], self._get_filesystem_locations())
+        self.assertEqual([], self.path_cache.get_paths("Shot", self.shots[0][0]["id"], True))
+
+
 class TestGetEntity(TestPathCache):
     """
     Tests for get_entity. 
@@ -339,6 +464,289 @@ class TestGetEntity(TestPathCache):
         self.assertIsNone(result)
 
 
+class TestGetAncestorEntities(TestPathCache):
+    """
+    Tests for get_ancestor_entities.
+    """
+    def setUp(self):
+        super(TestGetAncestorEntities, self).setUp()
+        self.project_entity = {"type": "Project", "id": self.project["id"], "name": self.project["name"]}
+        self.seq = {"type": "Sequence", "id": 1, "name": "seq_1"}
+        self.shot = {"type": "Shot", "id": 2, "name": "shot_1"}
+        self.step = {"type": "Step", "id": 3, "name": "comp"}
+        self.task = {"type": "Task", "id": 4, "name": "comp_task"}
+
+        self.seq_path = os.path.join(self.project_root, "sequences", "seq_1")
+        self.shot_path = os.path.join(self.seq_path, "shot_1")
+        self.step_path = os.path.join(self.shot_path, "comp")
+
+        add_item_to_cache(self.path_cache, self.project_entity, self.project_root)
+        add_item_to_cache(self.path_cache, self.project_entity, self.alt_root_1)
+        add_item_to_cache(self.path_cache, self.seq, self.seq_path)
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        add_item_to_cache(self.path_cache, self.seq, self.shot_path, primary=False)
+        add_item_to_cache(self.path_cache, self.step, self.step_path)
+        add_item_to_cache(self.path_cache, self.task, self.step_path, primary=False)
+
+    def _get_expected(self, path):
+        """
+        Looks up the entities of a path and its parents one folder at a time.
+        """
+        expected = []
+        while True:
+            expected.append(
+                (path, self.path_cache.get_entity(path), self.path_cache.get_secondary_entities(path))
+            )
+            if path.lower() in [x.lower() for x in self.path_cache._roots.values()]:
+                break
+            parent_path = os.path.dirname(path)
+            if parent_path == path:
+                break
+            path = parent_path
+        return expected
+
+    def test_matches_single_lookups(self):
+        """
+        Results are the same as the ones of get_entity and get_secondary_entities.
+        """
+        for path in [
+            os.path.join(self.step_path, "work", "scene.ma"),
+            self.step_path,
+            self.shot_path,
+            self.project_root,
+            os.path.join(self.alt_root_1, "sequences"),
+        ]:
+            self.assertEquals(self._get_expected(path), self.path_cache.get_ancestor_entities(path))
+
+        result = self.path_cache.get_ancestor_entities(os.path.join(self.step_path, "work"))
+        self.assertEquals(
+            [
+                (os.path.join(self.step_path, "work"), None, []),
+                (self.step_path, self.step, [self.task]),
+                (self.shot_path, self.shot, [self.seq]),
+                (self.seq_path, self.seq, []),
+                (os.path.dirname(self.seq_path), None, []),
+                (self.project_root, self.project_entity, []),
+            ],
+            result
+        )
+
+    def test_single_query(self):
+        """
+        All the folders are looked up with a single query.
+        """
+        queries = []
+
+        class CursorWrapper(object):
+            def __init__(self, cursor):
+                self._cursor = cursor
+
+            def execute(self, *args):
+                queries.append(args)
+                return self._cursor.execute(*args)
+
+            def close(self):
+                self._cursor.close()
+
+        connection = self.path_cache._connection
+        with patch.object(self.path_cache._thread_data, "connection") as connection_mock:
+            connection_mock.cursor.side_effect = lambda: CursorWrapper(connection.cursor())
+            result = self.path_cache.get_ancestor_entities(os.path.join(self.step_path, "work"))
+        self.assertEquals(6, len(result))
+        self.assertEquals(1, len(queries))
+
+    def test_outside_of_project(self):
+        """
+        Folders outside of the project are returned without entities.
+        """
+        path = os.path.join(os.path.dirname(self.project_root), "not_a_project")
+        result = self.path_cache.get_ancestor_entities(path)
+        self.assertEquals(path, result[0][0])
+        for _, entity, secondary_entities in result:
+            self.assertIsNone(entity)
+            self.assertEquals([], secondary_entities)
+
+    def test_context_from_path(self):
+        """
+        Contexts are built from the results of get_ancestor_entities.
+        """
+        with patch.object(path_cache.PathCache, "get_entity") as get_entity:
+            ctx = self.tk.context_from_path(os.path.join(self.step_path, "work"))
+        self.assertFalse(get_entity.called)
+        self.assertEquals(self.project_entity, ctx.project)
+        self.assertEquals(self.shot, ctx.entity)
+        self.assertEquals(self.step, ctx.step)
+        self.assertEquals(self.task, ctx.task)
+
+    def test_several_paths(self):
+        """
+        Several paths are looked up together, with the same results as one at a time.
+        """
+        paths = [
+            os.path.join(self.step_path, "work", "scene.ma"),
+            os.path.join(self.step_path, "work", "other_scene.ma"),
+            self.shot_path,
+            None,
+            os.path.join(self.alt_root_1, "sequences"),
+            self.shot_path,
+        ]
+        with patch.object(self.path_cache, "_gen_param_string", wraps=self.path_cache._gen_param_string) as query_mock:
+            result = self.path_cache.get_ancestor_entities_for_paths(paths)
+        # a single query per root
+        self.assertEquals(2, query_mock.call_count)
+        self.assertEquals(
+            [self._get_expected(x) if x else [] for x in paths],
+            result
+        )
+
+
+class TestSharedPathCache(TestPathCache):
+    """
+    Tests for the path cache shared by the users of a Toolkit API instance.
+    """
+    def setUp(self):
+        super(TestSharedPathCache, self).setUp()
+        self.shot = {"type": "Shot", "id": 2, "name": "shot_1"}
+        self.shot_path = os.path.join(self.project_root, "shot_1")
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+
+    def test_shared(self):
+        """
+        The database is only set up once for all the lookups.
+        """
+        shared_path_cache = self.tk.get_path_cache()
+        self.assertIs(shared_path_cache, self.tk.get_path_cache())
+
+        with patch.object(path_cache.PathCache, "_init_db") as init_db:
+            with patch("sqlite3.connect", wraps=path_cache.sqlite3.connect) as connect:
+                for _ in range(3):
+                    self.assertEquals(self.shot, self.tk.entity_from_path(self.shot_path))
+                    self.assertEquals([self.shot_path], self.tk.paths_from_entity("Shot", 2))
+                    self.assertEquals(self.shot, self.tk.context_from_path(self.shot_path).entity)
+        self.assertFalse(init_db.called)
+        self.assertFalse(connect.called)
+
+    def test_threads(self):
+        """
+        Each thread gets its own connection.
+        """
+        shared_path_cache = self.tk.get_path_cache()
+        results = Queue.Queue()
+
+        def lookup():
+            results.put((shared_path_cache._connection, shared_path_cache.get_entity(self.shot_path)))
+
+        threads = [threading.Thread(target=lookup) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        connections = set([shared_path_cache._connection])
+        while not results.empty():
+            connection, entity = results.get()
+            self.assertEquals(self.shot, entity)
+            connections.add(connection)
+        self.assertEquals(5, len(connections))
+
+    def test_close(self):
+        """
+        A closed path cache reopens its connections when used again.
+        """
+        shared_path_cache = self.tk.get_path_cache()
+        connection = shared_path_cache._connection
+        shared_path_cache.close()
+        self.assertEquals(self.shot, shared_path_cache.get_entity(self.shot_path))
+        self.assertIsNot(connection, shared_path_cache._connection)
+
+
+class TestPathCacheReplica(TestPathCache):
+    """
+    Tests for the local replica of the path cache database.
+    """
+    def setUp(self):
+        super(TestPathCacheReplica, self).setUp()
+        self.replica_root = os.path.join(self.tank_temp, "path_cache_replica_%s" % time.time())
+        with temp_env_var(SGTK_PATH_CACHE_REPLICA_ROOT=self.replica_root):
+            self.replica_path_cache = path_cache.PathCache(self.tk)
+        self.shot = {"type": "Shot", "id": 2, "name": "shot_1"}
+        self.shot_path = os.path.join(self.project_root, "shot_1")
+
+    def tearDown(self):
+        self.replica_path_cache.close()
+        super(TestPathCacheReplica, self).tearDown()
+
+    def test_lookups_use_replica(self):
+        """
+        Lookups are done in the replica, which is created on first use.
+        """
+        replica_file = self.replica_path_cache._replica_file
+        self.assertEquals(self.replica_root, os.path.dirname(replica_file))
+        self.assertFalse(os.path.exists(replica_file))
+
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        self.assertEquals(self.shot, self.replica_path_cache.get_entity(self.shot_path))
+        self.assertTrue(os.path.exists(replica_file))
+
+        with patch.object(path_cache.PathCache, "_connection") as connection:
+            with patch.object(self.tk, "get_path_cache", return_value=self.replica_path_cache):
+                self.assertEquals(self.shot, self.replica_path_cache.get_entity(self.shot_path))
+                self.assertEquals([self.shot_path], self.replica_path_cache.get_paths("Shot", 2, True))
+                self.assertIsNotNone(self.replica_path_cache.get_shotgun_id_from_path(self.shot_path))
+                self.assertEquals(self.shot, self.tk.context_from_path(self.shot_path).entity)
+        self.assertFalse(connection.cursor.called)
+
+    def test_refreshed_on_synchronize(self):
+        """
+        Changes made by other processes are seen after the path cache is synchronized.
+        """
+        self.assertIsNone(self.replica_path_cache.get_entity(self.shot_path))
+
+        # make sure the database modification time changes
+        time.sleep(1)
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        self.assertIsNone(self.replica_path_cache.get_entity(self.shot_path))
+
+        self.replica_path_cache.synchronize()
+        self.assertEquals(self.shot, self.replica_path_cache.get_entity(self.shot_path))
+
+    def test_refreshed_on_read(self):
+        """
+        Changes made by other processes are seen by processes which only read once
+        the database is checked for changes again.
+        """
+        self.assertIsNone(self.replica_path_cache.get_entity(self.shot_path))
+
+        # make sure the database modification time changes
+        time.sleep(1)
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        self.assertIsNone(self.replica_path_cache.get_entity(self.shot_path))
+
+        with patch.object(path_cache.PathCache, "DB_CHANGE_CHECK_INTERVAL", 0):
+            self.assertEquals(self.shot, self.replica_path_cache.get_entity(self.shot_path))
+            self.assertEquals([self.shot_path], self.replica_path_cache.get_paths("Shot", 2, True))
+
+    def test_writes_go_to_database(self):
+        """
+        Mappings are added to the database and are immediately visible to lookups.
+        """
+        self.assertIsNone(self.replica_path_cache.get_entity(self.shot_path))
+        time.sleep(1)
+        add_item_to_cache(self.replica_path_cache, self.shot, self.shot_path)
+        self.assertEquals(self.shot, self.path_cache.get_entity(self.shot_path))
+        self.assertEquals(self.shot, self.replica_path_cache.get_entity(self.shot_path))
+
+    def test_refresh_failure(self):
+        """
+        Lookups fall back on the database when the replica can't be created.
+        """
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        with patch("shutil.copyfile", side_effect=IOError("disk full")):
+            self.assertEquals(self.shot, self.replica_path_cache.get_entity(self.shot_path))
+        self.assertFalse(os.path.exists(self.replica_path_cache._replica_file))
+        self.assertEquals([], os.listdir(self.replica_root))
+
+
 class TestGetPaths(TestPathCache):
     def test_add_and_find_shot(self):
         # add two paths to cache for a shot
@@ -368,6 +776,220 @@ class TestGetPaths(TestPathCache):
         self.assertIn(self.project_root, result)
         self.assertIn(self.alt_root_1, result)
 
+class TestGetEntitiesUnder(TestPathCache):
+    """
+    Tests the subtree queries.
+    """
+
+    def setUp(self):
+        super(TestGetEntitiesUnder, self).setUp()
+        self.seq = {"type": "Sequence", "id": 1, "name": "seq"}
+        self.shot = {"type": "Shot", "id": 2, "name": "shot"}
+        self.other_seq = {"type": "Sequence", "id": 3, "name": "seq-b"}
+
+        self.seq_path = os.path.join(self.project_root, "seq")
+        self.shot_path = os.path.join(self.seq_path, "shot")
+        self.other_seq_path = os.path.join(self.project_root, "seq-b")
+
+        add_item_to_cache(self.path_cache, self.seq, self.seq_path)
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        add_item_to_cache(self.path_cache, self.seq, self.shot_path, primary=False)
+        add_item_to_cache(self.path_cache, self.other_seq, self.other_seq_path)
+
+    def test_subtree(self):
+        """
+        The entities of the folder and of its children are returned, not the ones of its siblings.
+        """
+        result = self.path_cache.get_entities_under(self.seq_path)
+        self.assertEqual(
+            [(self.seq_path, self.seq, True), (self.shot_path, self.shot, True), (self.shot_path, self.seq, False)],
+            [(x["path"], x["entity"], x["primary"]) for x in result]
+        )
+        self.assertEqual(
+            self.path_cache.get_shotgun_id_from_path(self.shot_path),
+            result[1]["sg_id"]
+        )
+
+        result = self.path_cache.get_entities_under(self.seq_path, primary_only=True)
+        self.assertEqual([self.seq, self.shot], [x["entity"] for x in result])
+
+        result = self.path_cache.get_entities_under(self.seq_path + os.sep)
+        self.assertEqual(3, len(result))
+
+    def test_root(self):
+        """
+        All the entities of a storage are under its root.
+        """
+        result = self.path_cache.get_entities_under(self.project_root)
+        for entity in (self.seq, self.shot, self.other_seq):
+            self.assertIn(entity, [x["entity"] for x in result])
+
+    def test_unknown_paths(self):
+        """
+        Nothing is registered under unknown paths.
+        """
+        self.assertEqual([], self.path_cache.get_entities_under(os.path.join(self.shot_path, "foo")))
+        self.assertEqual([], self.path_cache.get_entities_under(os.path.join(self.tank_temp, "foo")))
+
+    def test_folder_tree(self):
+        """
+        The folder tree of a FilesystemLocation doesn't include the folders of its siblings.
+        """
+        sg_id = self.path_cache.get_shotgun_id_from_path(self.seq_path)
+        result = self.path_cache.get_folder_tree_from_sg_id(sg_id)
+        self.assertEqual([self.seq_path, self.shot_path, self.shot_path], [x["path"] for x in result])
+
+
+class TestLookupCache(TestPathCache):
+    """
+    Tests for the in memory cache of the path cache lookups.
+    """
+    def setUp(self):
+        super(TestLookupCache, self).setUp()
+        self.shot = {"type": "Shot", "id": 2, "name": "shot_1"}
+        self.shot_path = os.path.join(self.project_root, "shot_1")
+        self.seq = {"type": "Sequence", "id": 3, "name": "seq_1"}
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        add_item_to_cache(self.path_cache, self.seq, self.shot_path, primary=False)
+        self.path_cache.clear_lookup_cache()
+
+    def _lookup(self, path_cache):
+        return (
+            path_cache.get_entity(self.shot_path),
+            path_cache.get_paths("Shot", 2, True),
+            path_cache.get_secondary_entities(self.shot_path),
+        )
+
+    def test_hits(self):
+        """
+        Repeated lookups don't query the database.
+        """
+        expected = (self.shot, [self.shot_path], [self.seq])
+        self.assertEquals(expected, self._lookup(self.path_cache))
+        with patch.object(path_cache.PathCache, "_read_connection") as read_connection:
+            with patch.object(path_cache.PathCache, "_connection") as connection:
+                self.assertEquals(expected, self._lookup(self.path_cache))
+        self.assertFalse(read_connection.cursor.called)
+        self.assertEquals([], connection.mock_calls)
+        self.assertEquals(
+            {"hits": 3, "misses": 3, "size": 3, "max_size": constants.PATH_CACHE_LOOKUP_CACHE_SIZE},
+            self.path_cache.get_lookup_cache_stats()
+        )
+
+    def test_results_are_copies(self):
+        """
+        Modifying the results of a lookup doesn't affect the cached results.
+        """
+        self.path_cache.get_entity(self.shot_path)["name"] = "foo"
+        self.path_cache.get_secondary_entities(self.shot_path)[0]["name"] = "foo"
+        self.assertEquals(self.shot, self.path_cache.get_entity(self.shot_path))
+        self.assertEquals([self.seq], self.path_cache.get_secondary_entities(self.shot_path))
+
+    def test_add_mappings(self):
+        """
+        Adding mappings through any path cache invalidates the affected lookups.
+        """
+        other_path_cache = path_cache.PathCache(self.tk)
+        try:
+            new_path = os.path.join(self.project_root, "shot_2")
+            self.assertIsNone(self.path_cache.get_entity(new_path))
+            self.assertEquals([self.shot_path], self.path_cache.get_paths("Shot", 2, False))
+            self.assertEquals(self.shot, self.path_cache.get_entity(self.shot_path))
+
+            add_item_to_cache(other_path_cache, self.shot, new_path)
+            self.assertEquals(self.shot, self.path_cache.get_entity(new_path))
+            self.assertEquals(
+                sorted([self.shot_path, new_path]),
+                sorted(self.path_cache.get_paths("Shot", 2, False))
+            )
+            self.assertEquals(self.shot, self.path_cache.get_entity(self.shot_path))
+
+            # lookups not affected by mappings added through the path cache itself are still cached
+            add_item_to_cache(self.path_cache, self.shot, os.path.join(self.project_root, "shot_3"))
+            self.assertIn(("entity", "primary", "/shot_1"), self.path_cache._lookup_cache)
+        finally:
+            other_path_cache.close()
+
+    def _write_from_other_process(self, sql, params):
+        """
+        Emulates another process writing to the database.
+        """
+        connection = sqlite3.connect(self.path_cache._path_cache_file)
+        try:
+            connection.execute(sql, params)
+            connection.commit()
+        finally:
+            connection.close()
+        # make sure the modification time changes on file systems with a coarse resolution
+        mtime = os.stat(self.path_cache._path_cache_file).st_mtime + 10
+        os.utime(self.path_cache._path_cache_file, (mtime, mtime))
+
+    def test_changes_from_other_processes(self):
+        """
+        Changes committed to the database by other processes invalidate the lookups
+        once the database is checked again.
+        """
+        new_path = os.path.join(self.project_root, "shot_2")
+        self.assertIsNone(self.path_cache.get_entity(new_path))
+        self.assertIsNone(self.tk.entity_from_path(new_path))
+        self.assertEquals(self.shot, self.path_cache.get_entity(self.shot_path))
+        revision = self.path_cache.get_revision()
+
+        self._write_from_other_process(
+            "INSERT INTO path_cache VALUES (?, ?, ?, ?, ?, ?)",
+            ("Shot", 4, "shot_2", "primary", "/shot_2", 1)
+        )
+        self._write_from_other_process("UPDATE path_cache SET entity_name = ? WHERE entity_id = ?", ("renamed", 2))
+
+        # misses are not cached, the database is only checked for changes from time to time.
+        self.assertEquals({"type": "Shot", "id": 4, "name": "shot_2"}, self.path_cache.get_entity(new_path))
+        self.assertEquals({"type": "Shot", "id": 4, "name": "shot_2"}, self.tk.entity_from_path(new_path))
+        self.assertEquals(self.shot, self.path_cache.get_entity(self.shot_path))
+        self.assertEquals(revision, self.path_cache.get_revision())
+
+        with patch.object(path_cache.PathCache, "DB_CHANGE_CHECK_INTERVAL", 0):
+            self.assertEquals("renamed", self.path_cache.get_entity(self.shot_path)["name"])
+            self.assertNotEquals(revision, self.path_cache.get_revision())
+
+    def test_misses_not_cached(self):
+        """
+        Lookups which found nothing are not cached.
+        """
+        self.assertIsNone(self.path_cache.get_entity(os.path.join(self.project_root, "shot_2")))
+        self.assertEquals(0, self.path_cache.get_lookup_cache_stats()["size"])
+
+    def test_synchronize(self):
+        """
+        Synchronizing the path cache clears the lookups.
+        """
+        self._lookup(self.path_cache)
+        self.path_cache.synchronize()
+        self.assertEquals(0, self.path_cache.get_lookup_cache_stats()["size"])
+
+    def test_remove_filesystem_location_entries(self):
+        """
+        Unregistering folders clears the lookups.
+        """
+        self._lookup(self.path_cache)
+        path_cache.PathCache.remove_filesystem_location_entries(self.tk, [])
+        self.assertEquals(0, self.path_cache.get_lookup_cache_stats()["size"])
+
+    def test_disabled(self):
+        """
+        The cache can be disabled.
+        """
+        self.path_cache.set_lookup_cache_size(0)
+        self._lookup(self.path_cache)
+        self.assertEquals(
+            {"hits": 0, "misses": 0, "size": 0, "max_size": 0},
+            self.path_cache.get_lookup_cache_stats()
+        )
+        with patch.dict(os.environ, {"SGTK_PATH_CACHE_LOOKUP_CACHE_SIZE": "0"}):
+            other_path_cache = path_cache.PathCache(self.tk)
+        other_path_cache.close()
+        self.assertEquals(0, other_path_cache.get_lookup_cache_stats()["max_size"])
+
+
 class Test_SeperateRoots(TestPathCache):
     def test_different_case(self):
         """
@@ -974,7 +1596,7 @@ class TestPathCacheDelete(TankTestBase):
 
         # Wrap some methods in a mock so we can track their usage.
         self._pc._do_full_sync = Mock(wraps=self._pc._do_full_sync)
-        self._pc._import_filesystem_location_entry = Mock(wraps=self._pc._import_filesystem_location_entry)
+        self._pc._import_filesystem_location_entries = Mock(wraps=self._pc._import_filesystem_location_entries)
         self._pc._remove_filesystem_location_entities = Mock(wraps=self._pc._remove_filesystem_location_entities)
 
     def tearDown(self):
@@ -1074,7 +1696,7 @@ class TestPathCacheDelete(TankTestBase):
         self.assertEqual(self._pc._remove_filesystem_location_entities.call_count, 1)
         # However, since there is no filsystem location anymore in Shotgun, we shouldn't have even tried
         # to import it.
-        self.assertEqual(self._pc._import_filesystem_location_entry.call_count, 0)
+        self.assertEqual(self._pc._import_filesystem_location_entries.call_count, 0)
 
         # The entry should have been created and deleted, so there should be no paths.
         paths = self._pc.get_paths(self._shot_entity["type"], self._shot_entity["id"], primary_only=True)
@@ -1154,6 +1776,331 @@ class TestPathCacheDelete(TankTestBase):
         pc.remove_filesystem_location_entries(self.tk, path_ids)
 
 
+class TestPagedIncrementalSync(TankTestBase):
+    """
+    Tests that incremental syncs process the event log page by page.
+    """
+
+    def setUp(self):
+        super(TestPagedIncrementalSync, self).setUp()
+
+        project_link = self.mockgun.create("Project", {"name": "MyProject"})
+        self._shots = []
+        for idx in range(5):
+            shot = self.mockgun.create("Shot", {"code": "shot_%d" % idx, "project": project_link})
+            shot["name"] = shot["code"]
+            self._shots.append((shot, os.path.join(self.project_root, shot["code"])))
+
+        # the first shot is registered locally, which sets the sync marker.
+        self._pc = path_cache.PathCache(self.tk)
+        self._pc.synchronize()
+        add_item_to_cache(self._pc, *self._shots[0])
+
+        # dial down the page size for these tests
+        self._prev_page_size = self._pc.SHOTGUN_EVENT_QUERY_PAGE_SIZE
+        path_cache.PathCache.SHOTGUN_EVENT_QUERY_PAGE_SIZE = 2
+
+        # register the shots from "another computer", one event log entry per shot
+        with temp_env_var(SHOTGUN_HOME=os.path.join(self.tank_temp, "other_path_cache_root")):
+            pc = path_cache.PathCache(self.tk)
+            try:
+                pc.synchronize()
+                for shot, shot_path in self._shots[1:]:
+                    add_item_to_cache(pc, shot, shot_path)
+            finally:
+                pc.close()
+
+        # mockgun ignores the limit of find requests.
+        find = self.mockgun.find
+
+        def paged_find(*args, **kwargs):
+            results = find(*args, **kwargs)
+            if kwargs.get("limit"):
+                results = results[:kwargs["limit"]]
+            return results
+
+        patcher = patch.object(self.mockgun, "find", side_effect=paged_find)
+        self._find_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self._pc.close()
+        path_cache.PathCache.SHOTGUN_EVENT_QUERY_PAGE_SIZE = self._prev_page_size
+        super(TestPagedIncrementalSync, self).tearDown()
+
+    def _get_event_log_marker(self):
+        cursor = self._pc._connection.cursor()
+        try:
+            return list(cursor.execute("SELECT max(last_id) FROM event_log_sync"))[0][0]
+        finally:
+            cursor.close()
+
+    def _get_event_ids(self):
+        return [
+            x["id"] for x in self.mockgun.find(
+                "EventLogEntry", [["event_type", "is", "Toolkit_Folders_Create"]], ["id"]
+            )
+        ]
+
+    def test_paged_sync(self):
+        """
+        All the pages are synced.
+        """
+        new_items = self._pc.synchronize()
+        self.assertEqual(4, len(new_items))
+        for shot, shot_path in self._shots:
+            self.assertEqual([shot_path], self._pc.get_paths("Shot", shot["id"], True))
+        event_log_finds = [x for x in self._find_mock.call_args_list if x[0][0] == "EventLogEntry"]
+        self.assertEqual(3, len(event_log_finds))
+        self.assertEqual(max(self._get_event_ids()), self._get_event_log_marker())
+
+    def test_resume_interrupted_sync(self):
+        """
+        An interrupted sync keeps the pages it completed and resumes from there.
+        """
+        marker = self._get_event_log_marker()
+        get_entities = self._pc._get_filesystem_location_entities
+        calls = []
+
+        def fail_on_second_page(folder_ids):
+            calls.append(folder_ids)
+            if len(calls) == 2:
+                raise tank.TankError("Connection lost")
+            return get_entities(folder_ids)
+
+        with patch.object(self._pc, "_get_filesystem_location_entities", side_effect=fail_on_second_page):
+            self.assertRaises(tank.TankError, self._pc.synchronize)
+
+        # the first page holds the last synced event and the second shot.
+        new_event_ids = sorted(x for x in self._get_event_ids() if x > marker)
+        self.assertEqual(new_event_ids[0], self._get_event_log_marker())
+        self.assertEqual(1, len(self._pc.get_paths("Shot", self._shots[1][0]["id"], True)))
+        self.assertEqual([], self._pc.get_paths("Shot", self._shots[2][0]["id"], True))
+
+        new_items = self._pc.synchronize()
+        self.assertEqual(3, len(new_items))
+        for shot, shot_path in self._shots:
+            self.assertEqual([shot_path], self._pc.get_paths("Shot", shot["id"], True))
+
+
+class TestBackgroundSync(TankTestBase):
+    """
+    Tests the background synchronization of the path cache.
+    """
+
+    def setUp(self):
+        super(TestBackgroundSync, self).setUp()
+
+        project_link = self.mockgun.create("Project", {"name": "MyProject"})
+        self._shots = []
+        for idx in range(2):
+            shot = self.mockgun.create("Shot", {"code": "shot_%d" % idx, "project": project_link})
+            shot["name"] = shot["code"]
+            self._shots.append((shot, os.path.join(self.project_root, shot["code"])))
+
+        # the first shot is registered locally, which sets the sync marker.
+        self._pc = path_cache.PathCache(self.tk)
+        self._pc.synchronize()
+        add_item_to_cache(self._pc, *self._shots[0])
+
+    def tearDown(self):
+        self._pc.close()
+        super(TestBackgroundSync, self).tearDown()
+
+    def _register_remote_shot(self):
+        """
+        Registers the second shot from "another computer".
+        """
+        with temp_env_var(SHOTGUN_HOME=os.path.join(self.tank_temp, "other_path_cache_root")):
+            pc = path_cache.PathCache(self.tk)
+            try:
+                pc.synchronize()
+                add_item_to_cache(pc, *self._shots[1])
+            finally:
+                pc.close()
+
+    def test_items_passed_to_callback(self):
+        """
+        The items found in the background are passed to the callback and not
+        returned by the next foreground sync.
+        """
+        shot, shot_path = self._shots[1]
+        pages = []
+        self.assertEqual(False, self._pc.synchronize_incrementally(pages.append))
+        self.assertEqual([], pages)
+
+        self._register_remote_shot()
+        self.assertEqual([], self._pc.get_paths("Shot", shot["id"], True))
+        self.assertEqual(True, self._pc.synchronize_incrementally(pages.append))
+        self.assertEqual([shot_path], self._pc.get_paths("Shot", shot["id"], True))
+        self.assertEqual([[shot_path]], [[x["path"] for x in page] for page in pages])
+
+        self.assertEqual([], self._pc.synchronize())
+
+    def test_folders_created(self):
+        """
+        The synchronizer runs the folder creation hook for the items found in the background.
+        """
+        shot, shot_path = self._shots[1]
+        self._register_remote_shot()
+
+        synchronizer = path_cache.PathCacheSynchronizer(self.tk, 1)
+        intervals = []
+
+        def wait(interval):
+            intervals.append(interval)
+            if len(intervals) > 1:
+                synchronizer.halt()
+
+        with patch.object(self.tk, "get_path_cache", return_value=self._pc):
+            with patch.object(self.tk, "execute_core_hook") as execute_core_hook:
+                with patch.object(synchronizer._halt_event, "wait", side_effect=wait):
+                    synchronizer.run()
+
+        self.assertEqual(1, execute_core_hook.call_count)
+        items = execute_core_hook.call_args[1]["items"]
+        self.assertEqual([shot_path], [x["path"] for x in items])
+        self.assertEqual(["remote_entity_folder"], [x["action"] for x in items])
+        self.assertEqual([shot_path], self._pc.get_paths("Shot", shot["id"], True))
+
+    def test_no_full_sync(self):
+        """
+        Full syncs are left to the foreground syncs.
+        """
+        cursor = self._pc._connection.cursor()
+        cursor.execute("DELETE FROM event_log_sync")
+        self._pc._connection.commit()
+        cursor.close()
+
+        items_callback = Mock()
+        with patch.object(self._pc, "_do_full_sync") as full_sync_mock:
+            self.assertEqual(None, self._pc.synchronize_incrementally(items_callback))
+        self.assertEqual(0, full_sync_mock.call_count)
+
+        self._pc.synchronize()
+        self.assertEqual(False, self._pc.synchronize_incrementally(items_callback))
+        self.assertFalse(items_callback.called)
+
+    def test_backoff(self):
+        """
+        The polling interval doubles up to its maximum until changes are applied.
+        """
+        results = [False, None, tank.TankError("Connection lost"), False, True, False]
+        path_cache_mock = Mock()
+        path_cache_mock.synchronize_incrementally.side_effect = results
+        tk = Mock()
+        tk.get_path_cache.return_value = path_cache_mock
+
+        synchronizer = path_cache.PathCacheSynchronizer(tk, 1, 4)
+        intervals = []
+
+        def wait(interval):
+            intervals.append(interval)
+            if len(intervals) > len(results):
+                synchronizer.halt()
+
+        with patch.object(synchronizer._halt_event, "wait", side_effect=wait):
+            synchronizer.run()
+
+        self.assertEqual([1, 2, 4, 4, 4, 1, 2], intervals)
+        self.assertTrue(synchronizer.daemon)
+
+    def test_sync_interval(self):
+        """
+        Background syncs are only enabled with a positive interval.
+        """
+        self.assertEqual(None, path_cache.get_path_cache_sync_interval())
+        for value, expected in [("30", 30), ("0.5", 0.5), ("0", None), ("abc", None)]:
+            with temp_env_var(SGTK_PATH_CACHE_SYNC_INTERVAL=value):
+                self.assertEqual(expected, path_cache.get_path_cache_sync_interval())
+
+
+class TestPathCacheSnapshot(TankTestBase):
+    """
+    Tests seeding path caches from snapshots.
+    """
+
+    def setUp(self):
+        super(TestPathCacheSnapshot, self).setUp()
+
+        project_link = self.mockgun.create("Project", {"name": "MyProject"})
+        self._shots = []
+        for idx in range(3):
+            shot = self.mockgun.create("Shot", {"code": "shot_%d" % idx, "project": project_link})
+            shot["name"] = shot["code"]
+            self._shots.append((shot, os.path.join(self.project_root, shot["code"])))
+
+        self._pc = path_cache.PathCache(self.tk)
+        self._pc.synchronize()
+        self._num_entries = self._pc.export_snapshot(os.path.join(self.tank_temp, "empty_snapshot")) + 2
+        for shot, shot_path in self._shots[:2]:
+            add_item_to_cache(self._pc, shot, shot_path)
+
+        self._snapshot_file = os.path.join(self.tank_temp, "path_cache_snapshot")
+
+    def tearDown(self):
+        self._pc.close()
+        super(TestPathCacheSnapshot, self).tearDown()
+
+    def _get_node_path_cache(self):
+        """
+        Returns a path cache stored in another location, like the one of a render node.
+        """
+        with temp_env_var(SHOTGUN_HOME=os.path.join(self.tank_temp, "node_path_cache_root")):
+            pc = path_cache.PathCache(self.tk)
+        self.addCleanup(pc.close)
+        return pc
+
+    def test_seed_from_snapshot(self):
+        """
+        A path cache seeded from a snapshot only syncs the changes made since.
+        """
+        self.assertEqual(self._num_entries, self._pc.export_snapshot(self._snapshot_file))
+
+        # a folder created after the snapshot was taken
+        add_item_to_cache(self._pc, *self._shots[2])
+
+        pc = self._get_node_path_cache()
+        self.assertEqual(self._num_entries, pc.import_snapshot(self._snapshot_file))
+        for shot, shot_path in self._shots[:2]:
+            self.assertEqual([shot_path], pc.get_paths("Shot", shot["id"], True))
+            self.assertEqual(shot["id"], pc.get_entity(shot_path)["id"])
+        self.assertEqual([], pc.get_paths("Shot", self._shots[2][0]["id"], True))
+
+        with patch.object(pc, "_do_full_sync") as full_sync_mock:
+            new_items = pc.synchronize()
+        self.assertEqual(0, full_sync_mock.call_count)
+        self.assertEqual([self._shots[2][1]], [x["path"] for x in new_items])
+        self.assertEqual(
+            self._pc.get_shotgun_id_from_path(self._shots[0][1]),
+            pc.get_shotgun_id_from_path(self._shots[0][1])
+        )
+
+    def test_import_replaces_contents(self):
+        """
+        Importing a snapshot discards the previous contents of the path cache.
+        """
+        self._pc.export_snapshot(self._snapshot_file)
+        add_item_to_cache(self._pc, *self._shots[2])
+        self._pc.import_snapshot(self._snapshot_file)
+        self.assertEqual([], self._pc.get_paths("Shot", self._shots[2][0]["id"], True))
+
+    def test_invalid_snapshots(self):
+        """
+        Files which are not snapshots of the project's path cache are rejected.
+        """
+        pc = self._get_node_path_cache()
+
+        with open(self._snapshot_file, "w") as fh:
+            fh.write("not a snapshot")
+        self.assertRaises(tank.TankError, pc.import_snapshot, self._snapshot_file)
+
+        self._pc.export_snapshot(self._snapshot_file)
+        with patch.object(self.tk.pipeline_configuration, "get_project_id", return_value=12345):
+            self.assertRaises(tank.TankError, pc.import_snapshot, self._snapshot_file)
+        self.assertEqual([], pc.get_paths("Shot", self._shots[0][0]["id"], True))
+
+
 class TestPathCacheBatchOperation(TankTestBase):
     """
     Tests the deletion of 2000+ filesystem locations (#44931)
@@ -1172,6 +2119,149 @@ class TestPathCacheBatchOperation(TankTestBase):
         self._pc.SHOTGUN_ENTITY_QUERY_BATCH_SIZE = self._prev_batch_size
         super(TestPathCacheBatchOperation, self).tearDown()
 
+    def _register_shots(self, count):
+        """
+        Registers folders for new shots and returns their paths.
+        """
+        project_link = self.mockgun.create("Project", {"name": "MyProject"})
+        shot_paths = []
+        for idx in xrange(count):
+            shot = self.mockgun.create("Shot", {"code": "shot_%d" % idx, "project": project_link})
+            shot["name"] = shot["code"]
+            shot_paths.append(os.path.join(self.project_root, shot["code"]))
+            add_item_to_cache(self._pc, shot, shot_paths[-1])
+        return shot_paths
+
+    @contextlib.contextmanager
+    def _paged_find(self, fail_after=None):
+        """
+        Makes mockgun honour the limit of find requests, failing after a number of pages if requested.
+        """
+        find = self.mockgun.find
+        pages = []
+
+        def paged_find(*args, **kwargs):
+            results = find(*args, **kwargs)
+            if kwargs.get("limit"):
+                pages.append(results)
+                if len(pages) == fail_after:
+                    raise tank.TankError("Connection lost")
+                results = results[:kwargs["limit"]]
+            return results
+
+        with patch.object(self.mockgun, "find", side_effect=paged_find):
+            yield pages
+
+    def _get_index_names(self):
+        cursor = self._pc._connection.cursor()
+        try:
+            return [x[0] for x in cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")]
+        finally:
+            cursor.close()
+
+    def test_paged_full_sync(self):
+        """
+        Full syncs write the FilesystemLocation entries page by page.
+        """
+        shot_paths = self._register_shots(25)
+        num_entries = len(self.mockgun.find(path_cache.SHOTGUN_ENTITY, []))
+
+        progress = []
+        with self._paged_find() as pages:
+            new_items = self._pc.synchronize(full_sync=True, progress_callback=progress.append)
+
+        self.assertEqual(3, len(pages))
+        self.assertEqual([11, 22, num_entries], progress)
+        self.assertEqual(num_entries, len(new_items))
+        new_paths = [x["path"] for x in new_items]
+        for shot_path in shot_paths:
+            self.assertIn(shot_path, new_paths)
+        self.assertEqual(shot_paths[-1:], self._pc.get_paths("Shot", new_items[-1]["entity"]["id"], True))
+        self.assertIn("path_cache_entity", self._get_index_names())
+
+    def _count_entries(self):
+        """
+        Counts the path cache entries as seen by another process.
+        """
+        connection = sqlite3.connect(self._pc._path_cache_file)
+        try:
+            return connection.execute("SELECT count(*) FROM path_cache").fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_interrupted_full_sync(self):
+        """
+        An interrupted full sync leaves the path cache as it was.
+        """
+        shot_paths = self._register_shots(25)
+        num_entries = self._count_entries()
+        last_event_log_synced = self._pc._get_last_event_log_synced()
+
+        progress = []
+        with self._paged_find(fail_after=2):
+            self.assertRaises(
+                tank.TankError, self._pc.synchronize, full_sync=True, progress_callback=progress.append
+            )
+        self.assertEqual([11], progress)
+        self.assertEqual(num_entries, self._count_entries())
+        self.assertEqual(last_event_log_synced, self._pc._get_last_event_log_synced())
+        self.assertIn("path_cache_entity", self._get_index_names())
+        self.assertIsNotNone(self._pc.get_entity(shot_paths[0]))
+
+        # the temporary tables are removed
+        cursor = self._pc._connection.cursor()
+        try:
+            self.assertEqual([], list(cursor.execute("SELECT name FROM sqlite_temp_master")))
+        finally:
+            cursor.close()
+
+    def test_full_sync_items_callback(self):
+        """
+        The new items of full syncs can be handled page by page, while other processes
+        still see the path cache as it was before the sync.
+        """
+        shot_paths = self._register_shots(25)
+        num_entries = self._count_entries()
+
+        pages = []
+
+        def items_callback(items):
+            self.assertEqual(num_entries, self._count_entries())
+            pages.append(items)
+
+        with self._paged_find():
+            self.assertEqual([], self._pc.synchronize(full_sync=True, items_callback=items_callback))
+
+        self.assertEqual([11, 11, num_entries - 22], [len(x) for x in pages])
+        new_paths = [x["path"] for page in pages for x in page]
+        for shot_path in shot_paths:
+            self.assertIn(shot_path, new_paths)
+        self.assertEqual(num_entries, self._count_entries())
+
+    def test_sync_path_cache_by_page(self):
+        """
+        Synchronizing folders runs the folder creation hook for each page of new folders.
+        """
+        shot_paths = self._register_shots(25)
+        num_entries = self._count_entries()
+
+        with patch.object(self.tk, "get_path_cache", return_value=self._pc):
+            with patch.object(self.tk, "execute_core_hook") as execute_core_hook:
+                with self._paged_find():
+                    folders = folder.synchronize_folders(self.tk, True)
+
+        self.assertEqual(3, execute_core_hook.call_count)
+        self.assertEqual(
+            [11, 11, num_entries - 22],
+            [len(x[1]["items"]) for x in execute_core_hook.call_args_list]
+        )
+        self.assertEqual(
+            folders,
+            [x["path"] for c in execute_core_hook.call_args_list for x in c[1]["items"]]
+        )
+        for shot_path in shot_paths:
+            self.assertIn(shot_path, folders)
+
     def test_high_volume_batch_deletion(self):
         """
         Test that deleting lots of items out of the path cache
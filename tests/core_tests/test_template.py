@@ -12,11 +12,14 @@ import copy
 import sys
 import os
 import time
+import cPickle as pickle
+
+from mock import patch
 
 import tank
 from tank import TankError
 from tank_test.tank_test_base import *
-from tank.template import Template, TemplatePath, TemplateString
+from tank.template import Template, TemplatePath, TemplateString, LazyTemplates
 from tank.template import make_template_paths, make_template_strings, read_templates
 from tank.templatekey import (TemplateKey, StringKey, IntegerKey, SequenceKey, TimestampKey)
 
@@ -243,6 +246,103 @@ class TestMissingKeys(TestTemplate):
         self.assertEquals(["Shot"], result)
 
 
+class TestFieldsCache(TankTestBase):
+    """Tests for the cache of fields parsed from paths."""
+    def setUp(self):
+        super(TestFieldsCache, self).setUp()
+        self.keys = {"Shot": StringKey("Shot"),
+                     "name": StringKey("name"),
+                     "version": IntegerKey("version", format_spec="03")}
+        self.template = TemplatePath("shots/{Shot}/{name}.v{version}.ma", self.keys, self.project_root)
+        self.path = os.path.join(self.project_root, "shots", "shot_1", "foo.v001.ma")
+        self.fields = {"Shot": "shot_1", "name": "foo", "version": 1}
+
+    def test_hits(self):
+        self.assertEquals(self.fields, self.template.get_fields(self.path))
+        self.assertTrue(self.template.validate(self.path))
+        self.assertEquals(self.fields, self.template.validate_and_get_fields(self.path))
+        # the path is normalized
+        other_path = os.path.join(self.project_root, "shots", ".", "shot_1", "foo.v001.ma")
+        self.assertTrue(self.template.validate(other_path))
+        stats = self.template.get_fields_cache_stats()
+        self.assertEquals(1, stats["misses"])
+        self.assertEquals(3, stats["hits"])
+        self.assertEquals(1, stats["size"])
+
+    def test_skip_keys(self):
+        self.assertEquals(self.fields, self.template.get_fields(self.path))
+        expected = {"Shot": "shot_1", "name": "foo"}
+        self.assertEquals(expected, self.template.get_fields(self.path, skip_keys=["version"]))
+        self.assertEquals(expected, self.template.get_fields(self.path, skip_keys=("version",)))
+        stats = self.template.get_fields_cache_stats()
+        self.assertEquals(2, stats["misses"])
+        self.assertEquals(1, stats["hits"])
+
+    def test_invalid_paths(self):
+        """
+        Paths not matching are cached but errors are still reported.
+        """
+        bad_path = os.path.join(self.project_root, "shots", "shot_1", "foo.vbad.ma")
+        self.assertFalse(self.template.validate(bad_path))
+        self.assertFalse(self.template.validate(bad_path))
+        self.assertRaises(TankError, self.template.get_fields, bad_path)
+        stats = self.template.get_fields_cache_stats()
+        self.assertEquals(1, stats["misses"])
+        self.assertEquals(2, stats["hits"])
+
+    def test_copies(self):
+        """
+        Modifying returned fields doesn't affect the cache.
+        """
+        fields = self.template.get_fields(self.path)
+        fields["Shot"] = "other"
+        fields["extra"] = 1
+        self.assertEquals(self.fields, self.template.get_fields(self.path))
+
+    def test_bounded(self):
+        self.template.set_fields_cache_size(2)
+        paths = [os.path.join(self.project_root, "shots", "shot_%d" % i, "foo.v001.ma") for i in range(3)]
+        for path in paths:
+            self.template.validate(path)
+        self.assertEquals(2, self.template.get_fields_cache_stats()["size"])
+        # the oldest path was discarded
+        self.template.validate(paths[0])
+        self.assertEquals(4, self.template.get_fields_cache_stats()["misses"])
+
+    def test_disabled(self):
+        self.template.set_fields_cache_size(0)
+        self.template.validate(self.path)
+        self.template.validate(self.path)
+        self.assertEquals({"hits": 0, "misses": 0, "size": 0, "max_size": 0},
+                          self.template.get_fields_cache_stats())
+
+        with patch.dict(os.environ, {"SGTK_TEMPLATE_FIELDS_CACHE_SIZE": "0"}):
+            template = TemplatePath("shots/{Shot}", self.keys, self.project_root)
+        self.assertEquals(0, template.get_fields_cache_stats()["max_size"])
+
+        with patch.dict(os.environ, {"SGTK_TEMPLATE_FIELDS_CACHE_SIZE": "10"}):
+            template = TemplatePath("shots/{Shot}", self.keys, self.project_root)
+        self.assertEquals(10, template.get_fields_cache_stats()["max_size"])
+
+    def test_template_string(self):
+        template = TemplateString("{Shot}.{name}", self.keys)
+        self.assertEquals({"Shot": "shot_1", "name": "foo"}, template.get_fields("shot_1.foo"))
+        self.assertEquals({"Shot": "shot_1", "name": "foo"}, template.get_fields("shot_1.foo"))
+        self.assertEquals(1, template.get_fields_cache_stats()["hits"])
+
+    def test_reload_templates(self):
+        """
+        Caches of the previous templates are cleared when templates are reloaded.
+        """
+        self.setup_fixtures()
+        template = self.tk.templates["maya_shot_work"]
+        template.validate(self.path)
+        self.assertEquals(1, template.get_fields_cache_stats()["size"])
+        self.tk.reload_templates()
+        self.assertEquals(0, template.get_fields_cache_stats()["size"])
+        self.assertIsNot(template, self.tk.templates["maya_shot_work"])
+
+
 class TestSplitPath(TankTestBase):
     def test_mixed_sep(self):
         "tests that split works with mixed seperators"
@@ -276,6 +376,93 @@ class TestReadTemplates(TankTestBase):
             self.assertIn(key_name, houdini_asset_publish.keys)
 
 
+class TestLazyTemplates(TankTestBase):
+    """Tests for the templates built on first access."""
+    def setUp(self):
+        super(TestLazyTemplates, self).setUp()
+        self.setup_fixtures()
+        # make sure the templates are read from the configuration
+        patcher = patch.dict(os.environ, {"SGTK_DISABLE_TEMPLATES_CACHE": "1"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lazy(self):
+        templates = read_templates(self.pipeline_configuration)
+        self.assertIsInstance(templates, LazyTemplates)
+        self.assertEquals([], templates.get_built_templates())
+
+        template = templates["maya_publish_name"]
+        self.assertIsInstance(template, TemplateString)
+        self.assertIs(template, templates["maya_publish_name"])
+        self.assertEquals([template], templates.get_built_templates())
+
+        # all the templates are known without being built
+        self.assertIn("maya_shot_work", templates)
+        self.assertEquals(len(self.tk.templates), len(templates))
+        self.assertEquals(sorted(self.tk.templates.keys()), templates.keys())
+        self.assertEquals(1, len(templates.get_built_templates()))
+
+        # and are built when iterating over them
+        self.assertEquals(len(templates), len(templates.values()))
+        self.assertEquals(len(templates), len(templates.get_built_templates()))
+
+    def test_validate_with(self):
+        keys = {"Shot": StringKey("Shot")}
+        templates = LazyTemplates(keys)
+        templates.add_path("shot", "shots/{Shot}", self.project_root)
+        templates.add_string("shot_name", "{Shot}", "shot")
+        template = templates["shot_name"]
+        self.assertIs(templates["shot"], template.validate_with)
+        self.assertEquals(2, len(templates.get_built_templates()))
+
+    def test_eager(self):
+        templates = read_templates(self.pipeline_configuration, eager=True)
+        self.assertEquals(len(templates), len(templates.get_built_templates()))
+        with patch.dict(os.environ, {"SGTK_EAGER_TEMPLATES": "1"}):
+            templates = read_templates(self.pipeline_configuration)
+        self.assertEquals(len(templates), len(templates.get_built_templates()))
+
+    def test_errors(self):
+        """
+        Errors in definitions are raised every time the template is accessed.
+        """
+        keys = {"Shot": StringKey("Shot")}
+        templates = LazyTemplates(keys)
+        templates.add_path("good", "shots/{Shot}", self.project_root)
+        templates.add_path("bad_1", "shots/{Shot}/{name}", self.project_root)
+        templates.add_string("bad_2", "{Shot}]", "good")
+        self.assertIn("bad_1", templates)
+        for _ in range(2):
+            self.assertRaisesRegexp(TankError, "bad_1", templates.__getitem__, "bad_1")
+        self.assertRaisesRegexp(TankError, "bad_2", templates.__getitem__, "bad_2")
+        # errors are raised in the same order every time
+        self.assertRaisesRegexp(TankError, "bad_1", templates.build_all)
+        del templates["bad_1"]
+        self.assertRaisesRegexp(TankError, "bad_2", templates.build_all)
+        self.assertEquals(["bad_2", "good"], templates.keys())
+
+    def test_mutable(self):
+        templates = read_templates(self.pipeline_configuration)
+        template = TemplatePath("foo/{Shot}", self.tk.templates["maya_shot_work"].keys, self.project_root)
+        templates["maya_shot_work"] = template
+        self.assertIs(template, templates["maya_shot_work"])
+        del templates["maya_publish_name"]
+        self.assertNotIn("maya_publish_name", templates)
+        self.assertRaises(KeyError, templates.__getitem__, "maya_publish_name")
+        self.assertIs(template, templates.copy()["maya_shot_work"])
+
+    def test_pickle(self):
+        templates = read_templates(self.pipeline_configuration)
+        templates["maya_shot_work"]
+        unpickled = pickle.loads(pickle.dumps(templates, pickle.HIGHEST_PROTOCOL))
+        self.assertEquals(1, len(unpickled.get_built_templates()))
+        self.assertEquals(templates.keys(), unpickled.keys())
+        self.assertEquals(templates["maya_shot_work"].definition, unpickled["maya_shot_work"].definition)
+        self.assertEquals(
+            templates["maya_publish_name"].definition, unpickled["maya_publish_name"].definition
+        )
+
+
 class TestMakeTemplatePaths(TankTestBase):
     def setUp(self):
         super(TestMakeTemplatePaths, self).setUp()
@@ -0,0 +1,179 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import sys
+import stat
+import time
+import datetime
+import cPickle as pickle
+
+from mock import patch
+
+from tank_test.tank_test_base import *
+
+from tank.template import read_templates, TemplatePath, TemplateString
+from tank.template_cache import TemplateCache
+from tank.templatekey import TimestampKey
+
+
+class TestTemplateCache(TankTestBase):
+    """
+    Tests for the on disk cache of templates.
+    """
+    def setUp(self):
+        super(TestTemplateCache, self).setUp()
+        self.templates_file = self.pipeline_configuration.get_templates_config_path()
+        self.include_file = os.path.join(os.path.dirname(self.templates_file), "included.yml")
+        self._write(self.include_file, "keys:\n  Shot: {type: str}\npaths:\n  shot_root: shots/{Shot}\n")
+        self._write(
+            self.templates_file,
+            "include: included.yml\n"
+            "keys:\n"
+            "  name: {type: str}\n"
+            "  date: {type: timestamp, default: now}\n"
+            "paths:\n"
+            "  work: shots/{Shot}/{name}.{date}.ma\n"
+            "strings:\n"
+            "  label: '{name}'\n"
+        )
+        self.cache = TemplateCache(self.pipeline_configuration,
+                                   self.pipeline_configuration.get_all_platform_data_roots())
+
+    def _write(self, path, contents):
+        """
+        Writes a file, making sure its modification time changes.
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        with open(path, "w") as fh:
+            fh.write(contents)
+        mtime = time.time() + 10
+        os.utime(path, (mtime, mtime))
+
+    def _read_templates(self):
+        """
+        Reads the templates, returning whether they came from the cache or not.
+        """
+        with patch.object(self.pipeline_configuration, "get_templates_config",
+                          wraps=self.pipeline_configuration.get_templates_config) as get_templates_config:
+            templates = read_templates(self.pipeline_configuration)
+        return templates, not get_templates_config.called
+
+    def test_cached(self):
+        templates, cached = self._read_templates()
+        self.assertFalse(cached)
+        self.assertTrue(os.path.exists(self.cache.path))
+
+        cached_templates, cached = self._read_templates()
+        self.assertTrue(cached)
+        self.assertEquals(sorted(templates), sorted(cached_templates))
+        for name, template in templates.iteritems():
+            self.assertEquals(template.definition, cached_templates[name].definition)
+            self.assertEquals(type(template), type(cached_templates[name]))
+
+        work = cached_templates["work"]
+        self.assertIsInstance(work, TemplatePath)
+        self.assertIsInstance(cached_templates["label"], TemplateString)
+        # keys are shared between templates as when they are built
+        self.assertIs(work.keys["name"], cached_templates["label"].keys["name"])
+
+        # the cached templates work as usual
+        path = os.path.join(self.project_root, "shots", "shot_1", "foo.2017-01-01-10-00-00.ma")
+        fields = {"Shot": "shot_1", "name": "foo", "date": datetime.datetime(2017, 1, 1, 10)}
+        self.assertEquals(fields, work.get_fields(path))
+        self.assertEquals(path, work.apply_fields(fields))
+        # including keys defaulting to the current time
+        self.assertIsInstance(work.keys["date"].default, datetime.datetime)
+
+    def test_templates_changed(self):
+        self._read_templates()
+        self._write(self.templates_file, "paths:\n  other: other/path\n")
+        templates, cached = self._read_templates()
+        self.assertFalse(cached)
+        self.assertEquals(["other"], templates.keys())
+
+    def test_include_changed(self):
+        self._read_templates()
+        self._write(self.include_file, "keys:\n  Shot: {type: str}\npaths:\n  shot_root: shot/{Shot}\n")
+        templates, cached = self._read_templates()
+        self.assertFalse(cached)
+        self.assertEquals("shot/{Shot}", templates["shot_root"].definition)
+        self.assertTrue(self._read_templates()[1])
+
+    def test_roots_changed(self):
+        self._read_templates()
+        roots = self.pipeline_configuration.get_all_platform_data_roots()
+        roots["primary"] = dict((platform, "/other/root") for platform in roots["primary"])
+        with patch.object(self.pipeline_configuration, "get_all_platform_data_roots", return_value=roots):
+            templates, cached = self._read_templates()
+        self.assertFalse(cached)
+        self.assertEquals("/other/root", templates["work"].root_path)
+
+    def test_disabled(self):
+        if os.path.exists(self.cache.path):
+            os.remove(self.cache.path)
+        with patch.dict(os.environ, {"SGTK_DISABLE_TEMPLATES_CACHE": "1"}):
+            self._read_templates()
+            self.assertFalse(os.path.exists(self.cache.path))
+            self.assertFalse(self._read_templates()[1])
+
+    def test_corrupted(self):
+        """
+        Unreadable cache files are ignored and replaced.
+        """
+        self._read_templates()
+        with open(self.cache.path, "wb") as fh:
+            fh.write("not a pickle")
+        templates, cached = self._read_templates()
+        self.assertFalse(cached)
+        self.assertIn("work", templates)
+        self.assertTrue(self._read_templates()[1])
+
+    def test_no_temporary_files_left(self):
+        """
+        Temporary files are removed whether the cache could be written or not.
+        """
+        self._read_templates()
+        cache_folder = os.path.dirname(self.cache.path)
+        self.assertEquals([os.path.basename(self.cache.path)], os.listdir(cache_folder))
+
+        os.remove(self.cache.path)
+        with patch("os.rename", side_effect=OSError("rename failed")):
+            self._read_templates()
+        self.assertEquals([], os.listdir(cache_folder))
+
+    def test_writable_by_others(self):
+        """
+        The cache is only writable by its owner, caches writable by others are ignored.
+        """
+        if sys.platform == "win32":
+            return
+
+        self._read_templates()
+        self.assertEquals(0644, stat.S_IMODE(os.stat(self.cache.path).st_mode))
+        self.assertTrue(self._read_templates()[1])
+
+        os.chmod(self.cache.path, 0666)
+        templates, cached = self._read_templates()
+        self.assertFalse(cached)
+        self.assertIn("work", templates)
+        self.assertEquals(0644, stat.S_IMODE(os.stat(self.cache.path).st_mode))
+        self.assertTrue(self._read_templates()[1])
+
+    def test_timestamp_key(self):
+        """
+        Timestamp keys defaulting to the current time can be pickled.
+        """
+        for default in ["now", "utc_now", "2017-01-01-10-00-00"]:
+            key = TimestampKey("date", default=default)
+            unpickled = pickle.loads(pickle.dumps(key, pickle.HIGHEST_PROTOCOL))
+            self.assertIsInstance(unpickled.default, datetime.datetime)
+        self.assertEquals(datetime.datetime(2017, 1, 1, 10), unpickled.default)
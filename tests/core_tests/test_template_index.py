@@ -0,0 +1,213 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+
+from mock import patch
+
+from tank_test.tank_test_base import *
+
+from tank.errors import TankMultipleMatchingTemplatesError
+from tank.template import TemplatePath, TemplateString, LazyTemplates
+from tank.template_index import TemplateIndex
+from tank.templatekey import StringKey, IntegerKey
+
+
+class TestTemplateIndex(TankTestBase):
+    """
+    Tests for the TemplateIndex used by Sgtk.template_from_path.
+    """
+    def setUp(self):
+        super(TestTemplateIndex, self).setUp()
+        self.setup_fixtures()
+
+        self.keys = {"Sequence": StringKey("Sequence"),
+                     "Shot": StringKey("Shot"),
+                     "name": StringKey("name"),
+                     "version": IntegerKey("version", format_spec="03")}
+
+    def _assert_same_matches(self, templates, paths):
+        """
+        Checks that validating the candidates returned by the index matches
+        validating every template.
+        """
+        index = TemplateIndex(templates)
+        for path in paths:
+            expected = [t for t in templates.values() if t.validate(path)]
+            candidates = index.get_candidates(path)
+            actual = [t for t in candidates if t.validate(path)]
+            self.assertEquals(set(expected), set(actual))
+            # all matches must be kept in dictionary order
+            self.assertEquals([t for t in templates.values() if t in actual], actual)
+
+    def test_narrows_candidates(self):
+        """
+        Templates with a different static prefix are not returned.
+        """
+        shot_work = TemplatePath("shots/{Shot}/work/{name}.v{version}.ma", self.keys, self.project_root)
+        asset_work = TemplatePath("assets/{name}/work/{name}.v{version}.ma", self.keys, self.project_root)
+        index = TemplateIndex({"shot_work": shot_work, "asset_work": asset_work})
+
+        path = os.path.join(self.project_root, "shots", "shot_1", "work", "foo.v001.ma")
+        self.assertEquals([shot_work], index.get_candidates(path))
+
+        path = os.path.join(self.project_root, "other", "shot_1")
+        self.assertEquals([], index.get_candidates(path))
+
+    def test_partial_component_prefix(self):
+        """
+        Static tokens ending part way through a path component.
+        """
+        prefixed = TemplatePath("shots/sh_{Shot}/{name}", self.keys, self.project_root)
+        not_prefixed = TemplatePath("shots/{Shot}", self.keys, self.project_root)
+        templates = {"prefixed": prefixed, "not_prefixed": not_prefixed}
+        index = TemplateIndex(templates)
+
+        path = os.path.join(self.project_root, "shots", "sh_010", "foo")
+        self.assertEquals([prefixed], index.get_candidates(path))
+
+        path = os.path.join(self.project_root, "shots", "sh_010")
+        self.assertEquals([not_prefixed], index.get_candidates(path))
+
+        path = os.path.join(self.project_root, "shots", "010", "foo")
+        self.assertEquals([], index.get_candidates(path))
+
+    def test_separators_and_tokens(self):
+        """
+        Templates with a different number of separators or missing static tokens
+        are not returned.
+        """
+        templates = {}
+        for index in range(10):
+            templates["area_%d" % index] = TemplatePath(
+                "shots/{Shot}/app_%d" % index, self.keys, self.project_root
+            )
+            templates["work_%d" % index] = TemplatePath(
+                "shots/{Shot}/app_%d/work/{name}.v{version}.ma" % index, self.keys, self.project_root
+            )
+        index = TemplateIndex(templates)
+
+        path = os.path.join(self.project_root, "shots", "shot_1", "app_3", "work", "foo.v001.ma")
+        self.assertEquals([templates["work_3"]], index.get_candidates(path))
+        path = os.path.join(self.project_root, "shots", "shot_1", "app_3")
+        self.assertEquals([templates["area_3"]], index.get_candidates(path))
+
+        paths = [
+            os.path.join(self.project_root, "shots", "shot_1", "app_3", "work", "foo.v001.ma"),
+            os.path.join(self.project_root, "shots", "shot_1", "app_3", "work", "foo.v001.mb"),
+            os.path.join(self.project_root, "shots", "shot_1", "app_3", "work", "foo.v"),
+            os.path.join(self.project_root, "shots", "shot_1", "app_3", "work"),
+            os.path.join(self.project_root, "shots", "app_3", "app_3"),
+            os.path.join(self.project_root, "shots", "shot_1", "app_31"),
+            os.path.join(self.project_root, "shots"),
+        ]
+        self._assert_same_matches(templates, paths)
+
+    def test_leading_key(self):
+        """
+        Templates that could match with a leading key value are returned.
+        """
+        keys = {"name": StringKey("name"), "version": IntegerKey("version")}
+        string = TemplateString("{name}.v{version}", keys)
+        relative = TemplatePath("foo/{name}", keys, "bar")
+        # the parser will match "xbar/foo/1." with name="x"
+        leading = TemplatePath("foo/{name}.{version}", keys, "bar")
+        self.assertTrue(leading.validate("xbar/foo/1."))
+        templates = {"string": string, "relative": relative, "leading": leading}
+        self._assert_same_matches(templates, ["name.v001", "x.v1", "/abs/name.v001", "baz/bar/foo/x", "xbar/foo/1."])
+
+    def test_matches_full_config(self):
+        """
+        The index returns the same matches as validating all the templates from
+        the standard fixtures configuration.
+        """
+        paths = [
+            os.path.join(self.project_root, "sequences", "Seq", "shot_010", "Anm", "publish", "shot_010.jfk.v001.ma"),
+            os.path.join(self.project_root, "sequences", "Seq", "shot_010", "Anm", "publish"),
+            os.path.join(self.project_root, "sequences", "Seq", "shot_010"),
+            os.path.join(self.project_root, "sequences", "Seq"),
+            os.path.join(self.project_root, "assets", "Char", "Bob", "Mdl", "work", "maya", "bob.v001.ma"),
+            os.path.join(self.project_root, "assets"),
+            self.project_root,
+            os.path.join(self.project_root.upper()),
+            "Nuke Script Name, v002",
+            "/not/a/project/path",
+        ]
+        self._assert_same_matches(self.tk.templates, paths)
+
+    def test_is_valid_for(self):
+        """
+        The index is only valid for the exact set of templates it was built with.
+        """
+        templates = dict(self.tk.templates)
+        index = TemplateIndex(templates)
+        self.assertTrue(index.is_valid_for(templates))
+        self.assertTrue(index.is_valid_for(dict(templates)))
+
+        modified = dict(templates)
+        modified["new_template"] = TemplatePath("new/{Shot}", self.keys, self.project_root)
+        self.assertFalse(index.is_valid_for(modified))
+
+        name = templates.keys()[0]
+        modified = dict(templates)
+        modified[name] = TemplatePath("new/{Shot}", self.keys, self.project_root)
+        self.assertFalse(index.is_valid_for(modified))
+
+
+    def test_is_valid_for_lazy_templates(self):
+        """
+        The index built for lazy templates checks their revision rather than
+        comparing their contents.
+        """
+        templates = self.tk.templates
+        self.assertIsInstance(templates, LazyTemplates)
+        index = TemplateIndex(templates)
+        with patch.object(LazyTemplates, "__iter__", side_effect=AssertionError("templates iterated")):
+            self.assertTrue(index.is_valid_for(templates))
+        # a copy of the same templates is a different dictionary
+        self.assertFalse(index.is_valid_for(dict(templates)))
+
+        templates.add_path("new_template", "new/{Shot}", self.project_root)
+        self.assertFalse(index.is_valid_for(templates))
+
+        index = TemplateIndex(templates)
+        del templates["new_template"]
+        self.assertFalse(index.is_valid_for(templates))
+
+        index = TemplateIndex(templates)
+        templates[templates.keys()[0]] = TemplatePath("new/{Shot}", self.keys, self.project_root)
+        self.assertFalse(index.is_valid_for(templates))
+
+
+class TestTemplateFromPathIndex(TankTestBase):
+    """
+    Tests that Sgtk.template_from_path keeps up to date with template changes.
+    """
+    def setUp(self):
+        super(TestTemplateFromPathIndex, self).setUp()
+        self.setup_fixtures()
+        self.keys = {"Shot": StringKey("Shot"), "name": StringKey("name")}
+
+    def test_template_added(self):
+        path = os.path.join(self.project_root, "index_test", "shot_1", "foo")
+        self.assertIsNone(self.tk.template_from_path(path))
+
+        template = TemplatePath("index_test/{Shot}/{name}", self.keys, self.project_root)
+        self.tk.templates["index_test"] = template
+        self.assertEquals(template, self.tk.template_from_path(path))
+
+        self.tk.templates = {}
+        self.assertIsNone(self.tk.template_from_path(path))
+
+    def test_ambiguous(self):
+        path = os.path.join(self.project_root, "index_test", "shot_1", "foo")
+        self.tk.templates["index_test_1"] = TemplatePath("index_test/{Shot}/{name}", self.keys, self.project_root)
+        self.tk.templates["index_test_2"] = TemplatePath("index_test/{name}/foo", self.keys, self.project_root)
+        self.assertRaises(TankMultipleMatchingTemplatesError, self.tk.template_from_path, path)
@@ -0,0 +1,94 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+
+from mock import patch
+
+from tank_test.tank_test_base import *
+
+from tank.template import TemplatePath
+from tank.template_path_grouper import AbstractPathGrouper
+from tank.templatekey import StringKey, IntegerKey, SequenceKey
+
+
+class TestAbstractPathGrouper(TankTestBase):
+    """
+    Tests for the AbstractPathGrouper used by Sgtk.abstract_paths_from_template.
+    """
+    def setUp(self):
+        super(TestAbstractPathGrouper, self).setUp()
+        self.keys = {"Shot": StringKey("Shot"),
+                     "name": StringKey("name"),
+                     "eye": StringKey("eye", default="%V", choices=["left", "right", "%V"], abstract=True),
+                     "version": IntegerKey("version", format_spec="03"),
+                     "take": IntegerKey("take", format_spec="03", strict_matching=False),
+                     "SEQ": SequenceKey("SEQ", format_spec="04")}
+
+    def _group(self, definition, file_names, fields=None):
+        """
+        Groups paths made of the file names in a shot directory.
+
+        :returns: Tuple (grouper, number of paths parsed with the template)
+        """
+        template = TemplatePath(definition, self.keys, self.project_root)
+        grouper = AbstractPathGrouper(template, fields or {})
+        with patch.object(template, "validate_and_get_fields", wraps=template.validate_and_get_fields) as parse:
+            for file_name in file_names:
+                grouper.add(os.path.join(self.project_root, "shot_1", file_name))
+        return grouper, parse.call_count
+
+    def _path(self, file_name):
+        return os.path.join(self.project_root, "shot_1", file_name)
+
+    def test_sequence(self):
+        file_names = ["foo_v%03d.%04d.exr" % (version, frame) for version in [1, 2] for frame in range(1, 101)]
+        file_names.append("foo_v001.0200.exr")
+        file_names.append("not_matching.exr")
+        grouper, num_parsed = self._group("{Shot}/{name}_v{version}.{SEQ}.exr", file_names)
+        # one per version plus the file not matching the template
+        self.assertEquals(3, num_parsed)
+        self.assertEquals(
+            {self._path("foo_v001.%04d.exr"): {"SEQ": [(1, 100), (200, 200)]},
+             self._path("foo_v002.%04d.exr"): {"SEQ": [(1, 100)]}},
+            grouper.get_frame_ranges()
+        )
+
+    def test_abstract_key_in_file_name(self):
+        file_names = ["foo_%s.%04d.exr" % (eye, frame) for eye in ["left", "right", "middle"] for frame in range(1, 11)]
+        grouper, num_parsed = self._group("{Shot}/{name}_{eye}.{SEQ}.exr", file_names)
+        self.assertEquals({self._path("foo_%V.%04d.exr"): {"SEQ": [(1, 10)]}}, grouper.get_frame_ranges())
+        # one file per eye, invalid eye values are all parsed to be rejected
+        self.assertEquals(12, num_parsed)
+
+    def test_abstract_key_in_fields(self):
+        """
+        Abstract keys with a value are kept.
+        """
+        file_names = ["foo_left.%04d.exr" % frame for frame in range(1, 11)]
+        grouper, num_parsed = self._group("{Shot}/{name}_{eye}.{SEQ}.exr", file_names, {"eye": "left"})
+        self.assertEquals({self._path("foo_left.%04d.exr"): {"SEQ": [(1, 10)]}}, grouper.get_frame_ranges())
+        self.assertEquals(1, num_parsed)
+
+    def test_non_canonical(self):
+        """
+        Files whose values aren't in their canonical form are all parsed.
+        """
+        file_names = ["foo_v1.%04d.exr" % frame for frame in range(1, 6)]
+        grouper, num_parsed = self._group("{Shot}/{name}_v{take}.{SEQ}.exr", file_names)
+        self.assertEquals(5, num_parsed)
+        self.assertEquals({self._path("foo_v001.%04d.exr"): {"SEQ": [(1, 5)]}}, grouper.get_frame_ranges())
+
+    def test_repeated_key(self):
+        file_names = ["%04d_foo.%04d.exr" % (frame, frame) for frame in range(1, 6)]
+        file_names.append("0001_foo.0002.exr")
+        grouper, num_parsed = self._group("{Shot}/{SEQ}_{name}.{SEQ}.exr", file_names)
+        self.assertEquals(2, num_parsed)
+        self.assertEquals({self._path("%04d_foo.%04d.exr"): {"SEQ": [(1, 5)]}}, grouper.get_frame_ranges())
@@ -0,0 +1,146 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+
+from tank_test.tank_test_base import *
+
+from tank.template_path_parser import TemplatePathParser
+from tank.templatekey import StringKey, IntegerKey, SequenceKey
+
+
+class TestTemplatePathParser(TankTestBase):
+    """
+    Tests that the compiled regular expression used by TemplatePathParser gives
+    exactly the same results as the recursive solver it falls back to.
+    """
+    def setUp(self):
+        super(TestTemplatePathParser, self).setUp()
+        self.keys = {"Sequence": StringKey("Sequence"),
+                     "Shot": StringKey("Shot"),
+                     "Step": StringKey("Step", choices=["anm", "comp", "anm_2"]),
+                     "name": StringKey("name", filter_by="alphanumeric"),
+                     "alpha": StringKey("alpha", filter_by="alpha"),
+                     "version": IntegerKey("version", format_spec="03"),
+                     "frame": SequenceKey("frame", format_spec="04")}
+
+    def _make_parsers(self, key_names, tokens):
+        """
+        Returns a parser using the regular expression and one only using the solver.
+        """
+        ordered_keys = [self.keys[name] for name in key_names]
+        tokens = [t.replace("/", os.path.sep) for t in tokens]
+        fast = TemplatePathParser(ordered_keys, tokens)
+        slow = TemplatePathParser(ordered_keys, tokens)
+        slow._TemplatePathParser__get_regexes = lambda skip_keys: None
+        return fast, slow
+
+    def _assert_same(self, key_names, tokens, paths, skip_keys=None):
+        """
+        Checks that both parsers return the same fields and error for all paths.
+        """
+        fast, slow = self._make_parsers(key_names, tokens)
+        for path in paths:
+            path = path.replace("/", os.path.sep)
+            fast_fields = fast.parse_path(path, skip_keys)
+            slow_fields = slow.parse_path(path, skip_keys)
+            self.assertEquals(slow_fields, fast_fields, "Different fields for %s" % path)
+            if slow_fields is None:
+                self.assertEquals(slow.last_error, fast.last_error)
+        return fast
+
+    def test_simple(self):
+        fast = self._assert_same(
+            ["Sequence", "Shot", "Step", "name", "version"],
+            ["/proj/sequences/", "/", "/", "/work/", ".v", ".ma"],
+            ["/proj/sequences/seq_1/shot_010/anm/work/foo.v001.ma",
+             "/proj/sequences/seq_1/shot_010/anm_2/work/foo.v001.ma",
+             "/proj/sequences/seq_1/shot_010/bad/work/foo.v001.ma",
+             "/proj/sequences/seq_1/shot_010/anm/work/foo.vbad.ma",
+             "/proj/sequences/seq_1/shot_010/anm/work/foo_bar.v001.ma",
+             "/proj/sequences/seq_1/shot_010/anm/work/foo.v001.mb",
+             "/proj/sequences/seq_1/shot_010/anm/work",
+             "/proj/other/seq_1/shot_010/anm/work/foo.v001.ma"])
+        fields = fast.parse_path("/proj/sequences/seq_1/shot_010/anm/work/foo.v001.ma".replace("/", os.path.sep), None)
+        expected = {"Sequence": "seq_1", "Shot": "shot_010", "Step": "anm", "name": "foo", "version": 1}
+        self.assertEquals(expected, fields)
+
+    def test_case_insensitive_tokens(self):
+        fast = self._assert_same(["Shot", "version"], ["/proj/", ".v", ".ma"],
+                                 ["/PROJ/Shot_A.V003.MA", "/Proj/shot.v003.Ma"])
+        self.assertEquals({"Shot": "Shot_A", "version": 3}, fast.parse_path("/PROJ/Shot_A.V003.MA".replace("/", os.path.sep), None))
+
+    def test_ambiguous(self):
+        """
+        Paths that can be parsed in several ways are rejected.
+        """
+        fast = self._assert_same(["Shot", "Sequence"], ["/proj/", "_", ".ma"],
+                                 ["/proj/a_b_c.ma", "/proj/a_b.ma", "/proj/a__b.ma"])
+        self.assertIsNone(fast.parse_path("/proj/a_b_c.ma".replace("/", os.path.sep), None))
+
+    def test_filtered_keys(self):
+        """
+        Key filters disambiguate paths.
+        """
+        fast = self._assert_same(["alpha", "version"], ["/proj/", "_", ".ma"],
+                                 ["/proj/abc_001.ma", "/proj/ab_c_001.ma", "/proj/a1_001.ma",
+                                  "/proj/ab_c_d.ma"])
+        self.assertEquals({"alpha": "abc", "version": 1},
+                          fast.parse_path("/proj/abc_001.ma".replace("/", os.path.sep), None))
+
+    def test_repeated_keys(self):
+        self._assert_same(["Shot", "Step", "Shot"], ["/proj/", "/", "/", ".ma"],
+                          ["/proj/s1/anm/s1.ma", "/proj/s1/anm/s2.ma", "/proj/s1/comp/S1.ma"])
+
+    def test_early_stop(self):
+        """
+        Paths ending with a token leave the remaining keys out.
+        """
+        self._assert_same(["Sequence", "Shot", "Step"], ["/proj/", "_", "_"],
+                          ["/proj/seq", "/proj/seq_", "/proj/seq_shot", "/proj/seq_shot_anm",
+                           "/proj/seq_shot_anm_", "/proj"])
+        fast = self._assert_same(["Sequence", "Shot"], ["/proj/", "_"],
+                                 ["/proj/seq", "/proj/seq_", "/proj/seq_shot"])
+        self.assertEquals({"Sequence": "seq"}, fast.parse_path("/proj/seq_".replace("/", os.path.sep), None))
+
+    def test_leading_key(self):
+        self._assert_same(["name", "version"], [".v", ".ma"],
+                          ["foo.v001.ma", ".v001.ma", "foo.v001", "foo_1.v001.ma"])
+
+    def test_sequence_key(self):
+        self._assert_same(["name", "frame"], ["/proj/", ".", ".exr"],
+                          ["/proj/foo.%04d.exr", "/proj/foo.####.exr", "/proj/foo.0001.exr",
+                           "/proj/foo.$F4.exr", "/proj/foo.@@@@.exr"])
+
+    def test_skip_keys(self):
+        """
+        Skipped keys aren't validated, can contain separators and aren't returned.
+        """
+        fast = self._assert_same(["Sequence", "Step", "name"], ["/proj/", "/", "/", ".ma"],
+                                 ["/proj/seq/bad/foo.ma", "/proj/seq/anm/foo.ma", "/proj/a/b/bad/foo.ma"],
+                                 skip_keys=["Step"])
+        self.assertEquals({"Sequence": "seq", "name": "foo"},
+                          fast.parse_path("/proj/seq/bad/foo.ma".replace("/", os.path.sep), ["Step"]))
+
+    def test_overlapping_tokens(self):
+        self._assert_same(["Shot", "name"], ["/proj/", "..", ".ma"],
+                          ["/proj/a...b.ma", "/proj/a..b.ma", "/proj/a....ma"])
+
+    def test_skip_keys_length(self):
+        """
+        Values shorter than the key length are rejected for skipped keys too.
+        """
+        self.keys["code"] = StringKey("code", length=3)
+        fast = self._assert_same(["code", "name"], ["/proj/shots/", "/", ".ma"],
+                                 ["/proj/shots/ab/x.ma", "/proj/shots/abc/x.ma", "/proj/shots/abcd/x.ma",
+                                  "/proj/shots/a/b/x.ma", "/proj/shots/ab"],
+                                 skip_keys=["code"])
+        self.assertIsNone(fast.parse_path("/proj/shots/ab/x.ma".replace("/", os.path.sep), ["code"]))
+        self.assertEquals({"name": "x"}, fast.parse_path("/proj/shots/abc/x.ma".replace("/", os.path.sep), ["code"]))
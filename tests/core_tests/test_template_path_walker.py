@@ -0,0 +1,190 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import glob
+import time
+import threading
+
+from mock import patch
+
+from tank_test.tank_test_base import *
+
+from tank.template import TemplatePath
+from tank.template_path_walker import TemplatePathWalker
+from tank.templatekey import StringKey, IntegerKey
+
+
+class TestTemplatePathWalker(TankTestBase):
+    """
+    Tests for the TemplatePathWalker used by Sgtk.iter_paths_from_template.
+    """
+    def setUp(self):
+        super(TestTemplatePathWalker, self).setUp()
+        self.keys = {"Shot": StringKey("Shot"),
+                     "Step": StringKey("Step", choices=["anm", "comp"]),
+                     "name": StringKey("name"),
+                     "version": IntegerKey("version", format_spec="03")}
+
+    def _walk(self, template, fields, ignore_types):
+        """
+        Walks the template, checking the result is the same as the glob search.
+        """
+        paths = list(TemplatePathWalker(template).walk(fields, ignore_types))
+        glob_paths = glob.glob(template._apply_fields(fields, ignore_types=ignore_types))
+        self.assertEquals(sorted(glob_paths), sorted(paths))
+        return paths
+
+    def test_prune(self):
+        """
+        Directories with invalid values aren't searched.
+        """
+        template = TemplatePath("{Shot}/{Step}/{name}.v{version}.ma", self.keys, self.project_root)
+        self.create_file(os.path.join(self.project_root, "shot_1", "anm", "foo.v001.ma"))
+        self.create_file(os.path.join(self.project_root, "shot_1", "bad", "foo.v001.ma"))
+
+        fields = {"Shot": "*", "Step": "*", "name": "*", "version": "*"}
+        walker = TemplatePathWalker(template)
+        with patch("os.listdir", wraps=os.listdir) as listdir:
+            paths = list(walker.walk(fields, fields.keys()))
+            listed = [call[0][0] for call in listdir.call_args_list]
+        self.assertIn(os.path.join(self.project_root, "shot_1", "anm", "foo.v001.ma"), paths)
+        self.assertIn(os.path.join(self.project_root, "shot_1", "anm"), listed)
+        self.assertNotIn(os.path.join(self.project_root, "shot_1", "bad"), listed)
+
+    def test_repeated_keys(self):
+        """
+        Levels with keys repeated further down the path aren't validated on their own.
+        """
+        template = TemplatePath("{Shot}_{name}/{Shot}.ma", self.keys, self.project_root)
+        # the first directory is ambiguous on its own but not with the file name
+        path = os.path.join(self.project_root, "a_b_c", "a_b.ma")
+        self.create_file(path)
+        self.assertTrue(template.validate(path))
+
+        fields = {"Shot": "*", "name": "*"}
+        self.assertEquals([path], self._walk(template, fields, fields.keys()))
+
+    def test_literal_levels(self):
+        """
+        Levels without wildcards aren't listed.
+        """
+        template = TemplatePath("{Shot}/work/{name}.v{version}.ma", self.keys, self.project_root)
+        path = os.path.join(self.project_root, "shot_1", "work", "foo.v001.ma")
+        self.create_file(path)
+
+        fields = {"Shot": "shot_1", "name": "*", "version": 1}
+        with patch("os.listdir", wraps=os.listdir) as listdir:
+            self.assertEquals([path], self._walk(template, fields, ["name"]))
+            walked = [call[0][0] for call in listdir.call_args_list]
+        self.assertNotIn(os.path.join(self.project_root, "shot_1"), walked)
+
+        fields = {"Shot": "shot_1", "name": "foo", "version": 1}
+        self.assertEquals([path], self._walk(template, fields, []))
+        fields = {"Shot": "shot_2", "name": "foo", "version": 1}
+        self.assertEquals([], self._walk(template, fields, []))
+
+    def test_listing_cache(self):
+        """
+        Directories are only listed once by a walker.
+        """
+        template = TemplatePath("{Shot}/{name}[.v{version}].ma", self.keys, self.project_root)
+        self.create_file(os.path.join(self.project_root, "shot_1", "foo.v001.ma"))
+        self.create_file(os.path.join(self.project_root, "shot_1", "foo.ma"))
+
+        walker = TemplatePathWalker(template)
+        with patch("os.listdir", wraps=os.listdir) as listdir:
+            paths = list(walker.walk({"Shot": "*", "name": "*", "version": "*"}, ["Shot", "name", "version"]))
+            paths.extend(walker.walk({"Shot": "*", "name": "*"}, ["Shot", "name"]))
+            listed = [call[0][0] for call in listdir.call_args_list]
+        self.assertEquals(len(set(listed)), len(listed))
+        self.assertIn(os.path.join(self.project_root, "shot_1", "foo.ma"), paths)
+        self.assertIn(os.path.join(self.project_root, "shot_1", "foo.v001.ma"), paths)
+
+
+class TestTemplatePathWalkerThreaded(TankTestBase):
+    """
+    Tests for the TemplatePathWalker listing directories with several threads.
+    """
+    def setUp(self):
+        super(TestTemplatePathWalkerThreaded, self).setUp()
+        keys = {"Sequence": StringKey("Sequence"),
+                "Shot": StringKey("Shot"),
+                "name": StringKey("name"),
+                "version": IntegerKey("version", format_spec="03")}
+        self.template = TemplatePath("{Sequence}/{Shot}/{name}[.v{version}].ma", keys, self.project_root)
+        self.fields = {"Sequence": "*", "Shot": "*", "name": "*", "version": "*"}
+
+        self.paths = []
+        for seq in range(3):
+            for shot in range(4):
+                for name in ["foo.v001.ma", "foo.v002.ma", "bar.ma"]:
+                    path = os.path.join(self.project_root, "seq_%d" % seq, "shot_%d" % shot, name)
+                    self.create_file(path)
+                    self.paths.append(path)
+
+        # track the number of directories being listed at the same time
+        self.lock = threading.Lock()
+        self.num_listing = 0
+        self.max_listing = 0
+
+    def _slow_listdir(self, path, _listdir=os.listdir):
+        with self.lock:
+            self.num_listing += 1
+            self.max_listing = max(self.max_listing, self.num_listing)
+        try:
+            time.sleep(0.01)
+            return _listdir(path)
+        finally:
+            with self.lock:
+                self.num_listing -= 1
+
+    def _walk(self, max_workers):
+        walker = TemplatePathWalker(self.template, max_workers=max_workers)
+        searches = [(self.fields, self.fields.keys()),
+                    ({"Sequence": "*", "Shot": "*", "name": "*"}, ["Sequence", "Shot", "name"])]
+        with patch("os.listdir", side_effect=self._slow_listdir):
+            return set(path for path in walker.walk_all(searches) if self.template.validate(path))
+
+    def test_same_results(self):
+        self.assertEquals(sorted(self.paths), sorted(self._walk(None)))
+        self.assertEquals(1, self.max_listing)
+        self.assertEquals(sorted(self.paths), sorted(self._walk(8)))
+
+    def test_concurrent(self):
+        """
+        Directories are listed concurrently, using at most the maximum number of threads.
+        """
+        self._walk(3)
+        self.assertEquals(3, self.max_listing)
+
+    def test_error(self):
+        """
+        Errors in the threads are raised by the walker.
+        """
+        walker = TemplatePathWalker(self.template, max_workers=4)
+        with patch("fnmatch.filter", side_effect=ValueError("bad pattern")):
+            self.assertRaises(ValueError, list, walker.walk(self.fields, self.fields.keys()))
+
+    def test_stop(self):
+        """
+        Threads are stopped if the search is stopped early.
+        """
+        num_threads = threading.active_count()
+        walker = TemplatePathWalker(self.template, max_workers=4)
+        paths = walker.walk(self.fields, self.fields.keys())
+        next(paths)
+        self.assertTrue(threading.active_count() > num_threads)
+        paths.close()
+        for _ in range(100):
+            if threading.active_count() == num_threads:
+                break
+            time.sleep(0.01)
+        self.assertEquals(num_threads, threading.active_count())
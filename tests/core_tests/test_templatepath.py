@@ -12,6 +12,8 @@
 import sys
 import os
 
+from mock import patch
+
 import tank
 from tank import TankError
 
@@ -589,6 +591,44 @@ class TestApplyFields(TestTemplatePath):
         self.assertEquals(expected, template.apply_fields(fields))
 
 
+class TestApplyFieldsMany(TestTemplatePath):
+    """Tests for TemplatePath.apply_fields_many"""
+    def setUp(self):
+        super(TestApplyFieldsMany, self).setUp()
+        definition = "shots/{Shot}[.{branch}]/{name}.v{version}.{frame}.exr"
+        self.template = TemplatePath(definition, self.keys, self.project_root)
+        self.fields = {"Shot": "s1", "branch": "loon", "name": "henry", "version": 3}
+
+    def test_same_as_apply_fields(self):
+        fields_list = [dict(self.fields, frame=frame) for frame in range(1, 4)]
+        fields_list.append({"name": "henry", "version": 4, "frame": "FORMAT:#"})
+        expected = [self.template.apply_fields(fields) for fields in fields_list]
+        self.assertEquals(expected, self.template.apply_fields_many(fields_list))
+        self.assertEquals(
+            os.path.join(self.project_root, "shots", "s1", "henry.v004.####.exr"),
+            expected[-1]
+        )
+
+    def test_values_formatted_once(self):
+        fields_list = [dict(self.fields, frame=frame) for frame in range(100)]
+        with patch.object(self.keys["name"], "str_from_value", wraps=self.keys["name"].str_from_value) as str_from_value:
+            paths = self.template.apply_fields_many(fields_list)
+        self.assertEquals(1, str_from_value.call_count)
+        self.assertEquals(100, len(set(paths)))
+
+    def test_missing_keys(self):
+        self.assertRaises(TankError, self.template.apply_fields_many, [self.fields, {"Shot": "s1"}])
+
+    def test_platform(self):
+        fields_list = [dict(self.fields, frame=frame) for frame in range(1, 3)]
+        template = TemplatePath(self.template.definition, self.keys, self.project_root,
+                                per_platform_roots={"win32": "z:\\proj", "linux2": "/proj"})
+        self.assertEquals(
+            ["z:\\proj\\shots\\s1.loon\\henry.v003.%04d.exr" % frame for frame in range(1, 3)],
+            template.apply_fields_many(fields_list, platform="win32")
+        )
+
+
 class Test_ApplyFields(TestTemplatePath):
     """Tests for private TemplatePath._apply_fields"""
     def test_skip_enum(self):
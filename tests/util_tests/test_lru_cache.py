@@ -0,0 +1,85 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import threading
+
+from sgtk.util.lru_cache import LRUCache
+from tank_test.tank_test_base import *
+
+
+class TestLRUCache(TankTestBase):
+    """
+    Tests for the LRUCache.
+    """
+
+    def test_get_set(self):
+        cache = LRUCache(10)
+        self.assertIsNone(cache.get("a"))
+        self.assertEquals(1, cache.get("a", 1))
+        cache.set("a", 2)
+        self.assertEquals(2, cache.get("a"))
+        cache.set("a", 3)
+        self.assertEquals(3, cache.get("a"))
+        self.assertEquals(1, len(cache))
+        self.assertTrue("a" in cache)
+        self.assertEquals({"hits": 2, "misses": 2, "size": 1, "max_size": 10}, cache.get_stats())
+
+    def test_eviction(self):
+        cache = LRUCache(3)
+        for key in "abc":
+            cache.set(key, key)
+        # use a so that b is the least recently used
+        cache.get("a")
+        cache.set("d", "d")
+        self.assertEquals(["a", "c", "d"], sorted(key for key in "abcd" if key in cache))
+        # replacing a value makes it the most recently used
+        cache.set("c", "C")
+        cache.set("e", "e")
+        self.assertEquals(["c", "d", "e"], sorted(key for key in "abcde" if key in cache))
+
+    def test_resize(self):
+        cache = LRUCache(3)
+        for key in "abc":
+            cache.set(key, key)
+        cache.max_size = 1
+        self.assertEquals(1, len(cache))
+        self.assertTrue("c" in cache)
+        cache.max_size = 0
+        cache.set("a", "a")
+        self.assertEquals(0, len(cache))
+
+    def test_pop_clear(self):
+        cache = LRUCache(3)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEquals(1, cache.pop("a"))
+        self.assertIsNone(cache.pop("a"))
+        cache.get("b")
+        cache.clear()
+        self.assertEquals({"hits": 0, "misses": 0, "size": 0, "max_size": 3}, cache.get_stats())
+        cache.set("c", 3)
+        self.assertEquals(3, cache.get("c"))
+
+    def test_threads(self):
+        cache = LRUCache(50)
+
+        def use_cache(offset):
+            for i in range(1000):
+                key = (i + offset) % 100
+                if cache.get(key) is None:
+                    cache.set(key, key)
+
+        threads = [threading.Thread(target=use_cache, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(50, len(cache))
+        self.assertEquals(4000, cache.hits + cache.misses)